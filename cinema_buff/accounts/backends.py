@@ -0,0 +1,35 @@
+"""
+Authentication backend that keeps logged-in users in the cache.
+
+AuthenticationMiddleware loads request.user through the backend's get_user on every
+request. CachedModelBackend serves it from the default cache for USER_CACHE_TIMEOUT
+seconds (default 300, 0 disables), saving a query per authenticated request. The
+User post_save and post_delete handlers in accounts.models drop the cached copy, so a
+password change (which also invalidates the session hash), a deactivation or a
+last_login update is seen on the next request.
+"""
+from django.conf import settings
+from django.contrib.auth.backends import ModelBackend
+from django.core.cache import cache
+
+
+def user_cache_key(user_id):
+    return f'auth-user:{user_id}'
+
+
+def invalidate_cached_user(user_id):
+    cache.delete(user_cache_key(user_id))
+
+
+class CachedModelBackend(ModelBackend):
+    def get_user(self, user_id):
+        timeout = getattr(settings, 'USER_CACHE_TIMEOUT', 300)
+        if not timeout:
+            return super().get_user(user_id)
+        key = user_cache_key(user_id)
+        user = cache.get(key)
+        if user is None:
+            user = super().get_user(user_id)
+            if user is not None:
+                cache.set(key, user, timeout)
+        return user
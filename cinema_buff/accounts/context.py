@@ -0,0 +1,99 @@
+"""
+Per-request user context.
+
+UserContextMiddleware puts a UserContext on every request as ``request.user_context``
+(and the context processor puts it in templates as ``user_context``). Each fact about
+the user (role, community memberships, watchlist and favorite movie ids) is loaded the
+first time something asks for it and then reused for the rest of the request, instead of
+every view and template running its own ``exists()`` query.
+
+With USER_CONTEXT_CACHE_TIMEOUT (seconds, default 300) the facts are also kept in the
+default cache between requests. The signal handlers that change them call
+invalidate_user_context, so the cached copies are dropped as soon as they go stale; set
+the timeout to 0 to load them once per request only.
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.functional import SimpleLazyObject, cached_property
+
+FACTS = ('role', 'community_ids', 'watchlist_ids', 'favorite_ids')
+
+
+def cache_key(user_id, fact):
+    return f'user-context:{user_id}:{fact}'
+
+
+def invalidate_user_context(user_id, *facts):
+    """Drop the cached ``facts`` (default: all of them) of a user"""
+    cache.delete_many([cache_key(user_id, fact) for fact in facts or FACTS])
+
+
+class UserContext:
+    def __init__(self, user):
+        self.user = user
+        self.timeout = getattr(settings, 'USER_CONTEXT_CACHE_TIMEOUT', 300)
+
+    def load(self, fact, query):
+        if not self.user.is_authenticated:
+            return None
+        if not self.timeout:
+            return query()
+        key = cache_key(self.user.pk, fact)
+        value = cache.get(key)
+        if value is None:
+            value = query()
+            cache.set(key, value, self.timeout)
+        return value
+
+    @cached_property
+    def profile(self):
+        """The user's UserProfile; also what ``request.user.profile`` returns afterwards"""
+        return self.user.profile if self.user.is_authenticated else None
+
+    @cached_property
+    def role(self):
+        return self.load('role', lambda: self.profile.role) or 'user'
+
+    @property
+    def can_add_movies(self):
+        return self.role in ('critic', 'admin')
+
+    @cached_property
+    def community_ids(self):
+        from communities.models import CommunityMember
+        return self.load('community_ids', lambda: frozenset(
+            CommunityMember.objects.filter(user=self.user).values_list('community_id', flat=True)
+        )) or frozenset()
+
+    @cached_property
+    def watchlist_ids(self):
+        from movies.models import Watchlist
+        return self.load('watchlist_ids', lambda: frozenset(
+            Watchlist.objects.filter(user=self.user).values_list('movie_id', flat=True)
+        )) or frozenset()
+
+    @cached_property
+    def favorite_ids(self):
+        from movies.models import Favorite
+        return self.load('favorite_ids', lambda: frozenset(
+            Favorite.objects.filter(user=self.user).values_list('movie_id', flat=True)
+        )) or frozenset()
+
+    def is_member(self, community_id):
+        return community_id in self.community_ids
+
+
+class UserContextMiddleware:
+    """Must come after AuthenticationMiddleware"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        request.user_context = SimpleLazyObject(lambda: UserContext(request.user))
+        return self.get_response(request)
+
+
+def user_context(request):
+    """Template context processor"""
+    return {'user_context': getattr(request, 'user_context', None)}
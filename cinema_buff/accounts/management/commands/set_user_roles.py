@@ -1,27 +1,50 @@
-from django.core.management.base import BaseCommand
-from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from accounts.context import invalidate_user_context
 from accounts.models import UserProfile
+from movies.models import Rating
+from movies.signals import expire_author_pages
+
+# Default role assignments for the sample users created by populate_data
+DEFAULT_ROLES = {
+    'admin': ['user1'],
+    'critic': ['user2', 'user3'],
+}
 
 class Command(BaseCommand):
     help = 'Set roles for existing users'
 
+    def add_arguments(self, parser):
+        parser.add_argument('usernames', nargs='*', help='Users to update (defaults to the sample users)')
+        parser.add_argument('--role', choices=[choice for choice, _ in UserProfile.ROLE_CHOICES],
+                            help='Role to assign to the given usernames')
+
     def handle(self, *args, **options):
-        # Set user1 as admin
-        admin_user = User.objects.get(username='user1')
-        admin_user.profile.role = 'admin'
-        admin_user.profile.save()
-        self.stdout.write(self.style.SUCCESS(f'Set {admin_user.username} as admin'))
-
-        # Set user2 as critic
-        critic_user = User.objects.get(username='user2')
-        critic_user.profile.role = 'critic'
-        critic_user.profile.save()
-        self.stdout.write(self.style.SUCCESS(f'Set {critic_user.username} as critic'))
-
-        # Set user3 as critic
-        critic_user2 = User.objects.get(username='user3')
-        critic_user2.profile.role = 'critic'
-        critic_user2.profile.save()
-        self.stdout.write(self.style.SUCCESS(f'Set {critic_user2.username} as critic'))
+        if options['usernames']:
+            if not options['role']:
+                raise CommandError('--role is required when usernames are given')
+            assignments = {options['role']: options['usernames']}
+        else:
+            assignments = DEFAULT_ROLES
+
+        for role, usernames in assignments.items():
+            profiles = UserProfile.objects.filter(user__username__in=usernames)
+            user_ids = list(profiles.values_list('user_id', flat=True))
+            missing = set(usernames) - set(profiles.values_list('user__username', flat=True))
+            if missing:
+                raise CommandError(f'Unknown users: {", ".join(sorted(missing))}')
+
+            # Bulk update the profiles and re-tag their ratings in one go rather than per user
+            with transaction.atomic():
+                profiles.update(role=role)
+                retagged = Rating.sync_rater_role(user_ids, role)
+            # update() skips the post_save handlers that drop the cached role and pages
+            for user_id in user_ids:
+                invalidate_user_context(user_id, 'role')
+            expire_author_pages(user_ids)
+
+            self.stdout.write(self.style.SUCCESS(
+                f'Set {", ".join(usernames)} as {role} ({retagged} ratings re-tagged)'
+            ))
 
         self.stdout.write(self.style.SUCCESS('User roles updated successfully!'))
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.6 on 2026-10-18 08:40
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+
+
+def count_followers(apps, schema_editor):
+    UserProfile = apps.get_model('accounts', 'UserProfile')
+    UserConnection = apps.get_model('accounts', 'UserConnection')
+    followers = UserConnection.objects.filter(to_user_id=OuterRef('user_id')).values(
+        'to_user_id'
+    ).annotate(count=Count('id')).values('count')
+    UserProfile.objects.filter(user_id__in=UserConnection.objects.values('to_user_id')).update(
+        follower_count=Subquery(followers)
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0002_userprofile_role'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userprofile',
+            name='follower_count',
+            field=models.IntegerField(db_index=True, default=0),
+        ),
+        migrations.RunPython(count_followers, migrations.RunPython.noop),
+    ]
@@ -1,7 +1,10 @@
 from django.db import models
 from django.contrib.auth.models import User
-from django.db.models.signals import post_save
+from django.db.models import F
+from django.db.models.signals import post_delete, post_save
 from django.dispatch import receiver
+from .backends import invalidate_cached_user
+from .context import invalidate_user_context
 
 class UserProfile(models.Model):
     ROLE_CHOICES = [
@@ -15,12 +18,48 @@ class UserProfile(models.Model):
     profile_picture = models.ImageField(upload_to='profile_pics/', blank=True, null=True)
     favorite_genres = models.ManyToManyField('movies.Genre', blank=True)
     role = models.CharField(max_length=10, choices=ROLE_CHOICES, default='user')
+    # Maintained by the UserConnection signals below so feeds can tell popular accounts apart cheaply
+    follower_count = models.IntegerField(default=0, db_index=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
     def __str__(self):
         return f"{self.user.username}'s Profile"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember the persisted role so a change can be propagated to the user's ratings
+        instance._loaded_role = instance.__dict__.get('role')
+        instance._loaded_values = instance.field_values()
+        return instance
+
+    def field_values(self):
+        """Loaded concrete fields as the values they are saved as, keyed by attribute name"""
+        return {
+            field.attname: field.get_prep_value(getattr(self, field.attname))
+            for field in self._meta.concrete_fields if field.attname in self.__dict__
+        }
+
+    def dirty_fields(self):
+        """Attribute names of the fields whose value changed since the profile was read"""
+        loaded = self._loaded_values
+        return [
+            name for name, value in self.field_values().items()
+            if name not in loaded or value != loaded[name]
+        ]
+
+    def save(self, *args, **kwargs):
+        # A profile read from the database only writes the fields that changed, so saving a
+        # stale copy cannot undo follower_count updates made by the UserConnection signals
+        if not self._state.adding and hasattr(self, '_loaded_values') and kwargs.get('update_fields') is None:
+            dirty = self.dirty_fields()
+            if not dirty:
+                return
+            kwargs['update_fields'] = [*dirty, 'updated_at']
+        super().save(*args, **kwargs)
+        self._loaded_values = self.field_values()
+
 class UserConnection(models.Model):
     from_user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='following')
     to_user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='followers')
@@ -38,5 +77,26 @@ def create_user_profile(sender, instance, created, **kwargs):
         UserProfile.objects.create(user=instance)
 
 @receiver(post_save, sender=User)
-def save_user_profile(sender, instance, **kwargs):
-    instance.profile.save()
+def save_user_profile(sender, instance, created, **kwargs):
+    # Only a profile that was loaded alongside the user can have changes to save; a
+    # last_login update at login must not read and rewrite it
+    if not created and User.profile.is_cached(instance):
+        instance.profile.save()
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def expire_cached_user(sender, instance, **kwargs):
+    invalidate_cached_user(instance.pk)
+
+@receiver(post_save, sender=UserConnection)
+def count_new_follower(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        UserProfile.objects.filter(user_id=instance.to_user_id).update(follower_count=F('follower_count') + 1)
+
+@receiver(post_delete, sender=UserConnection)
+def count_lost_follower(sender, instance, **kwargs):
+    UserProfile.objects.filter(user_id=instance.to_user_id).update(follower_count=F('follower_count') - 1)
+
+@receiver(post_save, sender=UserProfile)
+def expire_cached_role(sender, instance, **kwargs):
+    invalidate_user_context(instance.user_id, 'role')
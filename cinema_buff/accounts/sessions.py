@@ -0,0 +1,49 @@
+"""
+Cached database sessions with coalesced writes.
+
+Sessions are read from the default cache and only fall back to the django_session table
+on a miss, like Django's cached_db engine. On top of that, a save that would write back
+exactly the data that was loaded (a view re-setting a key to the value it already had,
+or SESSION_SAVE_EVERY_REQUEST pushing the expiry forward) only refreshes the cached
+copy; the row is rewritten at most once every SESSION_DB_WRITE_INTERVAL seconds
+(default 300) to keep its expire_date current. Any real change is written through
+straight away.
+
+Use it with SESSION_ENGINE = 'accounts.sessions'.
+"""
+import json
+import time
+from django.conf import settings
+from django.contrib.sessions.backends import cached_db
+
+# Session key holding when the row was last written, as a Unix timestamp
+WRITTEN_AT = '_db_written_at'
+
+
+def session_state(data):
+    """What the row stores, minus the write timestamp, for comparing two versions"""
+    return json.dumps({key: value for key, value in data.items() if key != WRITTEN_AT}, sort_keys=True, default=str)
+
+
+class SessionStore(cached_db.SessionStore):
+    def load(self):
+        data = super().load()
+        self._loaded_state = session_state(data)
+        return data
+
+    def db_write_due(self, data):
+        interval = getattr(settings, 'SESSION_DB_WRITE_INTERVAL', 300)
+        return time.time() - data.get(WRITTEN_AT, 0) >= interval
+
+    def save(self, must_create=False):
+        data = self._get_session(no_load=must_create)
+        if (
+            not must_create and self.session_key is not None and
+            getattr(self, '_loaded_state', None) == session_state(data) and
+            not self.db_write_due(data)
+        ):
+            self._cache.set(self.cache_key, data, self.get_expiry_age())
+            return
+        data[WRITTEN_AT] = int(time.time())
+        super().save(must_create=must_create)
+        self._loaded_state = session_state(data)
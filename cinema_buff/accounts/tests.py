@@ -1,3 +1,90 @@
-from django.test import TestCase
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from movies.models import Movie, Watchlist
+from .backends import CachedModelBackend
+from .context import UserContext
+from .sessions import SessionStore
 
-# Create your tests here.
+LOCMEM_CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class CachedUserTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('cached')
+
+    def setUp(self):
+        cache.clear()
+
+    def test_user_is_loaded_once_until_it_changes(self):
+        backend = CachedModelBackend()
+        backend.get_user(self.user.pk)
+        with self.assertNumQueries(0):
+            self.assertEqual(backend.get_user(self.user.pk), self.user)
+
+        self.user.first_name = 'Renamed'
+        self.user.save()
+        with self.assertNumQueries(1):
+            self.assertEqual(backend.get_user(self.user.pk).first_name, 'Renamed')
+
+    @override_settings(USER_CACHE_TIMEOUT=0)
+    def test_timeout_zero_disables_the_cache(self):
+        backend = CachedModelBackend()
+        backend.get_user(self.user.pk)
+        with self.assertNumQueries(1):
+            backend.get_user(self.user.pk)
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class SessionStoreTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        session = SessionStore()
+        session['cart'] = [1, 2]
+        session.save()
+        self.session_key = session.session_key
+
+    def session_writes(self, session):
+        """How many statements saving ``session`` sends to the django_session table"""
+        with CaptureQueriesContext(connection) as queries:
+            session.save()
+        return sum('django_session' in query['sql'] for query in queries)
+
+    def test_unchanged_sessions_only_refresh_the_cache(self):
+        session = SessionStore(self.session_key)
+        session['cart'] = [1, 2]
+        self.assertEqual(self.session_writes(session), 0)
+
+    def test_changes_and_due_rewrites_reach_the_database(self):
+        session = SessionStore(self.session_key)
+        session['cart'] = [1, 2, 3]
+        self.assertGreater(self.session_writes(session), 0)
+        self.assertEqual(SessionStore(self.session_key).load()['cart'], [1, 2, 3])
+
+        with override_settings(SESSION_DB_WRITE_INTERVAL=0):
+            session = SessionStore(self.session_key)
+            session.load()
+            self.assertGreater(self.session_writes(session), 0)
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class UserContextTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('context')
+        cls.movie = Movie.objects.create(title='Heat', synopsis='x', release_date='1995-12-15')
+
+    def setUp(self):
+        cache.clear()
+
+    def test_facts_are_cached_across_requests_until_they_change(self):
+        self.assertEqual(UserContext(self.user).watchlist_ids, frozenset())
+        with self.assertNumQueries(0):
+            self.assertEqual(UserContext(self.user).watchlist_ids, frozenset())
+
+        Watchlist.objects.create(user=self.user, movie=self.movie)
+        self.assertEqual(UserContext(self.user).watchlist_ids, {self.movie.pk})
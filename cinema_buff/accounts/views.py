@@ -13,6 +13,7 @@ from .forms import UserProfileForm, CustomUserCreationForm
 class SignUpView(CreateView):
     form_class = CustomUserCreationForm
     template_name = 'accounts/signup.html'
+    query_budget = 8
     success_url = reverse_lazy('home')
 
     def form_valid(self, form):
@@ -21,17 +22,27 @@ class SignUpView(CreateView):
         messages.success(self.request, f"Welcome to CinemaBuff, {self.object.username}! Your account has been created successfully.")
         return response
 
+def recent_activity_context(user):
+    """Latest ratings and reviews plus totals for a profile page, in a fixed number of queries"""
+    return {
+        'recent_ratings': user.ratings.select_related('movie').order_by('-updated_at')[:6],
+        'recent_reviews': user.reviews.select_related('movie').order_by('-created_at')[:3],
+        'rating_count': user.ratings.count(),
+        'review_count': user.reviews.count(),
+    }
+
 class ProfileView(LoginRequiredMixin, DetailView):
     model = UserProfile
     template_name = 'accounts/profile.html'
+    query_budget = 9
     
     def get_object(self):
         return self.request.user.profile
     
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        # Ensure fresh data from database
-        context['user_profile'] = UserProfile.objects.get(user=self.request.user)
+        context['user_profile'] = self.object
+        context.update(recent_activity_context(self.request.user))
         return context
     
     def dispatch(self, request, *args, **kwargs):
@@ -45,6 +56,7 @@ class ProfileEditView(LoginRequiredMixin, UpdateView):
     model = UserProfile
     form_class = UserProfileForm
     template_name = 'accounts/profile_edit.html'
+    query_budget = 6
     success_url = reverse_lazy('accounts:profile')
     
     def get_object(self):
@@ -60,11 +72,16 @@ class UserProfileView(DetailView):
     template_name = 'accounts/user_profile.html'
     context_object_name = 'profile_user'
     pk_url_kwarg = 'user_id'
+    query_budget = 11
+
+    def get_queryset(self):
+        return User.objects.select_related('profile')
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        profile_user = self.get_object()
+        profile_user = self.object
         context['user_profile'] = profile_user.profile
+        context.update(recent_activity_context(profile_user))
         if self.request.user.is_authenticated:
             context['is_connected'] = UserConnection.objects.filter(
                 from_user=self.request.user,
@@ -75,6 +92,7 @@ class UserProfileView(DetailView):
 class ConnectView(LoginRequiredMixin, DetailView):
     model = User
     pk_url_kwarg = 'user_id'
+    query_budget = 8
 
     def get(self, request, *args, **kwargs):
         to_user = self.get_object()
@@ -89,6 +107,7 @@ class ConnectView(LoginRequiredMixin, DetailView):
 class DisconnectView(LoginRequiredMixin, DetailView):
     model = User
     pk_url_kwarg = 'user_id'
+    query_budget = 8
 
     def get(self, request, *args, **kwargs):
         to_user = self.get_object()
@@ -103,9 +122,10 @@ class ConnectionsView(LoginRequiredMixin, ListView):
     model = UserConnection
     template_name = 'accounts/connections.html'
     context_object_name = 'connections'
+    query_budget = 4
 
     def get_queryset(self):
-        return UserConnection.objects.filter(from_user=self.request.user).select_related('to_user')
+        return UserConnection.objects.filter(from_user=self.request.user).select_related('to_user__profile')
 
 class LogoutView(LoginRequiredMixin, View):
     def get(self, request, *args, **kwargs):
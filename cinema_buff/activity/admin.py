@@ -0,0 +1,15 @@
+from django.contrib import admin
+from .models import Activity, FeedEntry
+
+@admin.register(Activity)
+class ActivityAdmin(admin.ModelAdmin):
+    list_display = ['actor', 'verb', 'movie', 'fanned_out', 'created_at']
+    list_filter = ['verb', 'fanned_out', 'created_at']
+    search_fields = ['actor__username', 'movie__title']
+    raw_id_fields = ['actor', 'movie', 'rating', 'review', 'post']
+
+@admin.register(FeedEntry)
+class FeedEntryAdmin(admin.ModelAdmin):
+    list_display = ['owner', 'actor', 'activity', 'created_at']
+    search_fields = ['owner__username', 'actor__username']
+    raw_id_fields = ['owner', 'actor', 'activity']
@@ -0,0 +1,98 @@
+"""
+Reading a user's activity feed.
+
+Most activity is pushed into per-follower FeedEntry rows by fan_out_activities shortly
+after it happens. Activity by accounts with ``ACTIVITY_FANOUT_LIMIT`` followers or more
+is never copied; it stays on the actor's own list with ``fanned_out`` unset and is pulled
+at read time, one index range scan per followed account over the limit. Activity of the
+other followed accounts that the worker has not copied yet is pulled too, from the last
+``ACTIVITY_PENDING_WINDOW`` seconds (default 600) only; an older backlog, such as that
+of an account that dropped below the limit, is left to fan_out_activities. Every source
+is walked by the same ``(created_at, id)`` key and cut at the page size, so a page reads
+at most a page of rows from each.
+"""
+import base64
+import binascii
+import heapq
+import json
+from datetime import datetime, timedelta
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+from accounts.models import UserConnection
+from .models import Activity, FeedEntry, fanout_limit
+
+
+class FeedPage:
+    def __init__(self, activities, next_cursor=None):
+        self.activities = activities
+        self.next_cursor = next_cursor
+
+    def __iter__(self):
+        return iter(self.activities)
+
+    def __len__(self):
+        return len(self.activities)
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+
+def encode_cursor(activity):
+    payload = json.dumps({'t': activity.created_at.isoformat(), 'i': activity.pk}, separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """The ``(created_at, id)`` position a cursor points after; ValueError if malformed"""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        return datetime.fromisoformat(payload['t']), int(payload['i'])
+    except (TypeError, KeyError, binascii.Error) as exc:
+        raise ValueError('Invalid cursor') from exc
+
+
+def older_than(queryset, position, id_field='id'):
+    """``queryset`` cut to the rows after ``position`` in newest-first order"""
+    if not position:
+        return queryset
+    created_at, activity_id = position
+    return queryset.filter(Q(created_at__lt=created_at) | Q(created_at=created_at, **{f'{id_field}__lt': activity_id}))
+
+
+def pull(queryset, position, per_page):
+    return list(older_than(queryset, position).select_related(*Activity.RELATED).order_by(
+        '-created_at', '-id'
+    )[:per_page + 1])
+
+
+def get_feed(user, cursor=None, per_page=20):
+    """One page of the user's feed, newest first; raises ValueError for a bad cursor"""
+    position = decode_cursor(cursor) if cursor else None
+
+    pushed = older_than(FeedEntry.objects.filter(owner=user), position, 'activity_id')
+    pushed = [
+        entry.activity for entry in pushed.select_related(
+            *(f'activity__{field}' for field in Activity.RELATED)
+        ).order_by('-created_at', '-activity_id')[:per_page + 1]
+    ]
+
+    followed = UserConnection.objects.filter(from_user=user)
+    celebrities = list(followed.filter(to_user__profile__follower_count__gte=fanout_limit()).values_list(
+        'to_user_id', flat=True
+    ))
+    pulled = [
+        pull(Activity.objects.filter(actor_id=actor_id, fanned_out=False), position, per_page)
+        for actor_id in celebrities
+    ]
+    window = timedelta(seconds=getattr(settings, 'ACTIVITY_PENDING_WINDOW', 600))
+    pending = Activity.objects.filter(
+        actor_id__in=followed.values('to_user_id'), fanned_out=False, created_at__gte=timezone.now() - window,
+    ).exclude(actor_id__in=celebrities)
+    pulled.append(pull(pending, position, per_page))
+
+    merged = list(heapq.merge(pushed, *pulled, key=lambda activity: (activity.created_at, activity.pk), reverse=True))
+    activities = merged[:per_page]
+    next_cursor = encode_cursor(activities[-1]) if len(merged) > per_page else None
+    return FeedPage(activities, next_cursor)
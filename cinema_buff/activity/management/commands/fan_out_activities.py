@@ -0,0 +1,32 @@
+import time
+from django.core.management.base import BaseCommand, CommandError
+from activity.models import Activity
+
+class Command(BaseCommand):
+    help = "Copy new activity into followers' feeds, outside the requests that create it"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--loop', action='store_true',
+                            help='Keep polling for new activity instead of exiting once none is waiting')
+        parser.add_argument('--interval', type=float, default=5.0,
+                            help='Seconds between polls with --loop (default: 5)')
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help='Activities fanned out per batch (default: 1000)')
+
+    def handle(self, *args, **options):
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size must be at least 1')
+
+        while True:
+            activities = entries = 0
+            while True:
+                fanned_out, written = Activity.fan_out_pending(options['batch_size'])
+                activities += fanned_out
+                entries += written
+                if fanned_out < options['batch_size']:
+                    break
+            if activities:
+                self.stdout.write(self.style.SUCCESS(f'Fanned out {activities} activities ({entries} feed entries)'))
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Count
+from activity.models import FeedEntry
+
+class Command(BaseCommand):
+    help = 'Cap every activity feed at its newest entries'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--keep', type=int, default=500,
+                            help='Entries kept per feed (default: 500)')
+
+    def handle(self, *args, **options):
+        keep = options['keep']
+        if keep < 1:
+            raise CommandError('--keep must be at least 1')
+        oversized = FeedEntry.objects.values('owner_id').annotate(entries=Count('id')).filter(entries__gt=keep)
+
+        trimmed = feeds = 0
+        for row in oversized.iterator():
+            owner_entries = FeedEntry.objects.filter(owner_id=row['owner_id'])
+            # The oldest entry to keep; everything sorting after it goes
+            created_at, activity_id = owner_entries.order_by('-created_at', '-activity_id').values_list(
+                'created_at', 'activity_id'
+            )[keep - 1]
+            deleted, _ = owner_entries.filter(created_at__lte=created_at).exclude(
+                created_at=created_at, activity_id__gte=activity_id
+            ).delete()
+            trimmed += deleted
+            feeds += 1
+
+        self.stdout.write(self.style.SUCCESS(f'Trimmed {trimmed} entries from {feeds} feeds'))
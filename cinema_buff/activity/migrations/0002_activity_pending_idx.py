@@ -0,0 +1,17 @@
+# Generated by Django 5.2.6 on 2026-10-18 09:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('activity', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='activity',
+            index=models.Index(condition=models.Q(('fanned_out', False)), fields=['actor', '-created_at', '-id'], name='activity_pending_idx'),
+        ),
+    ]
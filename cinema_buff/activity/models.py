@@ -0,0 +1,135 @@
+from collections import defaultdict
+from django.conf import settings
+from django.db import models, transaction
+from django.contrib.auth.models import User
+from django.utils import timezone
+from accounts.models import UserConnection, UserProfile
+from communities.models import DiscussionPost
+from movies.models import Movie, Rating, Review
+
+def fanout_limit():
+    """Follower count from which an account's activity is pulled by readers instead of pushed"""
+    return getattr(settings, 'ACTIVITY_FANOUT_LIMIT', 5000)
+
+class Activity(models.Model):
+    VERB_CHOICES = [
+        ('rated', 'Rated'),
+        ('reviewed', 'Reviewed'),
+        ('posted', 'Posted'),
+    ]
+
+    actor = models.ForeignKey(User, on_delete=models.CASCADE, related_name='activities')
+    verb = models.CharField(max_length=10, choices=VERB_CHOICES)
+    movie = models.ForeignKey(Movie, on_delete=models.CASCADE, null=True, blank=True, related_name='activities')
+    rating = models.ForeignKey(Rating, on_delete=models.CASCADE, null=True, blank=True, related_name='activities')
+    review = models.ForeignKey(Review, on_delete=models.CASCADE, null=True, blank=True, related_name='activities')
+    post = models.ForeignKey(DiscussionPost, on_delete=models.CASCADE, null=True, blank=True, related_name='activities')
+    # False while the activity lives only on the actor's own list, to be pulled by followers
+    fanned_out = models.BooleanField(default=False)
+    created_at = models.DateTimeField(default=timezone.now)
+
+    # Related rows needed to render an activity, fetched in the same query
+    RELATED = ('actor', 'movie', 'rating', 'review', 'post__community')
+
+    class Meta:
+        verbose_name_plural = 'activities'
+        indexes = [
+            models.Index(fields=['actor', '-created_at', '-id'], name='activity_actor_recent_idx'),
+            # What readers pull: activity not (yet) copied into feeds
+            models.Index(fields=['actor', '-created_at', '-id'], name='activity_pending_idx',
+                         condition=models.Q(fanned_out=False)),
+        ]
+
+    def __str__(self):
+        return f"{self.actor.username} {self.verb} at {self.created_at:%Y-%m-%d %H:%M}"
+
+    @classmethod
+    def publish(cls, actor_id, verb, **targets):
+        """
+        Record an activity. Followers pull it at read time until fan_out_activities copies
+        it into their feeds, so the request that caused it does not wait for the fan-out.
+        """
+        return cls.objects.create(actor_id=actor_id, verb=verb, **targets)
+
+    @classmethod
+    def publish_many(cls, actor_id, verb, targets):
+        """publish for many targets at once, with one insert"""
+        return cls.objects.bulk_create([cls(actor_id=actor_id, verb=verb, **target) for target in targets])
+
+    def fan_out(self):
+        """
+        Copy this activity into every follower's feed. Accounts with more followers than
+        ``ACTIVITY_FANOUT_LIMIT`` are skipped; their followers pull the activity at read time.
+        """
+        return Activity.fan_out_many(self.actor_id, [self])
+
+    @classmethod
+    def fan_out_many(cls, actor_id, activities):
+        """fan_out for several activities of one actor, reading the followers once"""
+        # Together, so readers find each activity either in the feeds or on the pull path
+        with transaction.atomic():
+            # Locking the profile, which every follow updates, orders this against a follow
+            # being made: either its follower is read here or its backfill sees the flag set
+            follower_count = UserProfile.objects.select_for_update().filter(user_id=actor_id).values_list(
+                'follower_count', flat=True
+            ).first() or 0
+            if follower_count >= fanout_limit():
+                return 0
+            follower_ids = list(UserConnection.objects.filter(to_user_id=actor_id).values_list(
+                'from_user_id', flat=True
+            ))
+            written = FeedEntry.push_many(activities, follower_ids)
+            cls.objects.filter(pk__in=[activity.pk for activity in activities]).update(fanned_out=True)
+        return written
+
+    @classmethod
+    def fan_out_pending(cls, limit=1000):
+        """
+        Fan out up to ``limit`` waiting activities, oldest first, of accounts under
+        ``ACTIVITY_FANOUT_LIMIT``; this includes the backlog of an account that has dropped
+        below it. Returns the number of activities fanned out and of feed entries written.
+        """
+        pending = list(cls.objects.filter(fanned_out=False).exclude(
+            actor__profile__follower_count__gte=fanout_limit()
+        ).order_by('id')[:limit])
+        by_actor = defaultdict(list)
+        for activity in pending:
+            by_actor[activity.actor_id].append(activity)
+        written = sum(cls.fan_out_many(actor_id, activities) for actor_id, activities in by_actor.items())
+        return len(pending), written
+
+class FeedEntry(models.Model):
+    """An activity pushed into one follower's feed; sort keys are copied from the activity"""
+    owner = models.ForeignKey(User, on_delete=models.CASCADE, related_name='feed_entries')
+    activity = models.ForeignKey(Activity, on_delete=models.CASCADE, related_name='feed_entries')
+    actor = models.ForeignKey(User, on_delete=models.CASCADE, related_name='+')
+    created_at = models.DateTimeField()
+
+    class Meta:
+        verbose_name_plural = 'feed entries'
+        unique_together = ('owner', 'activity')
+        indexes = [
+            models.Index(fields=['owner', '-created_at', '-activity'], name='feed_owner_recent_idx'),
+            models.Index(fields=['owner', 'actor'], name='feed_owner_actor_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.activity} for {self.owner.username}"
+
+    @classmethod
+    def push_many(cls, activities, owner_ids, batch_size=1000):
+        """Add each of ``activities`` to every feed in ``owner_ids``; returns the number of entries written"""
+        written = 0
+        batch = []
+        for activity in activities:
+            for owner_id in owner_ids:
+                batch.append(cls(owner_id=owner_id, activity=activity, actor_id=activity.actor_id,
+                                 created_at=activity.created_at))
+                if len(batch) >= batch_size:
+                    cls.objects.bulk_create(batch, ignore_conflicts=True)
+                    written += len(batch)
+                    batch = []
+        if batch:
+            cls.objects.bulk_create(batch, ignore_conflicts=True)
+            written += len(batch)
+        return written
@@ -0,0 +1,56 @@
+from django.conf import settings
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from accounts.models import UserConnection, UserProfile
+from communities.models import DiscussionPost
+from movies.batch import batch_saved
+from movies.models import Rating, Review
+from .models import Activity, FeedEntry
+
+@receiver(post_save, sender=Rating)
+def publish_rating(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        Activity.publish(instance.user_id, 'rated', movie_id=instance.movie_id, rating=instance)
+
+@receiver(post_save, sender=Review)
+def publish_review(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        Activity.publish(instance.user_id, 'reviewed', movie_id=instance.movie_id, review=instance)
+
+@receiver(batch_saved, sender=Rating)
+def publish_rating_batch(sender, user_id, created, **kwargs):
+    Activity.publish_many(user_id, 'rated', [{'movie_id': rating.movie_id, 'rating': rating} for rating in created])
+
+@receiver(batch_saved, sender=Review)
+def publish_review_batch(sender, user_id, created, **kwargs):
+    Activity.publish_many(user_id, 'reviewed', [{'movie_id': review.movie_id, 'review': review} for review in created])
+
+@receiver(post_save, sender=DiscussionPost)
+def publish_post(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        Activity.publish(instance.author_id, 'posted', post=instance)
+
+@receiver(post_save, sender=UserConnection)
+def backfill_feed(sender, instance, created, raw=False, **kwargs):
+    """
+    Give a new follower the followed account's recent activity. Only what was fanned out
+    is copied, whatever the account's follower count now; the rest is pulled at read time.
+    """
+    if not created or raw:
+        return
+    with transaction.atomic():
+        # Waits for a fan-out of the account in progress, which read the followers without this one
+        list(UserProfile.objects.select_for_update().filter(user_id=instance.to_user_id).values_list('pk', flat=True))
+        recent = Activity.objects.filter(actor_id=instance.to_user_id, fanned_out=True).order_by(
+            '-created_at', '-id'
+        )[:getattr(settings, 'ACTIVITY_FOLLOW_BACKFILL', 20)]
+        FeedEntry.objects.bulk_create([
+            FeedEntry(owner_id=instance.from_user_id, activity=activity, actor_id=activity.actor_id,
+                      created_at=activity.created_at)
+            for activity in recent
+        ], ignore_conflicts=True)
+
+@receiver(post_delete, sender=UserConnection)
+def clear_unfollowed(sender, instance, **kwargs):
+    FeedEntry.objects.filter(owner_id=instance.from_user_id, actor_id=instance.to_user_id).delete()
@@ -0,0 +1,104 @@
+from datetime import date
+from io import StringIO
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from accounts.models import UserConnection
+from movies.models import Movie, Rating
+from .feed import get_feed
+from .models import Activity, FeedEntry
+
+LOCMEM_CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+
+
+@override_settings(CACHES=LOCMEM_CACHES, ACTIVITY_FANOUT_LIMIT=2)
+class FeedTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.reader, cls.friend, cls.star, cls.fan, cls.other_fan = (
+            User.objects.create_user(name) for name in ('reader', 'friend', 'star', 'fan', 'other_fan')
+        )
+        cls.movies = [
+            Movie.objects.create(title=f'Movie {i}', synopsis='x', release_date=date(2000, 1, 1)) for i in range(30)
+        ]
+        UserConnection.objects.create(from_user=cls.reader, to_user=cls.friend)
+        # Two followers put the star at the fan-out limit
+        for follower in (cls.reader, cls.fan):
+            UserConnection.objects.create(from_user=follower, to_user=cls.star)
+
+    def rate(self, user, movie):
+        return Activity.objects.get(rating=Rating.objects.create(user=user, movie=movie))
+
+    def fan_out(self):
+        call_command('fan_out_activities', stdout=StringIO())
+
+    def test_new_activity_is_pulled_until_it_is_fanned_out(self):
+        activity = self.rate(self.friend, self.movies[0])
+        self.assertFalse(activity.fanned_out)
+        self.assertFalse(FeedEntry.objects.exists())
+        self.assertEqual(list(get_feed(self.reader)), [activity])
+
+        self.fan_out()
+        activity.refresh_from_db()
+        self.assertTrue(activity.fanned_out)
+        self.assertEqual(list(FeedEntry.objects.values_list('owner', flat=True)), [self.reader.pk])
+        self.assertEqual(list(get_feed(self.reader)), [activity])
+
+    def test_older_pending_activity_waits_for_the_worker(self):
+        activity = self.rate(self.friend, self.movies[0])
+        with override_settings(ACTIVITY_PENDING_WINDOW=0):
+            self.assertEqual(list(get_feed(self.reader)), [])
+            self.fan_out()
+            self.assertEqual(list(get_feed(self.reader)), [activity])
+
+    def test_activity_above_the_limit_stays_on_the_pull_path(self):
+        activity = self.rate(self.star, self.movies[0])
+        self.fan_out()
+        activity.refresh_from_db()
+        self.assertFalse(activity.fanned_out)
+        self.assertFalse(FeedEntry.objects.exists())
+        self.assertEqual(list(get_feed(self.reader)), [activity])
+        self.assertEqual(list(get_feed(self.fan)), [activity])
+
+    def test_activity_survives_the_author_dropping_below_the_limit(self):
+        activity = self.rate(self.star, self.movies[0])
+        self.fan_out()
+        UserConnection.objects.get(from_user=self.fan, to_user=self.star).delete()
+        self.assertEqual(list(get_feed(self.reader)), [activity])
+
+        # The backlog is fanned out now that the star is under the limit
+        self.fan_out()
+        activity.refresh_from_db()
+        self.assertTrue(activity.fanned_out)
+        self.assertEqual(list(get_feed(self.reader)), [activity])
+
+    def test_pages_merge_both_sources_in_order(self):
+        for i, movie in enumerate(self.movies):
+            self.rate(self.friend if i % 2 else self.star, movie)
+            if i == 15:
+                self.fan_out()
+        expected = list(Activity.objects.order_by('-created_at', '-id'))
+
+        seen, cursor = [], None
+        while True:
+            page = get_feed(self.reader, cursor, per_page=7)
+            seen += page.activities
+            if not page.has_next():
+                break
+            cursor = page.next_cursor
+        self.assertEqual(seen, expected)
+
+    def test_bad_cursor(self):
+        with self.assertRaises(ValueError):
+            get_feed(self.reader, 'not-a-cursor')
+
+    def test_follow_backfills_and_unfollow_clears(self):
+        activity = self.rate(self.friend, self.movies[0])
+        self.fan_out()
+        # This follow takes the friend to the limit; what was fanned out is still backfilled
+        connection = UserConnection.objects.create(from_user=self.other_fan, to_user=self.friend)
+        self.assertEqual(list(FeedEntry.objects.filter(owner=self.other_fan).values_list('activity', flat=True)),
+                         [activity.pk])
+        self.assertEqual(list(get_feed(self.other_fan)), [activity])
+        connection.delete()
+        self.assertEqual(list(get_feed(self.other_fan)), [])
@@ -0,0 +1,19 @@
+from django.contrib.auth.mixins import LoginRequiredMixin
+from django.http import Http404
+from django.views.generic import TemplateView
+from .feed import get_feed
+
+class FeedView(LoginRequiredMixin, TemplateView):
+    template_name = 'activity/feed.html'
+    paginate_by = 20
+    query_budget = 5
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        try:
+            page = get_feed(self.request.user, self.request.GET.get('cursor'), self.paginate_by)
+        except ValueError:
+            raise Http404('Invalid cursor')
+        context['activities'] = page.activities
+        context['page_obj'] = page
+        return context
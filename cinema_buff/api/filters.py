@@ -0,0 +1,47 @@
+import django_filters
+from rest_framework import filters
+from accounts.models import UserProfile
+from movies.models import Rating, Review
+from movies.search import get_search_backend
+
+
+class MovieSearchFilter(filters.BaseFilterBackend):
+    """Full-text ``?search=`` through the configured movie search backend"""
+    search_param = 'search'
+
+    def get_search_query(self, request):
+        return request.query_params.get(self.search_param, '').strip()
+
+    def filter_queryset(self, request, queryset, view):
+        query = self.get_search_query(request)
+        if not query:
+            return queryset
+        return get_search_backend().search(queryset, query)
+
+
+class MovieOrderingFilter(filters.OrderingFilter):
+    """Order searches by relevance unless the client asks for another ordering"""
+
+    def get_default_ordering(self, view):
+        if MovieSearchFilter().get_search_query(view.request):
+            return ['-search_rank', '-id']
+        return super().get_default_ordering(view)
+
+
+class MovieRatingFilter(django_filters.FilterSet):
+    """``?role=``, ``?since=`` and ``?until=`` (ISO 8601) for a movie's ratings"""
+    role = django_filters.ChoiceFilter(field_name='rater_role', choices=UserProfile.ROLE_CHOICES)
+    since = django_filters.IsoDateTimeFilter(field_name='created_at', lookup_expr='gte')
+    until = django_filters.IsoDateTimeFilter(field_name='created_at', lookup_expr='lt')
+
+    class Meta:
+        model = Rating
+        fields = ['role', 'since', 'until']
+
+
+class MovieReviewFilter(MovieRatingFilter):
+    role = django_filters.ChoiceFilter(field_name='user__profile__role', choices=UserProfile.ROLE_CHOICES)
+
+    class Meta:
+        model = Review
+        fields = ['role', 'since', 'until']
@@ -0,0 +1,13 @@
+from rest_framework.pagination import CursorPagination
+
+
+class CinemaCursorPagination(CursorPagination):
+    """Keyset pagination for API listings; deep pages cost the same as the first"""
+    page_size = 12
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    ordering = ('-created_at', '-id')
+
+
+class GenreCursorPagination(CinemaCursorPagination):
+    ordering = ('name',)
@@ -1,31 +1,126 @@
+from django.db.models import Prefetch
 from rest_framework import serializers
-from movies.models import Movie, Genre, Rating, Review
+from movies.models import Movie, Genre, Rating, Review, RatingStats
 from django.contrib.auth.models import User
+from activity.models import Activity
 
 class GenreSerializer(serializers.ModelSerializer):
+    query_budget = 1
     class Meta:
         model = Genre
         fields = '__all__'
 
-class MovieSerializer(serializers.ModelSerializer):
-    genres = GenreSerializer(many=True, read_only=True)
+class RatingStatsSerializer(serializers.ModelSerializer):
+    critic_audience_gap = serializers.ReadOnlyField()
+
+    class Meta:
+        model = RatingStats
+        fields = [
+            'total_ratings', 'user_ratings_count', 'critic_ratings_count',
+            'weighted_average', 'user_average', 'critic_average',
+            'story_average', 'acting_average', 'cinematography_average',
+            'score_stddev', 'user_stddev', 'critic_stddev', 'divergence', 'critic_audience_gap',
+            'histogram', 'user_histogram', 'critic_histogram',
+        ]
+
+def parse_names(value):
+    """Names from a comma separated query parameter such as ``?fields=id,title``"""
+    return [name for name in (part.strip() for part in (value or '').split(',')) if name]
+
+
+class SparseFieldsMixin:
+    """
+    Serializer taking ``fields``, the names to keep (all of them if empty), and ``expand``,
+    names from ``expandable_fields`` whose full nested representation replaces or adds to
+    the compact default. Expanded fields are kept whatever ``fields`` says.
+    """
+    # expansion name -> (field name, factory for the nested serializer)
+    expandable_fields = {}
+
+    def __init__(self, *args, fields=None, expand=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        expanded = set()
+        for name in expand or ():
+            if name in self.expandable_fields:
+                field_name, factory = self.expandable_fields[name]
+                self.fields[field_name] = factory()
+                expanded.add(field_name)
+        if fields:
+            for name in set(self.fields) - set(fields) - expanded:
+                self.fields.pop(name)
+
+    @classmethod
+    def unknown_names(cls, fields=(), expand=()):
+        """Errors, by parameter, for the ``fields`` and ``expand`` names this serializer does not have"""
+        errors = {}
+        known = set(cls().fields)
+        unknown = [name for name in fields if name not in known]
+        if unknown:
+            errors['fields'] = [f'Unknown field: {name}.' for name in unknown]
+        unknown = [name for name in expand if name not in cls.expandable_fields]
+        if unknown:
+            errors['expand'] = [f'Unknown expansion: {name}.' for name in unknown]
+        return errors
+
+class MovieSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    """
+    Movies with their genre ids and headline rating figures from RatingStats;
+    ``expand=genres`` nests the genres and ``expand=stats`` adds the full statistics.
+    """
+    query_budget = 2
+    genres = serializers.PrimaryKeyRelatedField(many=True, read_only=True)
     average_rating = serializers.ReadOnlyField()
     total_ratings = serializers.ReadOnlyField()
 
+    expandable_fields = {
+        'genres': ('genres', lambda: GenreSerializer(many=True, read_only=True)),
+        'stats': ('rating_stats', lambda: RatingStatsSerializer(read_only=True)),
+    }
+    # Loaded even when not asked for: the key and the columns lists are ordered by
+    always_loaded = ['id', 'title', 'release_date', 'created_at']
+
     class Meta:
         model = Movie
-        fields = '__all__'
+        # Listed rather than '__all__' so new columns (search_vector above all) stay out
+        # of the API until they are exposed on purpose; external_id lets import and sync
+        # clients match movies to their upstream catalog
+        fields = [
+            'id', 'external_id', 'title', 'synopsis', 'release_date', 'poster', 'content_type',
+            'genres', 'created_by', 'created_at', 'updated_at', 'average_rating', 'total_ratings',
+        ]
+        read_only_fields = ['external_id']
+
+    @classmethod
+    def plan_queryset(cls, queryset, fields=None, expand=()):
+        """``queryset`` set up to load exactly what the representation for ``fields`` and ``expand`` shows"""
+        def shown(name):
+            return not fields or name in fields
+
+        columns = {field.name for field in Movie._meta.concrete_fields} & set(cls.Meta.fields) & set(fields or ())
+        if 'stats' in expand or shown('average_rating') or shown('total_ratings'):
+            queryset = queryset.select_related('rating_stats')
+            columns.add('rating_stats')
+        if 'genres' in expand:
+            queryset = queryset.prefetch_related('genres')
+        elif shown('genres'):
+            queryset = queryset.prefetch_related(Prefetch('genres', queryset=Genre.objects.only('pk')))
+        if fields:
+            return queryset.only(*columns, *cls.always_loaded)
+        return queryset.defer('search_vector')
 
 class RatingSerializer(serializers.ModelSerializer):
+    query_budget = 1
     user = serializers.StringRelatedField(read_only=True)
     movie = serializers.StringRelatedField(read_only=True)
 
     class Meta:
         model = Rating
         fields = '__all__'
-        read_only_fields = ['user', 'created_at', 'updated_at']
+        # rater_role is copied from the rater's profile, not chosen by the client
+        read_only_fields = ['user', 'rater_role', 'created_at', 'updated_at']
 
 class ReviewSerializer(serializers.ModelSerializer):
+    query_budget = 1
     user = serializers.StringRelatedField(read_only=True)
     movie = serializers.StringRelatedField(read_only=True)
 
@@ -33,3 +128,19 @@ class ReviewSerializer(serializers.ModelSerializer):
         model = Review
         fields = '__all__'
         read_only_fields = ['user', 'created_at', 'updated_at']
+
+class ActivitySerializer(serializers.ModelSerializer):
+    query_budget = 1
+    actor = serializers.StringRelatedField(read_only=True)
+    movie = serializers.StringRelatedField(read_only=True)
+    score = serializers.SerializerMethodField()
+    review_title = serializers.CharField(source='review.title', read_only=True, default=None)
+    post_title = serializers.CharField(source='post.title', read_only=True, default=None)
+    community = serializers.CharField(source='post.community.name', read_only=True, default=None)
+
+    class Meta:
+        model = Activity
+        fields = ['id', 'actor', 'verb', 'movie', 'score', 'review_title', 'post_title', 'community', 'created_at']
+
+    def get_score(self, obj):
+        return obj.rating.calculated_overall_score if obj.rating_id else None
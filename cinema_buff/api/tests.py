@@ -1,3 +1,207 @@
-from django.test import TestCase
+from datetime import date
+from io import StringIO
+from unittest import mock
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.db import connection
+from django.urls import reverse
+from activity.models import Activity
+from movies.models import Genre, Movie, Rating, RatingStats, Review
 
-# Create your tests here.
+LOCMEM_CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class MovieApiTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.genre = Genre.objects.create(name='Drama')
+        cls.movie = Movie.objects.create(title='Heat', synopsis='Cops and robbers.', release_date=date(1995, 12, 15))
+        cls.movie.genres.add(cls.genre)
+
+    def test_movie_fields_leave_out_search_vector(self):
+        response = self.client.get(reverse('movie-detail', args=[self.movie.pk]))
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('search_vector', response.json())
+        self.assertEqual(response.json()['external_id'], None)
+        self.assertEqual(response.json()['genres'], [self.genre.pk])
+
+    def test_search_vector_is_never_selected(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(reverse('movie-list'))
+            self.client.get(reverse('movie-list') + '?fields=id,search_vector')
+        movie_queries = [query['sql'] for query in queries if 'FROM "movies_movie"' in query['sql']]
+        self.assertTrue(movie_queries)
+        for sql in movie_queries:
+            self.assertNotIn('"search_vector"', sql.split(' FROM ')[0])
+
+    def test_sparse_fields_and_expansions(self):
+        response = self.client.get(reverse('movie-list') + '?fields=id,title&expand=genres')
+        row, = response.json()['results']
+        self.assertEqual(set(row), {'id', 'title', 'genres'})
+        self.assertEqual(row['genres'][0]['name'], 'Drama')
+
+    def test_unknown_fields_and_expansions_are_rejected(self):
+        for url in (reverse('movie-list'), reverse('movie-detail', args=[self.movie.pk])):
+            response = self.client.get(url + '?fields=id,bogus')
+            self.assertEqual(response.status_code, 400, url)
+            self.assertEqual(response.json(), {'fields': ['Unknown field: bogus.']})
+            response = self.client.get(url + '?expand=cast')
+            self.assertEqual(response.status_code, 400, url)
+            self.assertEqual(response.json(), {'expand': ['Unknown expansion: cast.']})
+
+    def test_search_pages_with_tied_ranks_do_not_repeat(self):
+        movies = [
+            Movie.objects.create(title=f'Great Escape {i}', synopsis='x', release_date=date(2000, 1, 1))
+            for i in range(11)
+        ]
+        seen = []
+        url = reverse('movie-list') + '?search=great&page_size=4'
+        while url:
+            page = self.client.get(url).json()
+            seen += [row['id'] for row in page['results']]
+            url = page['next']
+        self.assertEqual(sorted(seen), sorted(movie.pk for movie in movies))
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class RatingApiTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('rater')
+        cls.movie = Movie.objects.create(title='Heat', synopsis='x', release_date=date(1995, 12, 15))
+
+    def test_rater_role_cannot_be_set_by_the_client(self):
+        rating = Rating.objects.create(user=self.user, movie=self.movie, story_score=7)
+        self.client.force_login(self.user)
+        url = reverse('rating-detail', args=[rating.pk])
+        response = self.client.patch(url, {'rater_role': 'critic'}, content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['rater_role'], 'user')
+        self.assertEqual(Rating.objects.get(pk=rating.pk).rater_role, 'user')
+        stats = RatingStats.objects.get(movie=self.movie)
+        self.assertEqual((stats.user_ratings_count, stats.critic_ratings_count), (1, 0))
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class BatchUpsertTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('batcher')
+        cls.movies = [
+            Movie.objects.create(title=f'Movie {i}', synopsis='x', release_date=date(2000, 1, 1)) for i in range(3)
+        ]
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def post(self, name, items):
+        return self.client.post(reverse(name), {'items': items}, content_type='application/json')
+
+    def assertStatsMatchRatings(self, movie):
+        stats = RatingStats.objects.get(movie=movie)
+        counters = RatingStats.counters_from_aggregate(
+            Rating.objects.filter(movie=movie).aggregate(**RatingStats.aggregate_expressions())
+        )
+        self.assertEqual(stats.counters(), counters)
+
+    def test_ratings_are_created_updated_and_reported_per_item(self):
+        first, second, third = self.movies
+        response = self.post('rating-batch', [
+            {'movie': first.pk, 'story_score': 8, 'acting_score': 7, 'cinematography_score': 9},
+            {'movie': second.pk, 'story_score': 11},
+            {'movie': 0, 'story_score': 5},
+            {'movie': first.pk, 'story_score': 2},
+            {'movie': third.pk},
+        ])
+        self.assertEqual(response.status_code, 200)
+        body = response.json()
+        self.assertEqual({key: body[key] for key in ('created', 'updated', 'unchanged', 'error')},
+                         {'created': 2, 'updated': 0, 'unchanged': 0, 'error': 3})
+        self.assertEqual([result['status'] for result in body['results']],
+                         ['created', 'error', 'error', 'error', 'created'])
+        self.assertIn('story_score', body['results'][1]['errors'])
+        self.assertEqual(Activity.objects.filter(actor=self.user, verb='rated').count(), 2)
+
+        response = self.post('rating-batch', [
+            {'movie': first.pk, 'story_score': 3},
+            {'movie': third.pk, 'story_score': 5},
+        ])
+        self.assertEqual([result['status'] for result in response.json()['results']], ['updated', 'unchanged'])
+        rating = Rating.objects.get(user=self.user, movie=first)
+        self.assertEqual((rating.story_score, rating.acting_score), (3, 7))
+        for movie in self.movies:
+            self.assertStatsMatchRatings(movie)
+        # Updates are not new activity
+        self.assertEqual(Activity.objects.filter(actor=self.user, verb='rated').count(), 2)
+
+    def test_reviews(self):
+        movie = self.movies[0]
+        response = self.post('review-batch', [{'movie': movie.pk, 'title': 'Good', 'content': 'Liked it.'}])
+        self.assertEqual(response.json()['created'], 1)
+        response = self.post('review-batch', [{'movie': movie.pk, 'content': 'Loved it.'}])
+        self.assertEqual(response.json()['updated'], 1)
+        review = Review.objects.get(user=self.user, movie=movie)
+        self.assertEqual((review.title, review.content), ('Good', 'Loved it.'))
+
+    def test_inserts_lock_the_movies_before_reading_existing_rows(self):
+        first, second, third = self.movies
+        with mock.patch.object(Movie, 'lock_for_feedback', wraps=Movie.lock_for_feedback) as lock:
+            self.post('rating-batch', [{'movie': second.pk, 'story_score': 5}, {'movie': first.pk, 'story_score': 5}])
+            Rating.objects.create(user=self.user, movie=third, story_score=5)
+            Review.objects.create(user=self.user, movie=third, title='Good', content='x')
+        self.assertEqual([sorted(call.args[0]) for call in lock.call_args_list],
+                         [[first.pk, second.pk], [third.pk], [third.pk]])
+
+    def test_empty_or_oversized_batches_are_rejected(self):
+        self.assertEqual(self.post('rating-batch', []).status_code, 400)
+        with override_settings(BATCH_UPSERT_MAX_ITEMS=1):
+            self.assertEqual(self.post('rating-batch', [{'movie': 1}, {'movie': 2}]).status_code, 400)
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class MovieFeedbackCacheTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.movie = Movie.objects.create(title='Heat', synopsis='x', release_date=date(1995, 12, 15))
+        cls.user = User.objects.create_user('reviewer')
+        Rating.objects.create(user=cls.user, movie=cls.movie, story_score=8)
+        Review.objects.create(user=cls.user, movie=cls.movie, title='Good', content='Liked it.')
+
+    def setUp(self):
+        cache.clear()
+
+    def get(self, name, **extra):
+        return self.client.get(reverse(name, args=[self.movie.pk]), **extra)
+
+    def test_username_change_expires_cached_pages(self):
+        before = self.get('movie-reviews')
+        self.assertEqual(before.json()['results'][0]['user'], 'reviewer')
+
+        user = User.objects.get(pk=self.user.pk)
+        user.username = 'renamed'
+        user.save()
+        after = self.get('movie-reviews')
+        self.assertEqual(after.json()['results'][0]['user'], 'renamed')
+        self.assertNotEqual(after['ETag'], before['ETag'])
+
+    def test_role_change_expires_cached_pages(self):
+        before = self.get('movie-ratings')
+        self.assertEqual(before.json()['results'][0]['rater_role'], 'user')
+
+        call_command('set_user_roles', 'reviewer', '--role', 'critic', stdout=StringIO())
+        after = self.get('movie-ratings')
+        self.assertEqual(after.json()['results'][0]['rater_role'], 'critic')
+        self.assertNotEqual(after['ETag'], before['ETag'])
+
+    def test_renderers_get_their_own_etag(self):
+        as_json = self.get('movie-reviews', HTTP_ACCEPT='application/json')
+        browsable = self.get('movie-reviews', HTTP_ACCEPT='text/html')
+        self.assertEqual(browsable['Content-Type'].split(';')[0], 'text/html')
+        self.assertNotEqual(as_json['ETag'], browsable['ETag'])
+        # The JSON validator does not revalidate the browsable page
+        response = self.get('movie-reviews', HTTP_ACCEPT='text/html', HTTP_IF_NONE_MATCH=as_json['ETag'])
+        self.assertEqual(response.status_code, 200)
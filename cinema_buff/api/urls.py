@@ -7,6 +7,7 @@ router.register(r'movies', views.MovieViewSet)
 router.register(r'genres', views.GenreViewSet)
 router.register(r'ratings', views.RatingViewSet)
 router.register(r'reviews', views.ReviewViewSet)
+router.register(r'feed', views.FeedViewSet, basename='feed')
 
 urlpatterns = [
     path('', include(router.urls)),
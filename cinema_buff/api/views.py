@@ -1,33 +1,153 @@
+from functools import partial
+from urllib.parse import urlencode
+from django.conf import settings
+from django.db.models import Count, Max
 from rest_framework import viewsets, permissions, filters
 from rest_framework.decorators import action
+from rest_framework.exceptions import NotFound, ValidationError
 from rest_framework.response import Response
 from django_filters.rest_framework import DjangoFilterBackend
 from movies.models import Movie, Genre, Rating, Review
-from .serializers import MovieSerializer, GenreSerializer, RatingSerializer, ReviewSerializer
+from movies.autocomplete import get_title_index
+from movies.batch import upsert_ratings, upsert_reviews
+from recommendations.models import ItemNeighbor
+from activity.feed import get_feed
+from perf.conditional import conditional_get, latest, make_etag
+from perf.metrics import count_cache_lookup
+from perf.pagecache import page_cache, page_versions
+from .serializers import MovieSerializer, GenreSerializer, RatingSerializer, ReviewSerializer, ActivitySerializer, parse_names
+from .pagination import CinemaCursorPagination, GenreCursorPagination
+from .filters import MovieSearchFilter, MovieOrderingFilter, MovieRatingFilter, MovieReviewFilter
 
 class MovieViewSet(viewsets.ReadOnlyModelViewSet):
+    """
+    Movies, with sparse fieldsets (``?fields=id,title``) and opt-in expansions
+    (``?expand=stats,genres``); the queryset only loads what the response shows.
+    """
     queryset = Movie.objects.all()
     serializer_class = MovieSerializer
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
+    filter_backends = [DjangoFilterBackend, MovieSearchFilter, MovieOrderingFilter]
     filterset_fields = ['genres']
-    search_fields = ['title', 'synopsis']
     ordering_fields = ['title', 'release_date', 'created_at']
-    ordering = ['-created_at']
+    ordering = ['-created_at', '-id']
+    pagination_class = CinemaCursorPagination
+    query_budget = 4
 
-    @action(detail=True, methods=['get'])
-    def ratings(self, request, pk=None):
-        movie = self.get_object()
-        ratings = movie.ratings.all()
-        serializer = RatingSerializer(ratings, many=True)
+    def requested_fields(self):
+        return self.requested_names('fields')
+
+    def requested_expansions(self):
+        return self.requested_names('expand')
+
+    def requested_names(self, param):
+        """Names from ``?fields=`` or ``?expand=``; a 400 names any the serializer does not know"""
+        names = parse_names(self.request.query_params.get(param))
+        errors = MovieSerializer.unknown_names(**{param: names})
+        if errors:
+            raise ValidationError(errors)
+        return names
+
+    def get_queryset(self):
+        return MovieSerializer.plan_queryset(super().get_queryset(), self.requested_fields(), self.requested_expansions())
+
+    def get_serializer(self, *args, **kwargs):
+        kwargs.setdefault('fields', self.requested_fields())
+        kwargs.setdefault('expand', self.requested_expansions())
+        return super().get_serializer(*args, **kwargs)
+
+    def list(self, request, *args, **kwargs):
+        return conditional_get(request, self.list_validators(), partial(super().list, request, *args, **kwargs))
+
+    def retrieve(self, request, *args, **kwargs):
+        return conditional_get(request, self.retrieve_validators(), partial(super().retrieve, request, *args, **kwargs))
+
+    def list_validators(self):
+        """Validators over every movie the filters select, whichever page is asked for"""
+        row = self.filter_queryset(self.get_queryset()).order_by().aggregate(
+            count=Count('pk'), movies=Max('updated_at'), stats=Max('rating_stats__updated_at'),
+        )
+        genres_version, = page_versions(['genres'])
+        etag = make_etag(row['count'], row['movies'], row['stats'], genres_version, self.request.accepted_renderer.format)
+        return etag, latest(row['movies'], row['stats'])
+
+    def retrieve_validators(self):
+        row = Movie.objects.filter(pk=self.kwargs['pk']).values_list(
+            'updated_at', 'rating_stats__updated_at', 'rating_stats__version',
+        ).first()
+        if row is None:
+            return None
+        genres_version, = page_versions(['genres'])
+        etag = make_etag(self.kwargs['pk'], *row, genres_version, self.request.accepted_renderer.format)
+        return etag, latest(row[0], row[1])
+
+    @action(detail=False, methods=['get'], query_budget=1)
+    def autocomplete(self, request):
+        """Top title matches for a typed prefix, served from the in-memory title index"""
+        try:
+            limit = max(1, min(int(request.query_params.get('limit', 10)), 25))
+        except ValueError:
+            limit = 10
+        return Response(get_title_index().suggest(request.query_params.get('q', ''), limit))
+
+    @action(detail=False, methods=['get'], permission_classes=[permissions.IsAuthenticated], query_budget=6)
+    def recommended(self, request):
+        """Personal recommendations from the precomputed item neighbours"""
+        try:
+            limit = max(1, min(int(request.query_params.get('limit', 24)), 100))
+        except ValueError:
+            limit = 24
+        movies = ItemNeighbor.recommend_for(request.user, limit=limit)
+        serializer = self.get_serializer(movies, many=True)
         return Response(serializer.data)
 
-    @action(detail=True, methods=['get'])
+    @action(detail=True, methods=['get'], query_budget=4)
+    def ratings(self, request, pk=None):
+        """The movie's ratings, newest first, filterable by ``role``, ``since`` and ``until``"""
+        return self.movie_feedback(request, pk, Rating.objects.all(), RatingSerializer, MovieRatingFilter)
+
+    @action(detail=True, methods=['get'], query_budget=4)
     def reviews(self, request, pk=None):
-        movie = self.get_object()
-        reviews = movie.reviews.all()
-        serializer = ReviewSerializer(reviews, many=True)
-        return Response(serializer.data)
+        """The movie's reviews, newest first, filterable by ``role``, ``since`` and ``until``"""
+        return self.movie_feedback(request, pk, Review.objects.all(), ReviewSerializer, MovieReviewFilter)
+
+    def movie_feedback(self, request, pk, queryset, serializer_class, filterset_class):
+        """
+        One cursor page of a movie's ratings or reviews.
+
+        Pages are cached, and carry an ETag, under the movie's rating statistics version
+        and page version, which every rating and review, and every role or username
+        change of their authors, moves on.
+        """
+        row = Movie.objects.filter(pk=pk).values_list('pk', 'rating_stats__version').first()
+        if row is None:
+            raise NotFound()
+        movie_version, = page_versions([f'movie:{pk}'])
+        params = urlencode(sorted(request.query_params.items()))
+        # JSON and the browsable API are different representations of the same URL
+        etag = make_etag(self.action, pk, row[1], movie_version, request.get_host(), params,
+                         request.accepted_renderer.format)
+
+        def respond():
+            key = f'api:{self.action}:{etag}'
+            data = page_cache().get(key)
+            if data is not None:
+                count_cache_lookup('api', hits=1)
+                return Response(data)
+            count_cache_lookup('api', misses=1)
+            filterset = filterset_class(
+                request.query_params, queryset=queryset.filter(movie_id=pk).select_related('user', 'movie'),
+            )
+            if not filterset.is_valid():
+                raise ValidationError(filterset.errors)
+            paginator = CinemaCursorPagination()
+            # No view, so the movie ordering filter is not applied to ratings and reviews
+            page = paginator.paginate_queryset(filterset.qs, request)
+            data = paginator.get_paginated_response(serializer_class(page, many=True).data).data
+            page_cache().set(key, data, timeout=getattr(settings, 'PAGE_CACHE_TIMEOUT', 600))
+            return Response(data)
+
+        return conditional_get(request, (etag, None), respond)
 
 class GenreViewSet(viewsets.ReadOnlyModelViewSet):
     queryset = Genre.objects.all()
@@ -35,6 +155,38 @@ class GenreViewSet(viewsets.ReadOnlyModelViewSet):
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
     filter_backends = [filters.SearchFilter]
     search_fields = ['name']
+    pagination_class = GenreCursorPagination
+    query_budget = 2
+
+    def list(self, request, *args, **kwargs):
+        row = self.filter_queryset(self.get_queryset()).order_by().aggregate(count=Count('pk'), latest=Max('updated_at'))
+        validators = make_etag(row['count'], row['latest'], request.accepted_renderer.format), row['latest']
+        return conditional_get(request, validators, partial(super().list, request, *args, **kwargs))
+
+    def retrieve(self, request, *args, **kwargs):
+        updated_at = Genre.objects.filter(pk=self.kwargs['pk']).values_list('updated_at', flat=True).first()
+        etag = make_etag(self.kwargs['pk'], updated_at, request.accepted_renderer.format)
+        validators = (etag, updated_at) if updated_at else None
+        return conditional_get(request, validators, partial(super().retrieve, request, *args, **kwargs))
+
+def batch_upsert(request, upsert):
+    """
+    Run ``upsert`` over ``{"items": [...]}`` for the requesting user and report each item.
+
+    Batches hold at most BATCH_UPSERT_MAX_ITEMS items (default 500).
+    """
+    items = request.data.get('items') if isinstance(request.data, dict) else None
+    if not isinstance(items, list) or not items:
+        raise ValidationError({'items': ['Expected a non-empty list of items.']})
+    limit = getattr(settings, 'BATCH_UPSERT_MAX_ITEMS', 500)
+    if len(items) > limit:
+        raise ValidationError({'items': [f'At most {limit} items per batch.']})
+
+    results = upsert(request.user, items)
+    counts = {status: 0 for status in ('created', 'updated', 'unchanged', 'error')}
+    for result in results:
+        counts[result['status']] += 1
+    return Response({**counts, 'results': results})
 
 class RatingViewSet(viewsets.ModelViewSet):
     serializer_class = RatingSerializer
@@ -42,26 +194,67 @@ class RatingViewSet(viewsets.ModelViewSet):
     filter_backends = [DjangoFilterBackend]
     filterset_fields = ['movie', 'user']
     queryset = Rating.objects.all()
+    pagination_class = CinemaCursorPagination
+    query_budget = 6
 
     def get_queryset(self):
+        queryset = Rating.objects.select_related('user', 'movie')
         if self.request.user.is_staff:
-            return Rating.objects.all()
-        return Rating.objects.filter(user=self.request.user)
+            return queryset
+        return queryset.filter(user=self.request.user)
 
     def perform_create(self, serializer):
         serializer.save(user=self.request.user)
 
+    @action(detail=False, methods=['post'], query_budget=20)
+    def batch(self, request):
+        """Create or update many of the user's ratings in one transaction"""
+        return batch_upsert(request, upsert_ratings)
+
 class ReviewViewSet(viewsets.ModelViewSet):
     serializer_class = ReviewSerializer
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
     filter_backends = [DjangoFilterBackend]
     filterset_fields = ['movie', 'user']
     queryset = Review.objects.all()
+    pagination_class = CinemaCursorPagination
+    query_budget = 6
 
     def get_queryset(self):
+        queryset = Review.objects.select_related('user', 'movie')
         if self.request.user.is_staff:
-            return Review.objects.all()
-        return Review.objects.filter(user=self.request.user)
+            return queryset
+        return queryset.filter(user=self.request.user)
 
     def perform_create(self, serializer):
         serializer.save(user=self.request.user)
+
+    @action(detail=False, methods=['post'], permission_classes=[permissions.IsAuthenticated], query_budget=16)
+    def batch(self, request):
+        """Create or update many of the user's reviews in one transaction"""
+        return batch_upsert(request, upsert_reviews)
+
+class FeedViewSet(viewsets.ViewSet):
+    """The authenticated user's activity feed, newest first, paged with ``?cursor=``"""
+    permission_classes = [permissions.IsAuthenticated]
+    query_budget = 5
+
+    def list(self, request):
+        try:
+            page_size = max(1, min(int(request.query_params.get('page_size', 20)), 100))
+        except ValueError:
+            page_size = 20
+        try:
+            page = get_feed(request.user, request.query_params.get('cursor'), page_size)
+        except ValueError:
+            raise NotFound('Invalid cursor')
+
+        next_url = None
+        if page.has_next():
+            next_url = request.build_absolute_uri(
+                f'{request.path}?cursor={page.next_cursor}&page_size={page_size}'
+            )
+        return Response({
+            'next': next_url,
+            'results': ActivitySerializer(page.activities, many=True).data,
+        })
@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -43,18 +44,26 @@ INSTALLED_APPS = [
     'accounts',
     'movies',
     'communities',
+    'recommendations',
+    'activity',
+    'perf',
     'api',
 ]
 
 MIDDLEWARE = [
+    'perf.middleware.MetricsMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'accounts.context.UserContextMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'perf.middleware.SlowQueryMiddleware',
+    'perf.middleware.QueryBudgetMiddleware',
+    'perf.middleware.ProfileMiddleware',
 ]
 
 ROOT_URLCONF = 'cinema_buff.urls'
@@ -69,6 +78,7 @@ TEMPLATES = [
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
+                'accounts.context.user_context',
             ],
         },
     },
@@ -92,6 +102,40 @@ DATABASES = {
 }
 
 
+# Cache
+# The page cache (perf.pagecache) needs a cache every worker process shares: files on
+# a single machine, Redis when REDIS_URL is set and workers run on several machines.
+
+if os.environ.get('REDIS_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.environ['REDIS_URL'],
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': os.environ.get('CACHE_DIR', '/tmp/cinema_buff_cache'),
+            'OPTIONS': {'MAX_ENTRIES': 10000},
+        }
+    }
+
+
+# Sessions and authentication
+# Sessions and logged-in users are read from the cache above and only fall back to the
+# database on a miss (accounts.sessions, accounts.backends). ModelBackend stays listed so
+# sessions created before CachedModelBackend keep working until they expire.
+
+SESSION_ENGINE = 'accounts.sessions'
+
+AUTHENTICATION_BACKENDS = [
+    'accounts.backends.CachedModelBackend',
+    'django.contrib.auth.backends.ModelBackend',
+]
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
@@ -166,3 +210,31 @@ LOGOUT_REDIRECT_URL = 'home'
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
+
+# Bearer token the Prometheus scraper sends to /metrics (see perf.views.metrics)
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN')
+
+# Slow queries (see perf.slowlog) go to a file as JSON lines. Every gunicorn worker
+# appends to it, so rotation is left to logrotate: WatchedFileHandler reopens the file
+# once it has been moved, where each worker rotating it on its own would lose records
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'formatters': {
+        'message': {'format': '%(asctime)s %(message)s'},
+    },
+    'handlers': {
+        'slow_queries': {
+            'class': 'logging.handlers.WatchedFileHandler',
+            'filename': BASE_DIR / 'slow_queries.log',
+            'formatter': 'message',
+        },
+    },
+    'loggers': {
+        'perf.slow_queries': {
+            'handlers': ['slow_queries'],
+            'level': 'WARNING',
+            'propagate': False,
+        },
+    },
+}
@@ -26,7 +26,10 @@ urlpatterns = [
     path('accounts/', include('accounts.urls')),
     path('movies/', include('movies.urls')),
     path('communities/', include('communities.urls')),
+    path('recommendations/', include('recommendations.urls')),
+    path('activity/', include('activity.urls')),
     path('api/', include('api.urls')),
+    path('', include('perf.urls')),
 ]
 
 if settings.DEBUG:
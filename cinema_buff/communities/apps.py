@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class CommunitiesConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'communities'
+
+    def ready(self):
+        import communities.signals
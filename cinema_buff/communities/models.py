@@ -18,6 +18,9 @@ class Community(models.Model):
 
     @property
     def member_count(self):
+        # List views annotate member_total so each card does not count separately
+        if hasattr(self, 'member_total'):
+            return self.member_total
         return self.members.count()
     
     @property
@@ -54,6 +57,8 @@ class DiscussionPost(models.Model):
 
     @property
     def comment_count(self):
+        if hasattr(self, 'comment_total'):
+            return self.comment_total
         return self.comments.count()
 
     @property
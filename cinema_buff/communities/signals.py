@@ -0,0 +1,28 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from accounts.context import invalidate_user_context
+from perf.pagecache import bump_page_versions
+from .models import Community, CommunityMember, DiscussionComment, DiscussionPost
+
+@receiver(post_save, sender=Community)
+@receiver(post_delete, sender=Community)
+def expire_community_pages(sender, instance, **kwargs):
+    bump_page_versions('communities', f'community:{instance.pk}')
+
+@receiver(post_save, sender=CommunityMember)
+@receiver(post_delete, sender=CommunityMember)
+@receiver(post_save, sender=DiscussionPost)
+@receiver(post_delete, sender=DiscussionPost)
+def expire_member_and_post_pages(sender, instance, **kwargs):
+    """Member and post counts show on the community list, the rest on its page"""
+    bump_page_versions('communities', f'community:{instance.community_id}')
+
+@receiver(post_save, sender=CommunityMember)
+@receiver(post_delete, sender=CommunityMember)
+def expire_community_ids(sender, instance, **kwargs):
+    invalidate_user_context(instance.user_id, 'community_ids')
+
+@receiver(post_save, sender=DiscussionComment)
+@receiver(post_delete, sender=DiscussionComment)
+def expire_comment_pages(sender, instance, **kwargs):
+    bump_page_versions(f'community:{instance.post.community_id}')
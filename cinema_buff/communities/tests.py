@@ -1,3 +1,45 @@
-from django.test import TestCase
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from movies.models import Genre
+from .models import Community, CommunityMember, DiscussionPost
 
-# Create your tests here.
+LOCMEM_CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class CommunityPageTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.community = Community.objects.create(genre=Genre.objects.create(name='Drama'), name='Drama Club',
+                                                 description='x')
+        cls.user = User.objects.create_user('member')
+
+    def setUp(self):
+        cache.clear()
+
+    def test_new_posts_and_members_expire_the_cached_pages(self):
+        detail = reverse('communities:community_detail', args=[self.community.pk])
+        listing = reverse('communities:community_list')
+        for url in (detail, listing):
+            self.client.get(url)
+            self.assertEqual(self.client.get(url)['X-Page-Cache'], 'hit')
+
+        DiscussionPost.objects.create(community=self.community, author=self.user, title='Best of 1995', content='x')
+        response = self.client.get(detail)
+        self.assertEqual(response['X-Page-Cache'], 'miss')
+        self.assertContains(response, 'Best of 1995')
+
+        CommunityMember.objects.create(community=self.community, user=self.user)
+        self.assertEqual(self.client.get(listing)['X-Page-Cache'], 'miss')
+
+    def test_membership_is_seen_on_the_next_request(self):
+        self.client.force_login(self.user)
+        self.client.get(reverse('communities:join_community', args=[self.community.pk]))
+        response = self.client.get(reverse('communities:community_detail', args=[self.community.pk]))
+        self.assertTrue(response.context['is_member'])
+
+        self.client.get(reverse('communities:leave_community', args=[self.community.pk]))
+        response = self.client.get(reverse('communities:community_detail', args=[self.community.pk]))
+        self.assertFalse(response.context['is_member'])
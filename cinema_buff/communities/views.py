@@ -3,49 +3,60 @@ from django.contrib.auth.mixins import LoginRequiredMixin
 from django.views.generic import ListView, DetailView, CreateView
 from django.contrib import messages
 from django.urls import reverse_lazy
+from django.db.models import Count
 from .models import Community, CommunityMember, DiscussionPost, DiscussionComment
 from movies.models import Movie
 from .forms import DiscussionPostForm, DiscussionCommentForm
+from perf.pagecache import AnonymousPageCacheMixin
 
-class CommunityListView(ListView):
+class CommunityListView(AnonymousPageCacheMixin, ListView):
     model = Community
     template_name = 'communities/community_list.html'
     context_object_name = 'communities'
+    query_budget = 5
+    page_cache_versions = ('communities',)
 
     def get_queryset(self):
-        return Community.objects.all().select_related('genre').prefetch_related('members')
+        return Community.objects.all().select_related('genre').annotate(member_total=Count('members'))
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         if self.request.user.is_authenticated:
-            user_communities = CommunityMember.objects.filter(user=self.request.user).values_list('community_id', flat=True)
-            context['user_communities'] = set(user_communities)
+            context['user_communities'] = self.request.user_context.community_ids
         return context
 
-class CommunityDetailView(DetailView):
+class CommunityDetailView(AnonymousPageCacheMixin, DetailView):
     model = Community
     template_name = 'communities/community_detail.html'
     context_object_name = 'community'
+    query_budget = 9
+
+    def get_page_cache_versions(self):
+        # Lists the genre's movies with their rating stats
+        return ['movies', f"community:{self.kwargs['pk']}"]
+
+    def get_queryset(self):
+        return Community.objects.select_related('genre').annotate(member_total=Count('members'))
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        community = self.get_object()
+        community = self.object
         
-        context['movies'] = Movie.objects.filter(genres=community.genre).prefetch_related('genres', 'ratings')
-        context['members'] = CommunityMember.objects.filter(community=community).select_related('user')
-        context['posts'] = community.posts.all().select_related('author').prefetch_related('comments')
+        context['movies'] = Movie.objects.filter(genres=community.genre).defer('search_vector').select_related('rating_stats')
+        context['members'] = CommunityMember.objects.filter(
+            community=community
+        ).select_related('user').order_by('-joined_at')[:5]
+        context['posts'] = community.posts.all().select_related('author').annotate(comment_total=Count('comments'))
         
         if self.request.user.is_authenticated:
-            context['is_member'] = CommunityMember.objects.filter(
-                community=community,
-                user=self.request.user
-            ).exists()
+            context['is_member'] = self.request.user_context.is_member(community.pk)
         
         return context
 
 class JoinCommunityView(LoginRequiredMixin, DetailView):
     model = Community
     pk_url_kwarg = 'community_id'
+    query_budget = 8
 
     def get(self, request, *args, **kwargs):
         community = self.get_object()
@@ -64,6 +75,7 @@ class JoinCommunityView(LoginRequiredMixin, DetailView):
 class LeaveCommunityView(LoginRequiredMixin, DetailView):
     model = Community
     pk_url_kwarg = 'community_id'
+    query_budget = 8
 
     def get(self, request, *args, **kwargs):
         community = self.get_object()
@@ -79,12 +91,13 @@ class CreateDiscussionPostView(LoginRequiredMixin, CreateView):
     model = DiscussionPost
     form_class = DiscussionPostForm
     template_name = 'communities/create_post.html'
+    query_budget = 6
 
     def form_valid(self, form):
         community = get_object_or_404(Community, pk=self.kwargs['community_id'])
         
         # Check if user is a member
-        if not CommunityMember.objects.filter(community=community, user=self.request.user).exists():
+        if not self.request.user_context.is_member(community.pk):
             messages.error(self.request, 'You must join the community before posting.')
             return redirect('communities:community_detail', pk=community.pk)
         
@@ -107,31 +120,33 @@ class DiscussionPostDetailView(DetailView):
     model = DiscussionPost
     template_name = 'communities/post_detail.html'
     context_object_name = 'post'
+    query_budget = 8
+
+    def get_queryset(self):
+        return DiscussionPost.objects.select_related('author', 'community')
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        post = self.get_object()
+        post = self.object
         
         context['comments'] = post.comments.all().select_related('author')
         context['comment_form'] = DiscussionCommentForm()
         
         if self.request.user.is_authenticated:
-            context['is_member'] = CommunityMember.objects.filter(
-                community=post.community,
-                user=self.request.user
-            ).exists()
+            context['is_member'] = self.request.user_context.is_member(post.community_id)
         
         return context
 
 class AddCommentView(LoginRequiredMixin, CreateView):
     model = DiscussionComment
     form_class = DiscussionCommentForm
+    query_budget = 8
 
     def form_valid(self, form):
         post = get_object_or_404(DiscussionPost, pk=self.kwargs['post_id'])
         
         # Check if user is a member
-        if not CommunityMember.objects.filter(community=post.community, user=self.request.user).exists():
+        if not self.request.user_context.is_member(post.community_id):
             messages.error(self.request, 'You must join the community before commenting.')
             return redirect('communities:post_detail', pk=post.pk)
         
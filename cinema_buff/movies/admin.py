@@ -11,7 +11,7 @@ class GenreAdmin(admin.ModelAdmin):
 class MovieAdmin(admin.ModelAdmin):
     list_display = ['title', 'release_date', 'average_rating', 'total_ratings', 'created_at']
     list_filter = ['genres', 'release_date', 'created_at']
-    search_fields = ['title', 'synopsis']
+    search_fields = ['title', 'synopsis', 'external_id']
     filter_horizontal = ['genres']
     readonly_fields = ['average_rating', 'total_ratings']
     ordering = ['-created_at']
@@ -19,10 +19,10 @@ class MovieAdmin(admin.ModelAdmin):
 @admin.register(Rating)
 class RatingAdmin(admin.ModelAdmin):
     list_display = ['user', 'movie', 'overall_score', 'story_score', 'acting_score', 'cinematography_score', 'created_at']
-    list_filter = ['overall_score', 'created_at', 'user__profile__role']
+    list_filter = ['overall_score', 'created_at', 'rater_role']
     search_fields = ['user__username', 'movie__title']
     ordering = ['-created_at']
-    readonly_fields = ['is_critic_rating', 'weighted_score']
+    readonly_fields = ['rater_role', 'is_critic_rating', 'weighted_score']
 
 @admin.register(Review)
 class ReviewAdmin(admin.ModelAdmin):
@@ -47,10 +47,15 @@ class FavoriteAdmin(admin.ModelAdmin):
 
 @admin.register(RatingStats)
 class RatingStatsAdmin(admin.ModelAdmin):
-    list_display = ['movie', 'total_ratings', 'user_ratings_count', 'critic_ratings_count', 'weighted_average', 'updated_at']
+    list_display = ['movie', 'total_ratings', 'user_ratings_count', 'critic_ratings_count', 'weighted_average', 'score_stddev', 'divergence', 'updated_at']
     list_filter = ['total_ratings', 'updated_at']
     search_fields = ['movie__title']
     readonly_fields = ['movie', 'total_ratings', 'user_ratings_count', 'critic_ratings_count', 
                       'weighted_average', 'user_average', 'critic_average', 
-                      'story_average', 'acting_average', 'cinematography_average']
+                      'story_average', 'acting_average', 'cinematography_average',
+                      'score_sum', 'user_score_sum', 'critic_score_sum',
+                      'story_sum', 'acting_sum', 'cinematography_sum',
+                      'score_square_sum', 'user_score_square_sum', 'critic_score_square_sum',
+                      'histogram', 'user_histogram', 'critic_histogram',
+                      'score_stddev', 'user_stddev', 'critic_stddev', 'divergence']
     ordering = ['-updated_at']
@@ -0,0 +1,264 @@
+"""
+In-memory title index for typeahead.
+
+Titles are indexed twice: a sorted list of (word, movie id) pairs answers prefix queries
+with two binary searches, and a trigram index supplies fuzzy candidates so that small
+typos still find the right title. The index is built lazily from ``Movie.title``, kept
+current by the Movie save/delete signals, and rebuilt in a background thread after
+``AUTOCOMPLETE_MAX_AGE`` seconds so that other worker processes pick up changes they
+did not see; lookups keep using the old index while the new one is built.
+"""
+import logging
+import re
+import threading
+import time
+import unicodedata
+from bisect import bisect_left, insort
+from collections import Counter, defaultdict
+from django.conf import settings
+from django.db import connections
+from perf.metrics import count_cache_lookup
+
+logger = logging.getLogger(__name__)
+
+WORD_RE = re.compile(r'\w+')
+
+
+def normalize(text):
+    text = unicodedata.normalize('NFKD', text)
+    text = ''.join(char for char in text if not unicodedata.combining(char))
+    return ' '.join(WORD_RE.findall(text.lower()))
+
+
+def trigrams(text):
+    padded = f'  {text} '
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class TitleIndex:
+    # Minimum trigram similarity (Dice coefficient) for a fuzzy match
+    fuzzy_threshold = 0.5
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._titles = {}
+        self._words = []
+        self._trigrams = defaultdict(set)
+
+    def __len__(self):
+        return len(self._titles)
+
+    @staticmethod
+    def _entries(normalized):
+        # The whole title is an entry too, so "the dark k" matches as a phrase
+        return set(normalized.split()) | {normalized}
+
+    def add(self, movie_id, title):
+        with self._lock:
+            self.remove(movie_id)
+            normalized = normalize(title)
+            self._titles[movie_id] = (title, normalized)
+            for word in self._entries(normalized):
+                insort(self._words, (word, movie_id))
+            for gram in trigrams(normalized):
+                self._trigrams[gram].add(movie_id)
+
+    def load(self, items):
+        """Index many (movie id, title) pairs at once, sorting the word list a single time"""
+        with self._lock:
+            for movie_id, title in items:
+                if movie_id in self._titles:
+                    self.remove(movie_id)
+                normalized = normalize(title)
+                self._titles[movie_id] = (title, normalized)
+                self._words.extend((word, movie_id) for word in self._entries(normalized))
+                for gram in trigrams(normalized):
+                    self._trigrams[gram].add(movie_id)
+            self._words.sort()
+
+    def remove(self, movie_id):
+        with self._lock:
+            entry = self._titles.pop(movie_id, None)
+            if entry is None:
+                return
+            normalized = entry[1]
+            for word in self._entries(normalized):
+                position = bisect_left(self._words, (word, movie_id))
+                if position < len(self._words) and self._words[position] == (word, movie_id):
+                    del self._words[position]
+            for gram in trigrams(normalized):
+                postings = self._trigrams.get(gram)
+                if postings is not None:
+                    postings.discard(movie_id)
+                    if not postings:
+                        del self._trigrams[gram]
+
+    def _prefix_matches(self, prefix, limit):
+        """Movie ids whose title or one of its words starts with ``prefix``, best first"""
+        position = bisect_left(self._words, (prefix,))
+        matches = {}
+        while position < len(self._words):
+            word, movie_id = self._words[position]
+            position += 1
+            if not word.startswith(prefix):
+                break
+            normalized = self._titles[movie_id][1]
+            # Whole-title prefixes beat word prefixes; shorter titles beat longer ones
+            rank = (0 if normalized.startswith(prefix) else 1, len(normalized), normalized)
+            if movie_id not in matches or rank < matches[movie_id]:
+                matches[movie_id] = rank
+            if len(matches) >= limit * 20:
+                break
+        return sorted(matches, key=matches.get)
+
+    def _fuzzy_matches(self, query, exclude, limit):
+        grams = trigrams(query)
+        # Candidates come from the rarest half of the query's trigrams; a single typo only
+        # breaks up to three of them, and skipping the common ones keeps the count cheap
+        postings = sorted((self._trigrams.get(gram, ()) for gram in grams), key=len)
+        counts = Counter()
+        for posting in postings[:max(3, len(postings) // 2)]:
+            counts.update(posting)
+        scored = []
+        # Only rescore the titles sharing the most trigrams with the query
+        for movie_id, shared in counts.most_common(limit * 10):
+            if movie_id in exclude:
+                continue
+            normalized = self._titles[movie_id][1]
+            # Compare against the title's leading words of similar length, since users type prefixes
+            candidate = trigrams(normalized[:len(query) + 2])
+            similarity = 2 * len(grams & candidate) / (len(grams) + len(candidate))
+            if similarity >= self.fuzzy_threshold:
+                scored.append((-similarity, len(normalized), movie_id))
+        scored.sort()
+        return [movie_id for _, _, movie_id in scored[:limit]]
+
+    def suggest(self, query, limit=10):
+        query = normalize(query)
+        if not query:
+            return []
+        with self._lock:
+            results = self._prefix_matches(query, limit)[:limit]
+            if len(results) < limit and len(query) >= 3:
+                results += self._fuzzy_matches(query, set(results), limit - len(results))
+            return [{'id': movie_id, 'title': self._titles[movie_id][0]} for movie_id in results]
+
+
+class _IndexHolder:
+    """
+    The process's TitleIndex. Only the first lookup waits for a build; once the index is
+    older than AUTOCOMPLETE_MAX_AGE a lookup starts a rebuild in a background thread and
+    keeps answering from the old index until the new one is swapped in.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # Held for the whole of a build, so only one runs at a time
+        self._refresh_lock = threading.Lock()
+        self.index = None
+        self.built_at = None
+        # Title changes seen while a build is reading the titles, replayed onto its result
+        self.pending = None
+
+    def get(self):
+        if self.index is None:
+            with self._refresh_lock:
+                if self.index is None:
+                    count_cache_lookup('title_index', misses=1)
+                    return self.refresh()
+
+        count_cache_lookup('title_index', hits=1)
+        max_age = getattr(settings, 'AUTOCOMPLETE_MAX_AGE', 300)
+        if self.built_at is None or time.monotonic() - self.built_at > max_age:
+            self.refresh_in_background()
+        return self.index
+
+    def refresh(self):
+        """Build a new index from the database and swap it in; the caller holds _refresh_lock"""
+        with self._lock:
+            self.pending = []
+        try:
+            index = self.build()
+        except BaseException:
+            with self._lock:
+                self.pending = None
+            raise
+        # Replayed and swapped in under one hold of the lock, so a change applied meanwhile
+        # lands either in the pending list or on the new index
+        with self._lock:
+            for movie_id, title in self.pending:
+                if title is None:
+                    index.remove(movie_id)
+                else:
+                    index.add(movie_id, title)
+            self.pending = None
+            self.index = index
+            self.built_at = time.monotonic()
+        return index
+
+    def refresh_in_background(self):
+        """Start a rebuild unless one is already running; returns the thread, or None"""
+        if not self._refresh_lock.acquire(blocking=False):
+            return None
+        thread = threading.Thread(target=self._background_refresh, name='title-index-refresh', daemon=True)
+        thread.start()
+        return thread
+
+    def _background_refresh(self):
+        try:
+            self.refresh()
+        except Exception:
+            logger.exception('Rebuilding the title index failed; serving the old one')
+        finally:
+            self._refresh_lock.release()
+            connections.close_all()
+
+    @staticmethod
+    def build():
+        from .models import Movie
+        index = TitleIndex()
+        index.load(Movie.objects.values_list('pk', 'title').iterator())
+        return index
+
+    def apply(self, movie_id, title):
+        """Apply a title change (None removes the title) to the index and to any build in progress"""
+        with self._lock:
+            index = self.index
+            if self.pending is not None:
+                self.pending.append((movie_id, title))
+        if index is None:
+            return
+        if title is None:
+            index.remove(movie_id)
+        else:
+            index.add(movie_id, title)
+
+    def invalidate(self):
+        with self._lock:
+            self.built_at = None
+
+
+_holder = _IndexHolder()
+
+
+def get_title_index():
+    return _holder.get()
+
+
+def warm_title_index():
+    """Build this process's index in the background, e.g. when a worker starts"""
+    if _holder.index is None:
+        _holder.refresh_in_background()
+
+
+def refresh_title(movie_id, title):
+    _holder.apply(movie_id, title)
+
+
+def remove_title(movie_id):
+    _holder.apply(movie_id, None)
+
+
+def invalidate_title_index():
+    """Mark this process's index stale, e.g. after a bulk load, so the next lookup rebuilds it"""
+    _holder.invalidate()
@@ -0,0 +1,170 @@
+"""
+Batch rating and review upserts.
+
+Clients that sync offline (mobile apps, import tools) send many ratings or reviews at
+once. Saving them one by one runs the post_save handlers, and a stats update, for every
+row; upsert_ratings and upsert_reviews instead validate the whole batch, write it with a
+single bulk_create(update_conflicts=True) inside one transaction and then do what the
+handlers would have done, once: the RatingStats deltas of all affected movies are
+applied together, each movie's cached pages are expired and ``batch_saved`` is sent so
+the activity app can publish the new items.
+
+Items are ``{'movie': id, <field>: value, ...}``. A field left out keeps its current
+value when the item updates an existing row, or takes the model default when it creates
+one. Every item gets a result with its ``status``: created, updated, unchanged or error.
+"""
+from collections import defaultdict
+from django.core.exceptions import ObjectDoesNotExist, ValidationError
+from django.db import transaction
+from django.dispatch import Signal
+from perf.pagecache import bump_page_versions
+from .models import Movie, Rating, RatingStats, Review
+
+RATING_FIELDS = ('story_score', 'acting_score', 'cinematography_score', 'overall_score')
+REVIEW_FIELDS = ('title', 'content')
+
+# Sent after a batch is written with sender=Rating or Review, user_id and created, the
+# new instances; post_save is not sent for bulk writes
+batch_saved = Signal()
+
+
+def clean_items(model, fields, items):
+    """
+    Validate ``items`` as ``model`` rows without touching the database, except for one
+    query checking the movies exist. Returns the per-item results, with the errors filled
+    in, and ``{movie_id: (result, instance, fields given)}`` for the valid items.
+    """
+    results, valid = [], {}
+    for index, item in enumerate(items):
+        result = {'index': index}
+        results.append(result)
+        if not isinstance(item, dict):
+            result.update(status='error', errors={'non_field_errors': ['Expected an object.']})
+            continue
+
+        errors = {}
+        unknown = set(item) - {'movie', *fields}
+        if unknown:
+            errors['non_field_errors'] = [f'Unknown field: {name}.' for name in sorted(unknown)]
+        given = [field for field in fields if field in item]
+        instance = model(**{field: item[field] for field in given})
+        try:
+            # Fields left out are checked in write_items, once it is known whether the item creates a row
+            instance.clean_fields(exclude=['user', 'movie', *(field for field in fields if field not in given)])
+        except ValidationError as exc:
+            errors.update(exc.message_dict)
+
+        movie_id = item.get('movie')
+        result['movie'] = movie_id
+        if not isinstance(movie_id, int) or isinstance(movie_id, bool):
+            errors['movie'] = ['A movie id is required.']
+        elif movie_id in valid:
+            errors['movie'] = ['This movie is already in the batch.']
+        if errors:
+            result.update(status='error', errors=errors)
+            continue
+        instance.movie_id = movie_id
+        valid[movie_id] = (result, instance, given)
+
+    known = set(Movie.objects.filter(pk__in=list(valid)).values_list('pk', flat=True))
+    for movie_id in set(valid) - known:
+        result, instance, given = valid.pop(movie_id)
+        result.update(status='error', errors={'movie': ['No such movie.']})
+    return results, valid
+
+
+def write_items(model, fields, user, valid):
+    """
+    Upsert the valid items as ``user``'s rows; returns the rows they replace, by movie id,
+    and the instances written.
+    """
+    # Locking the movies first waits out any insert of the same rows in flight, which
+    # select_for_update cannot see, so no item is taken for new when its row exists
+    Movie.lock_for_feedback(list(valid))
+    existing = {
+        row.movie_id: row
+        for row in model.objects.select_for_update().filter(user=user, movie_id__in=list(valid)).order_by('movie_id')
+    }
+    written = []
+    for movie_id, (result, instance, given) in valid.items():
+        instance.user_id = user.pk
+        current = existing.get(movie_id)
+        if current is None:
+            try:
+                instance.clean_fields(exclude=['user', 'movie', *given])
+            except ValidationError as exc:
+                result.update(status='error', errors=exc.message_dict)
+                continue
+            result['status'] = 'created'
+        else:
+            for field in set(fields) - set(given):
+                setattr(instance, field, getattr(current, field))
+            if all(getattr(instance, field) == getattr(current, field) for field in fields):
+                result.update(status='unchanged', id=current.pk)
+                continue
+            result['status'] = 'updated'
+        written.append(instance)
+
+    if written:
+        model.objects.bulk_create(written, update_conflicts=True, unique_fields=['user', 'movie'],
+                                  update_fields=[*fields, 'updated_at'])
+        # Not every backend returns the ids of upserted rows, so read them back
+        ids = dict(model.objects.filter(user=user, movie_id__in=[instance.movie_id for instance in written])
+                   .values_list('movie_id', 'pk'))
+        for instance in written:
+            instance.pk = ids[instance.movie_id]
+            valid[instance.movie_id][0]['id'] = instance.pk
+    return existing, written
+
+
+def upsert_ratings(user, items):
+    """Create or update ``user``'s ratings from ``items``; returns one result per item"""
+    results, valid = clean_items(Rating, RATING_FIELDS, items)
+    if not valid:
+        return results
+    try:
+        role = user.profile.role
+    except ObjectDoesNotExist:
+        role = 'user'
+
+    with transaction.atomic():
+        for result, instance, given in valid.values():
+            instance.rater_role = role
+        existing, written = write_items(Rating, RATING_FIELDS, user, valid)
+
+        changes = defaultdict(list)
+        for instance in written:
+            current = existing.get(instance.movie_id)
+            if current is not None:
+                # rater_role is not overwritten by the upsert, so the row keeps its own
+                instance.rater_role = current.rater_role
+            changes[instance.movie_id].append((
+                current.stats_contribution() if current else None, instance.stats_contribution(),
+            ))
+        RatingStats.apply_changes_many(changes)
+        finish(Rating, user, existing, written, 'movies')
+    return results
+
+
+def upsert_reviews(user, items):
+    """Create or update ``user``'s reviews from ``items``; returns one result per item"""
+    results, valid = clean_items(Review, REVIEW_FIELDS, items)
+    if not valid:
+        return results
+    with transaction.atomic():
+        existing, written = write_items(Review, REVIEW_FIELDS, user, valid)
+        finish(Review, user, existing, written)
+    return results
+
+
+def finish(model, user, existing, written, *versions):
+    """What the post_save handlers of the written rows would have done"""
+    if not written:
+        return
+    for instance in written:
+        instance._state.adding = False
+        if model is Rating:
+            instance.snapshot_stats_fields()
+    bump_page_versions(*versions, *(f'movie:{instance.movie_id}' for instance in written))
+    created = [instance for instance in written if instance.movie_id not in existing]
+    batch_saved.send(sender=model, user_id=user.pk, created=created)
@@ -0,0 +1,93 @@
+"""
+Fast inserts of plain value tuples, for data loads too large for ``bulk_create``.
+
+Rows skip model instantiation, ``save()`` and signals entirely: the caller supplies every
+column value, including timestamps that ``auto_now`` fields would normally fill in. On
+PostgreSQL each batch is streamed with ``COPY``; other databases get one ``executemany``.
+"""
+import csv
+import io
+from django.db import connection, transaction
+
+# Column types whose Python values must be adapted before reaching non-PostgreSQL drivers
+ADAPTED_TYPES = ('DateTimeField', 'DateField')
+
+
+class BulkInserter:
+    """Buffer rows for one table and write them ``batch_size`` at a time"""
+
+    def __init__(self, model, fields, batch_size=10000):
+        self.batch_size = batch_size
+        self.rows = []
+        self.written = 0
+        self.fields = [model._meta.get_field(name) for name in fields]
+
+        quote = connection.ops.quote_name
+        table = quote(model._meta.db_table)
+        columns = ', '.join(quote(field.column) for field in self.fields)
+        if connection.vendor == 'postgresql':
+            self.sql = f"COPY {table} ({columns}) FROM STDIN WITH (FORMAT csv, NULL '\\N')"
+        else:
+            placeholders = ', '.join(['%s'] * len(self.fields))
+            self.sql = f'INSERT INTO {table} ({columns}) VALUES ({placeholders})'
+        self.adapters = [
+            (index, field) for index, field in enumerate(self.fields)
+            if field.get_internal_type() in ADAPTED_TYPES
+        ]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        if exc_type is None:
+            self.flush()
+
+    def add(self, row):
+        self.rows.append(row)
+        if len(self.rows) >= self.batch_size:
+            self.flush()
+
+    def extend(self, rows):
+        for row in rows:
+            self.add(row)
+
+    def flush(self):
+        if not self.rows:
+            return
+        # One transaction per batch; in autocommit mode every executemany row would be its own
+        with transaction.atomic(), connection.cursor() as cursor:
+            if connection.vendor == 'postgresql':
+                self._copy(cursor)
+            else:
+                cursor.executemany(self.sql, [self._adapt(row) for row in self.rows])
+        self.written += len(self.rows)
+        self.rows = []
+
+    def _copy(self, cursor):
+        # Spell NULL out so that empty strings stay empty strings
+        buffer = io.StringIO()
+        csv.writer(buffer).writerows(
+            ['\\N' if value is None else value for value in row] for row in self.rows
+        )
+        buffer.seek(0)
+        if hasattr(cursor, 'copy_expert'):
+            cursor.copy_expert(self.sql, buffer)
+        else:
+            # psycopg 3
+            with cursor.copy(self.sql) as copy:
+                copy.write(buffer.read())
+
+    def _adapt(self, row):
+        if not self.adapters:
+            return row
+        row = list(row)
+        for index, field in self.adapters:
+            row[index] = field.get_db_prep_save(row[index], connection)
+        return row
+
+
+def insert_rows(model, fields, rows, batch_size=10000):
+    """Insert an iterable of value tuples in batches; returns the number written"""
+    with BulkInserter(model, fields, batch_size) as inserter:
+        inserter.extend(rows)
+    return inserter.written
@@ -0,0 +1,70 @@
+import random
+import string
+import time
+from django.core.management.base import BaseCommand
+from movies.autocomplete import TitleIndex
+
+# Common title words; the rest of the vocabulary is made of generated pseudo-words
+WORDS = [
+    'dark', 'knight', 'star', 'wars', 'return', 'empire', 'lord', 'rings', 'king', 'night',
+    'city', 'love', 'story', 'last', 'first', 'man', 'woman', 'house', 'blood', 'river',
+    'shadow', 'ghost', 'dream', 'secret', 'summer', 'winter', 'fire', 'ice', 'road', 'home',
+    'game', 'war', 'heart', 'black', 'white', 'red', 'blue', 'golden', 'silent', 'lost',
+]
+SYLLABLES = ['ka', 'lo', 'mi', 'ra', 'ten', 'sor', 'vel', 'dun', 'bra', 'est', 'ion', 'ar', 'qu', 'zel']
+
+
+class Command(BaseCommand):
+    help = 'Measure title autocomplete latency against a synthetic in-memory catalog'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--titles', type=int, default=100000)
+        parser.add_argument('--queries', type=int, default=5000)
+        parser.add_argument('--limit', type=int, default=10)
+        parser.add_argument('--vocabulary', type=int, default=20000,
+                            help='Number of distinct generated words titles are drawn from')
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        vocabulary = WORDS + [
+            ''.join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4)))
+            for _ in range(options['vocabulary'])
+        ]
+        # Zipf-like word frequencies, so common words are shared by many titles as in a real catalog
+        weights = [1 / rank for rank in range(1, len(vocabulary) + 1)]
+        titles = [
+            ' '.join(rng.choices(vocabulary, weights, k=rng.randint(1, 4))).title()
+            for _ in range(options['titles'])
+        ]
+
+        started = time.perf_counter()
+        index = TitleIndex()
+        index.load(enumerate(titles))
+        self.stdout.write(f'Indexed {len(index)} titles in {time.perf_counter() - started:.1f}s')
+
+        queries = []
+        for _ in range(options['queries']):
+            title = rng.choice(titles).lower()
+            prefix = title[:rng.randint(1, min(len(title), 12))]
+            if len(prefix) > 4 and rng.random() < 0.3:
+                # Simulate a typo by replacing one character
+                position = rng.randrange(1, len(prefix))
+                prefix = prefix[:position] + rng.choice(string.ascii_lowercase) + prefix[position + 1:]
+            queries.append(prefix)
+
+        timings = []
+        for query in queries:
+            started = time.perf_counter()
+            index.suggest(query, options['limit'])
+            timings.append((time.perf_counter() - started) * 1000)
+
+        timings.sort()
+
+        def percentile(p):
+            return timings[min(len(timings) - 1, int(len(timings) * p / 100))]
+
+        self.stdout.write(self.style.SUCCESS(
+            f'{len(timings)} queries: p50 {percentile(50):.2f}ms, p95 {percentile(95):.2f}ms, '
+            f'p99 {percentile(99):.2f}ms, max {timings[-1]:.2f}ms'
+        ))
@@ -0,0 +1,270 @@
+import math
+import random
+import time
+from datetime import date, timedelta
+from itertools import accumulate
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from accounts.models import UserConnection, UserProfile
+from communities.models import Community, CommunityMember, DiscussionPost
+from movies.autocomplete import invalidate_title_index
+from perf.pagecache import bump_page_versions
+from movies.bulk import BulkInserter, insert_rows
+from movies.models import Genre, Movie, Rating, RatingStats, Review
+from movies.search import get_search_backend
+from recommendations.models import SimilarityRefresh
+
+GENRES = ['Action', 'Comedy', 'Drama', 'Horror', 'Romance', 'Sci-Fi', 'Thriller', 'Animation', 'Crime', 'Adventure']
+
+TITLE_ADJECTIVES = [
+    'Silent', 'Crimson', 'Last', 'Hidden', 'Broken', 'Golden', 'Midnight', 'Lost', 'Electric', 'Frozen',
+    'Wild', 'Distant', 'Burning', 'Quiet', 'Savage', 'Hollow', 'Endless', 'Iron', 'Velvet', 'Forgotten',
+]
+TITLE_NOUNS = [
+    'Harbor', 'Kingdom', 'Signal', 'River', 'Empire', 'Garden', 'Protocol', 'Horizon', 'Witness', 'Machine',
+    'Frontier', 'Orchard', 'Station', 'Mirror', 'Storm', 'Promise', 'Circuit', 'Lantern', 'Paradox', 'Voyage',
+]
+LOREM = ('Lorem ipsum dolor sit amet, consectetur adipiscing elit, sed do eiusmod tempor '
+         'incididunt ut labore et dolore magna aliqua.')
+
+
+class ZipfSampler:
+    """Draw ids with probability proportional to 1 / rank ** exponent over a shuffled ranking"""
+
+    def __init__(self, ids, exponent, rng):
+        self.ids = list(ids)
+        rng.shuffle(self.ids)
+        self.cum_weights = list(accumulate(1 / rank ** exponent for rank in range(1, len(self.ids) + 1)))
+        self.rng = rng
+
+    def choice(self):
+        return self.rng.choices(self.ids, cum_weights=self.cum_weights)[0]
+
+    def sample(self, k, exclude=None):
+        """
+        ``k`` distinct ids. A few rounds of weighted draws usually suffice; for samples
+        reaching deep into the long tail the remainder is topped up uniformly.
+        """
+        k = min(k, len(self.ids) - (exclude is not None))
+        chosen = set()
+        for _ in range(4):
+            if len(chosen) >= k:
+                break
+            chosen.update(self.rng.choices(self.ids, cum_weights=self.cum_weights, k=k - len(chosen)))
+            chosen.discard(exclude)
+        if len(chosen) < k:
+            rest = [pk for pk in self.ids if pk not in chosen and pk != exclude]
+            chosen.update(self.rng.sample(rest, k - len(chosen)))
+        return chosen
+
+
+class Command(BaseCommand):
+    help = 'Generate a large reproducible synthetic dataset for load and capacity testing'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=10000, help='Users to create (default: 10000)')
+        parser.add_argument('--movies', type=int, default=5000, help='Movies to create (default: 5000)')
+        parser.add_argument('--ratings-per-user', type=float, default=50,
+                            help='Mean ratings per user; individual counts are log-normal (default: 50)')
+        parser.add_argument('--review-ratio', type=float, default=0.05,
+                            help='Share of ratings that also get a written review (default: 0.05)')
+        parser.add_argument('--follows', type=float, default=20,
+                            help='Mean accounts followed per user (default: 20)')
+        parser.add_argument('--posts', type=int, default=10000,
+                            help='Community discussion posts to create (default: 10000)')
+        parser.add_argument('--critic-ratio', type=float, default=0.02,
+                            help='Share of users with the critic role (default: 0.02)')
+        parser.add_argument('--zipf-exponent', type=float, default=1.0,
+                            help='Skew of movie popularity and of follower counts (default: 1.0)')
+        parser.add_argument('--days', type=int, default=730,
+                            help='Spread timestamps over this many past days (default: 730)')
+        parser.add_argument('--seed', type=int, default=42, help='Random seed (default: 42)')
+        parser.add_argument('--prefix', default='synth',
+                            help='Prefix of generated usernames and movie external ids (default: synth)')
+        parser.add_argument('--batch-size', type=int, default=10000,
+                            help='Rows written per insert (default: 10000)')
+
+    def handle(self, *args, **options):
+        self.options = options
+        self.prefix = options['prefix']
+        self.rng = random.Random(options['seed'])
+        self.now = timezone.now()
+        self.batch_size = options['batch_size']
+        if options['users'] < 2 or options['movies'] < 1:
+            raise CommandError('Need at least 2 users and 1 movie')
+        if User.objects.filter(username__startswith=f'{self.prefix}_').exists():
+            raise CommandError(f'Users prefixed {self.prefix}_ already exist; choose another --prefix')
+
+        started = time.monotonic()
+        genre_ids = self.genres()
+        user_ids, roles = self.step('users', self.users)
+        movie_ids = self.step('movies', self.movies, genre_ids)
+        self.step('ratings and reviews', self.ratings, user_ids, roles, movie_ids)
+        self.step('follows', self.follows, user_ids)
+        self.step('community posts', self.posts, user_ids)
+
+        phase = time.monotonic()
+        movies = Movie.objects.filter(external_id__startswith=f'{self.prefix}-')
+        rebuilt = RatingStats.rebuild(Rating.objects.filter(movie__in=movies), batch_size=self.batch_size)
+        get_search_backend().rebuild()
+        invalidate_title_index()
+        SimilarityRefresh.enqueue(movie_ids)
+        bump_page_versions('movies', 'communities')
+        self.stdout.write(f'Rebuilt stats for {rebuilt} movies and the search index '
+                          f'in {time.monotonic() - phase:.1f}s')
+        self.stdout.write(self.style.SUCCESS(
+            f'Generated dataset in {time.monotonic() - started:.1f}s; '
+            'run compute_recommendations to build recommendations'
+        ))
+
+    def step(self, name, method, *args):
+        phase = time.monotonic()
+        result, written = method(*args)
+        elapsed = time.monotonic() - phase
+        self.stdout.write(f'Wrote {written} {name} rows in {elapsed:.1f}s ({written / max(elapsed, 1e-6):.0f} rows/s)')
+        return result
+
+    def timestamp(self):
+        return self.now - timedelta(seconds=self.rng.uniform(0, self.options['days'] * 86400))
+
+    def lognormal_count(self, mean, upper):
+        # Log-normal with sigma 1 has mean exp(mu + 1/2)
+        if mean <= 0:
+            return 0
+        return max(1, min(upper, round(self.rng.lognormvariate(math.log(mean) - 0.5, 1.0))))
+
+    def genres(self):
+        existing = dict(Genre.objects.values_list('name', 'pk'))
+        Genre.objects.bulk_create([Genre(name=name) for name in GENRES if name not in existing])
+        genres = Genre.objects.filter(name__in=GENRES)
+        Community.objects.bulk_create([
+            Community(genre=genre, name=f'{genre.name} Lovers', description=f'A community for fans of {genre.name} movies')
+            for genre in genres.filter(community__isnull=True)
+        ])
+        return list(genres.values_list('pk', flat=True))
+
+    def users(self):
+        # Hashing is deliberately slow, so every generated account shares one password hash
+        password = make_password('password123')
+        count = self.options['users']
+        written = insert_rows(User, [
+            'username', 'email', 'password', 'first_name', 'last_name',
+            'is_staff', 'is_superuser', 'is_active', 'date_joined',
+        ], (
+            (f'{self.prefix}_{i}', f'{self.prefix}_{i}@example.com', password, '', '', False, False, True,
+             self.timestamp())
+            for i in range(count)
+        ), self.batch_size)
+
+        user_ids = list(User.objects.filter(
+            username__startswith=f'{self.prefix}_'
+        ).order_by('pk').values_list('pk', flat=True))
+        roles = ['critic' if self.rng.random() < self.options['critic_ratio'] else 'user' for _ in user_ids]
+        written += insert_rows(UserProfile, [
+            'user', 'bio', 'role', 'follower_count', 'created_at', 'updated_at',
+        ], (
+            (user_id, '', role, 0, self.now, self.now) for user_id, role in zip(user_ids, roles)
+        ), self.batch_size)
+        return (user_ids, roles), written
+
+    def movies(self, genre_ids):
+        count = self.options['movies']
+        written = insert_rows(Movie, [
+            'external_id', 'title', 'synopsis', 'release_date', 'content_type', 'created_at', 'updated_at',
+        ], (
+            (
+                f'{self.prefix}-{i}',
+                f'The {self.rng.choice(TITLE_ADJECTIVES)} {self.rng.choice(TITLE_NOUNS)}'
+                + (f' {self.rng.randint(2, 4)}' if self.rng.random() < 0.1 else ''),
+                LOREM,
+                date(1950, 1, 1) + timedelta(days=self.rng.randrange(365 * 75)),
+                'series' if self.rng.random() < 0.15 else 'movie',
+                self.now, self.now,
+            )
+            for i in range(count)
+        ), self.batch_size)
+
+        movie_ids = list(Movie.objects.filter(
+            external_id__startswith=f'{self.prefix}-'
+        ).order_by('pk').values_list('pk', flat=True))
+        written += insert_rows(Movie.genres.through, ['movie', 'genre'], (
+            (movie_id, genre_id)
+            for movie_id in movie_ids
+            for genre_id in self.rng.sample(genre_ids, min(len(genre_ids), self.rng.randint(1, 3)))
+        ), self.batch_size)
+        for start in range(0, len(movie_ids), self.batch_size):
+            RatingStats.objects.bulk_create(
+                [RatingStats(movie_id=movie_id) for movie_id in movie_ids[start:start + self.batch_size]]
+            )
+        return movie_ids, written
+
+    def ratings(self, user_ids, roles, movie_ids):
+        """Ratings per user are log-normal, and which movies get rated follows a Zipf law"""
+        popularity = ZipfSampler(movie_ids, self.options['zipf_exponent'], self.rng)
+        quality = {movie_id: self.rng.gauss(6.5, 1.5) for movie_id in movie_ids}
+
+        def score(mean):
+            return max(1, min(10, round(self.rng.gauss(mean, 1.2))))
+
+        ratings = BulkInserter(Rating, [
+            'user', 'movie', 'story_score', 'acting_score', 'cinematography_score', 'rater_role',
+            'created_at', 'updated_at',
+        ], self.batch_size)
+        reviews = BulkInserter(Review, ['user', 'movie', 'title', 'content', 'created_at', 'updated_at'],
+                               self.batch_size)
+        with ratings, reviews:
+            for user_id, role in zip(user_ids, roles):
+                bias = self.rng.gauss(0, 1)
+                count = self.lognormal_count(self.options['ratings_per_user'], len(movie_ids))
+                for movie_id in sorted(popularity.sample(count)):
+                    mean = quality[movie_id] + bias
+                    created_at = self.timestamp()
+                    ratings.add((user_id, movie_id, score(mean), score(mean), score(mean), role,
+                                 created_at, created_at))
+                    if self.rng.random() < self.options['review_ratio']:
+                        reviews.add((user_id, movie_id, 'Thoughts on this one', LOREM, created_at, created_at))
+        return None, ratings.written + reviews.written
+
+    def follows(self, user_ids):
+        """Accounts to follow are drawn by a Zipf law, giving power-law follower counts"""
+        celebrity = ZipfSampler(user_ids, self.options['zipf_exponent'], self.rng)
+        written = insert_rows(UserConnection, ['from_user', 'to_user', 'created_at'], (
+            (user_id, followed_id, self.timestamp())
+            for user_id in user_ids
+            for followed_id in sorted(celebrity.sample(
+                self.lognormal_count(self.options['follows'], len(user_ids) - 1), exclude=user_id
+            ))
+        ), self.batch_size)
+
+        followers = UserConnection.objects.filter(to_user=OuterRef('user')).order_by().values(
+            'to_user'
+        ).annotate(total=Count('pk')).values('total')
+        UserProfile.objects.filter(user__username__startswith=f'{self.prefix}_').update(
+            follower_count=Coalesce(Subquery(followers), 0)
+        )
+        return None, written
+
+    def posts(self, user_ids):
+        """Posts come mostly from a few prolific authors, who join the communities they post in"""
+        communities = list(Community.objects.values_list('pk', flat=True))
+        if not communities or not self.options['posts']:
+            return None, 0
+        authors = ZipfSampler(user_ids, self.options['zipf_exponent'], self.rng)
+        members = set()
+        with BulkInserter(DiscussionPost, [
+            'community', 'author', 'title', 'content', 'is_pinned', 'is_locked', 'created_at', 'updated_at',
+        ], self.batch_size) as posts:
+            for i in range(self.options['posts']):
+                author_id, community_id = authors.choice(), self.rng.choice(communities)
+                members.add((community_id, author_id))
+                created_at = self.timestamp()
+                posts.add((community_id, author_id, f'Discussion #{i}', LOREM, False, False, created_at, created_at))
+
+        written = posts.written + insert_rows(CommunityMember, ['community', 'user', 'joined_at', 'is_admin'], (
+            (community_id, user_id, self.now, False) for community_id, user_id in sorted(members)
+        ), self.batch_size)
+        return None, written
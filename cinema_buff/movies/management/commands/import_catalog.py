@@ -0,0 +1,246 @@
+import csv
+import json
+import os
+import sys
+import time
+from datetime import date
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from movies.models import Genre, Movie, RatingStats
+from movies.search import get_search_backend
+from perf.pagecache import bump_page_versions
+from recommendations.models import SimilarityRefresh
+
+FORMATS = ('csv', 'jsonl')
+EXTERNAL_ID_LENGTH = Movie._meta.get_field('external_id').max_length
+
+def text(raw, field):
+    """The row's ``field`` stripped, '' if missing; TypeError if JSON gave anything but a string"""
+    value = raw.get(field)
+    if value is None:
+        return ''
+    if not isinstance(value, str):
+        raise TypeError(f'{field} is not a string: {value!r}')
+    return value.strip()
+
+class Command(BaseCommand):
+    help = 'Stream a CSV or JSON Lines catalog of titles into the database in batches'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Catalog file, or - to read from standard input')
+        parser.add_argument('--format', choices=FORMATS,
+                            help='Input format (default: guessed from the file extension)')
+        parser.add_argument('--batch-size', type=int, default=2000,
+                            help='Rows inserted per transaction (default: 2000)')
+        parser.add_argument('--genre-separator', default='|',
+                            help='Separator between genre names in CSV input (default: |)')
+        parser.add_argument('--create-genres', action='store_true',
+                            help='Create genres missing from the database instead of dropping them')
+        parser.add_argument('--checkpoint',
+                            help='Progress file used to resume an interrupted import (default: <path>.checkpoint)')
+        parser.add_argument('--restart', action='store_true',
+                            help='Ignore any checkpoint and start from the first row')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        fmt = options['format'] or os.path.splitext(path)[1].lstrip('.').lower()
+        if fmt not in FORMATS:
+            raise CommandError(f'Cannot tell the format of {path}; pass --format csv or --format jsonl')
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size must be at least 1')
+
+        self.genre_separator = options['genre_separator']
+        self.create_genres = options['create_genres']
+        self.genres = {name.lower(): pk for pk, name in Genre.objects.values_list('pk', 'name')}
+        self.unknown_genres = set()
+
+        checkpoint = None if path == '-' else (options['checkpoint'] or f'{path}.checkpoint')
+        skip = 0
+        if checkpoint and os.path.exists(checkpoint) and not options['restart']:
+            skip = self.read_checkpoint(checkpoint, path)
+            self.stdout.write(f'Resuming after row {skip} from {checkpoint}')
+
+        stream = sys.stdin if path == '-' else open(path, newline='', encoding='utf-8')
+        try:
+            self.run(self.read_rows(stream, fmt), skip, options['batch_size'], checkpoint, path)
+        finally:
+            if stream is not sys.stdin:
+                stream.close()
+
+        if checkpoint and os.path.exists(checkpoint):
+            os.remove(checkpoint)
+        if self.unknown_genres:
+            self.stdout.write(self.style.WARNING(
+                f'Dropped unknown genres (use --create-genres to add them): {", ".join(sorted(self.unknown_genres))}'
+            ))
+
+    def read_rows(self, stream, fmt):
+        """Yield ``(row number, dict)`` one row at a time, so memory use does not grow with the file"""
+        if fmt == 'csv':
+            for number, row in enumerate(csv.DictReader(stream), start=1):
+                yield number, row
+        else:
+            number = 0
+            for line in stream:
+                if not line.strip():
+                    continue
+                number += 1
+                try:
+                    yield number, json.loads(line)
+                except ValueError:
+                    yield number, None
+
+    def run(self, rows, skip, batch_size, checkpoint, path):
+        started = time.monotonic()
+        processed = created = duplicates = invalid = 0
+        batch = []
+
+        def flush():
+            nonlocal created, duplicates
+            added = self.import_batch(batch)
+            created += added
+            duplicates += len(batch) - added
+            if checkpoint:
+                self.write_checkpoint(checkpoint, path, processed)
+            elapsed = time.monotonic() - started
+            self.stdout.write(f'{processed} rows read, {created} created, {duplicates} duplicates, '
+                              f'{invalid} invalid ({(processed - skip) / max(elapsed, 1e-6):.0f} rows/s)')
+
+        for number, raw in rows:
+            if number <= skip:
+                continue
+            processed = number
+            row = self.clean(number, raw)
+            if row is None:
+                invalid += 1
+            else:
+                batch.append(row)
+            if len(batch) >= batch_size:
+                flush()
+                batch = []
+        if batch or processed > skip:
+            flush()
+
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'Imported {created} titles from {max(processed - skip, 0)} rows in {elapsed:.1f}s '
+            f'({max(processed - skip, 0) / max(elapsed, 1e-6):.0f} rows/s)'
+        ))
+
+    def clean(self, number, raw):
+        """Validate one input row into a dict of Movie fields plus genre ids, or None"""
+        if not isinstance(raw, dict):
+            self.stderr.write(f'Row {number}: not a JSON object')
+            return None
+        try:
+            title = text(raw, 'title')
+            release_date = text(raw, 'release_date')
+            content_type = (text(raw, 'content_type') or 'movie').lower()
+            synopsis = text(raw, 'synopsis')
+            genres = raw.get('genres') or []
+            if isinstance(genres, str):
+                genres = genres.split(self.genre_separator)
+            elif not isinstance(genres, list) or not all(isinstance(name, str) for name in genres):
+                raise TypeError(f'genres is not a list of names: {genres!r}')
+        except TypeError as exc:
+            self.stderr.write(f'Row {number}: {exc}')
+            return None
+
+        if not title:
+            self.stderr.write(f'Row {number}: missing title')
+            return None
+        try:
+            release_date = date.fromisoformat(release_date)
+        except ValueError:
+            self.stderr.write(f'Row {number}: bad release_date {raw.get("release_date")!r}')
+            return None
+        if content_type not in dict(Movie.CONTENT_TYPE_CHOICES):
+            self.stderr.write(f'Row {number}: bad content_type {content_type!r}')
+            return None
+
+        external_id = str(raw.get('external_id') or '').strip() or None
+        if external_id and len(external_id) > EXTERNAL_ID_LENGTH:
+            self.stderr.write(f'Row {number}: external_id longer than {EXTERNAL_ID_LENGTH} characters')
+            return None
+        return {
+            'external_id': external_id,
+            'title': title[:200],
+            'synopsis': synopsis,
+            'release_date': release_date,
+            'content_type': content_type,
+            'genre_ids': self.resolve_genres(genres),
+        }
+
+    def resolve_genres(self, names):
+        genre_ids = []
+        for name in names:
+            name = name.strip()
+            if not name:
+                continue
+            genre_id = self.genres.get(name.lower())
+            if genre_id is None:
+                if not self.create_genres:
+                    self.unknown_genres.add(name)
+                    continue
+                genre_id = Genre.objects.get_or_create(name=name)[0].pk
+                self.genres[name.lower()] = genre_id
+            if genre_id not in genre_ids:
+                genre_ids.append(genre_id)
+        return genre_ids
+
+    def import_batch(self, rows):
+        """
+        Insert the rows of one batch that are not in the database yet; returns how many.
+        A row is a duplicate if its external id, or its title and release date, is already
+        taken, which also makes replaying a batch after a crash harmless.
+        """
+        external_ids = {row['external_id'] for row in rows if row['external_id']}
+        taken_ids = set(Movie.objects.filter(external_id__in=external_ids).values_list('external_id', flat=True))
+        taken_titles = set(Movie.objects.filter(
+            title__in={row['title'] for row in rows},
+            release_date__in={row['release_date'] for row in rows},
+        ).values_list('title', 'release_date'))
+
+        movies, genre_ids = [], []
+        for row in rows:
+            key = (row['title'], row['release_date'])
+            if row['external_id'] in taken_ids or key in taken_titles:
+                continue
+            if row['external_id']:
+                taken_ids.add(row['external_id'])
+            taken_titles.add(key)
+            movies.append(Movie(
+                external_id=row['external_id'], title=row['title'], synopsis=row['synopsis'],
+                release_date=row['release_date'], content_type=row['content_type'],
+            ))
+            genre_ids.append(row['genre_ids'])
+        if not movies:
+            return 0
+
+        # bulk_create skips post_save, so do what the Movie signals would have done
+        with transaction.atomic():
+            Movie.objects.bulk_create(movies)
+            Movie.genres.through.objects.bulk_create([
+                Movie.genres.through(movie_id=movie.pk, genre_id=genre_id)
+                for movie, ids in zip(movies, genre_ids)
+                for genre_id in ids
+            ])
+            RatingStats.objects.bulk_create([RatingStats(movie=movie) for movie in movies])
+            get_search_backend().index_movies(movies)
+            SimilarityRefresh.enqueue(movie.pk for movie in movies)
+        bump_page_versions('movies')
+        return len(movies)
+
+    def read_checkpoint(self, checkpoint, path):
+        with open(checkpoint) as f:
+            state = json.load(f)
+        if state.get('path') != os.path.abspath(path):
+            raise CommandError(f'{checkpoint} belongs to {state.get("path")}; pass --restart to ignore it')
+        return state['rows']
+
+    def write_checkpoint(self, checkpoint, path, rows):
+        """Record the rows committed so far, replacing the file atomically"""
+        temporary = f'{checkpoint}.tmp'
+        with open(temporary, 'w') as f:
+            json.dump({'path': os.path.abspath(path), 'rows': rows}, f)
+        os.replace(temporary, checkpoint)
@@ -0,0 +1,72 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import F
+from accounts.models import UserProfile
+from movies.models import Movie, Rating, RatingStats
+
+class Command(BaseCommand):
+    help = 'Check incrementally maintained rating statistics against a full recompute'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--movie', type=int, action='append', dest='movies',
+                            help='Only check the given movie id (may be repeated)')
+        parser.add_argument('--fix', action='store_true',
+                            help='Rewrite any mismatching stats from the full recompute')
+
+    def handle(self, *args, **options):
+        ratings = Rating.objects.all()
+        stats_rows = RatingStats.objects.all()
+        if options['movies']:
+            ratings = ratings.filter(movie_id__in=options['movies'])
+            stats_rows = stats_rows.filter(movie_id__in=options['movies'])
+
+        # Ratings whose denormalized role no longer matches the rater's profile
+        stale_roles = ratings.exclude(rater_role=F('user__profile__role'))
+        stale_count = stale_roles.count()
+        if stale_count:
+            self.stdout.write(self.style.WARNING(f'{stale_count} ratings have a stale rater_role'))
+            if not options['fix']:
+                raise CommandError('Rater roles are out of sync; rerun with --fix to re-tag them')
+            for role, _ in UserProfile.ROLE_CHOICES:
+                user_ids = stale_roles.filter(user__profile__role=role).values_list('user_id', flat=True)
+                Rating.sync_rater_role(set(user_ids), role)
+            self.stdout.write(self.style.SUCCESS(f'Re-tagged {stale_count} ratings'))
+
+        # One grouped query for the expected counters of every movie
+        expected = {
+            row['movie_id']: RatingStats.counters_from_aggregate(row)
+            for row in ratings.values('movie_id').annotate(**RatingStats.aggregate_expressions())
+        }
+        zero = RatingStats().counters()
+
+        mismatched = []
+        checked = 0
+        for stats in stats_rows.iterator():
+            checked += 1
+            counters = expected.pop(stats.movie_id, zero)
+            actual = stats.counters()
+            if actual != counters:
+                mismatched.append(stats.movie_id)
+                diff = ', '.join(
+                    f'{field}: {actual[field]} != {counters[field]}'
+                    for field in counters
+                    if actual[field] != counters[field]
+                )
+                self.stdout.write(self.style.WARNING(f'Movie {stats.movie_id}: {diff}'))
+
+        # Movies that have ratings but no stats row at all
+        for movie_id in expected:
+            mismatched.append(movie_id)
+            self.stdout.write(self.style.WARNING(f'Movie {movie_id}: missing stats'))
+
+        self.stdout.write(f'Checked {checked + len(expected)} movies, {len(mismatched)} mismatched')
+
+        if not mismatched:
+            self.stdout.write(self.style.SUCCESS('Rating statistics are consistent'))
+            return
+
+        if not options['fix']:
+            raise CommandError('Rating statistics are inconsistent; rerun with --fix to rebuild them')
+
+        for movie in Movie.objects.filter(pk__in=mismatched).iterator():
+            RatingStats.update_stats(movie)
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt stats for {len(mismatched)} movies'))
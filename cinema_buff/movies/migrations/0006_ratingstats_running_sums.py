@@ -0,0 +1,93 @@
+# Generated by Django 5.2.6 on 2026-10-18 08:16
+
+from django.db import migrations, models
+from django.db.models import Count, F, Q, Sum
+
+
+def backfill_running_sums(apps, schema_editor):
+    """Populate running sums and averages for existing stats from their ratings"""
+    Rating = apps.get_model('movies', 'Rating')
+    RatingStats = apps.get_model('movies', 'RatingStats')
+
+    overall = F('story_score') + F('acting_score') + F('cinematography_score')
+    is_user = Q(user__profile__role='user')
+    is_critic = Q(user__profile__role='critic')
+    rows = Rating.objects.values('movie_id').annotate(
+        total_ratings=Count('id'),
+        user_ratings_count=Count('id', filter=is_user),
+        critic_ratings_count=Count('id', filter=is_critic),
+        score_sum=Sum(overall),
+        user_score_sum=Sum(overall, filter=is_user),
+        critic_score_sum=Sum(overall, filter=is_critic),
+        story_sum=Sum('story_score'),
+        acting_sum=Sum('acting_score'),
+        cinematography_sum=Sum('cinematography_score'),
+    )
+
+    def mean(total, count):
+        return round(total / count, 1) if count else 0.0
+
+    for row in rows:
+        row = {field: value or 0 for field, value in row.items()}
+        RatingStats.objects.update_or_create(
+            movie_id=row.pop('movie_id'),
+            defaults={
+                **row,
+                'weighted_average': mean(
+                    row['score_sum'] + row['critic_score_sum'],
+                    3 * (row['total_ratings'] + row['critic_ratings_count']),
+                ),
+                'user_average': mean(row['user_score_sum'], 3 * row['user_ratings_count']),
+                'critic_average': mean(row['critic_score_sum'], 3 * row['critic_ratings_count']),
+                'story_average': mean(row['story_sum'], row['total_ratings']),
+                'acting_average': mean(row['acting_sum'], row['total_ratings']),
+                'cinematography_average': mean(row['cinematography_sum'], row['total_ratings']),
+            },
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('movies', '0005_movie_content_type'),
+        ('accounts', '0002_userprofile_role'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ratingstats',
+            name='acting_sum',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='ratingstats',
+            name='cinematography_sum',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='ratingstats',
+            name='critic_score_sum',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='ratingstats',
+            name='score_sum',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='ratingstats',
+            name='story_sum',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='ratingstats',
+            name='user_score_sum',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AlterField(
+            model_name='movie',
+            name='content_type',
+            field=models.CharField(choices=[('movie', 'Movie'), ('series', 'Series')], default='movie', max_length=10),
+        ),
+        migrations.RunPython(backfill_running_sums, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 5.2.6 on 2026-10-18 08:18
+
+from django.db import migrations, models
+
+
+def copy_profile_roles(apps, schema_editor):
+    """Tag existing ratings with their rater's current role"""
+    Rating = apps.get_model('movies', 'Rating')
+    for role in ('critic', 'admin'):
+        Rating.objects.filter(user__profile__role=role).update(rater_role=role)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('movies', '0006_ratingstats_running_sums'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='rating',
+            name='rater_role',
+            field=models.CharField(choices=[('user', 'User'), ('critic', 'Critic'), ('admin', 'Admin')], default='user', max_length=10),
+        ),
+        migrations.RunPython(copy_profile_roles, migrations.RunPython.noop),
+    ]
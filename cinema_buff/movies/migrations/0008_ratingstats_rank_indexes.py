@@ -0,0 +1,36 @@
+# Generated by Django 5.2.6 on 2026-10-18 08:19
+
+from django.db import migrations, models
+
+
+def create_missing_stats(apps, schema_editor):
+    """Give unrated movies an empty stats row so every movie joins to RatingStats"""
+    Movie = apps.get_model('movies', 'Movie')
+    RatingStats = apps.get_model('movies', 'RatingStats')
+    missing = Movie.objects.filter(rating_stats__isnull=True).values_list('pk', flat=True)
+    RatingStats.objects.bulk_create(
+        [RatingStats(movie_id=movie_id) for movie_id in missing.iterator()], batch_size=1000
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('movies', '0007_rating_rater_role'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_missing_stats, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='ratingstats',
+            index=models.Index(condition=models.Q(('total_ratings__gt', 0)), fields=['weighted_average', 'movie'], name='stats_weighted_rank_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='ratingstats',
+            index=models.Index(condition=models.Q(('critic_ratings_count__gt', 0)), fields=['critic_average', 'movie'], name='stats_critic_rank_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='ratingstats',
+            index=models.Index(condition=models.Q(('user_ratings_count__gt', 0)), fields=['user_average', 'movie'], name='stats_user_rank_idx'),
+        ),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 5.2.6 on 2026-10-18 08:21
+
+import django.contrib.postgres.search
+from django.db import migrations
+
+
+# The GIN index and initial vectors are PostgreSQL-only; other databases use the
+# in-process search backend and just carry an unused column.
+def create_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute(
+        'CREATE INDEX movies_movie_search_vector_idx ON movies_movie USING gin (search_vector)'
+    )
+    schema_editor.execute(
+        "UPDATE movies_movie SET search_vector = "
+        "setweight(to_tsvector('english', coalesce(title, '')), 'A') || "
+        "setweight(to_tsvector('english', coalesce(synopsis, '')), 'B')"
+    )
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute('DROP INDEX IF EXISTS movies_movie_search_vector_idx')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('movies', '0008_ratingstats_rank_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='movie',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,126 @@
+# Generated by Django 5.2.6 on 2026-10-18 08:33
+
+import math
+from collections import Counter, defaultdict
+
+import movies.models
+from django.db import migrations, models
+from django.db.models import Count, F
+
+
+def backfill_distribution(apps, schema_editor):
+    """Populate square sums, histograms, spreads and divergence for existing stats"""
+    Rating = apps.get_model('movies', 'Rating')
+    RatingStats = apps.get_model('movies', 'RatingStats')
+
+    # (movie, role) -> {three-score total: number of ratings}, from one grouped query
+    totals = defaultdict(dict)
+    rows = Rating.objects.annotate(
+        overall=F('story_score') + F('acting_score') + F('cinematography_score')
+    ).values('movie_id', 'rater_role', 'overall').annotate(n=Count('id'))
+    for row in rows:
+        totals[row['movie_id'], row['rater_role']][row['overall']] = row['n']
+
+    def moments(groups):
+        count = sum(n for group in groups for n in group.values())
+        total = sum(overall * n for group in groups for overall, n in group.items())
+        squares = sum(overall * overall * n for group in groups for overall, n in group.items())
+        return count, total, squares
+
+    def stddev(count, total, squares):
+        if count < 2:
+            return 0.0
+        return round(math.sqrt(max((squares * count - total * total) / (count * count), 0)) / 3, 2)
+
+    def histogram(group):
+        buckets = [0] * 10
+        for overall, n in group.items():
+            buckets[(overall + 1) // 3 - 1] += n
+        return buckets
+
+    for stats in RatingStats.objects.filter(total_ratings__gt=0).iterator():
+        roles = {role: totals.get((stats.movie_id, role), {}) for role in ('user', 'critic', 'admin')}
+        overall = moments(roles.values())
+        users = moments([roles['user']])
+        critics = moments([roles['critic']])
+        stats.score_square_sum = overall[2]
+        stats.user_score_square_sum = users[2]
+        stats.critic_score_square_sum = critics[2]
+        stats.histogram = histogram(sum((Counter(group) for group in roles.values()), Counter()))
+        stats.user_histogram = histogram(roles['user'])
+        stats.critic_histogram = histogram(roles['critic'])
+        stats.score_stddev = stddev(*overall)
+        stats.user_stddev = stddev(*users)
+        stats.critic_stddev = stddev(*critics)
+        if users[0] and critics[0]:
+            stats.divergence = round(abs(critics[1] / critics[0] - users[1] / users[0]) / 3, 2)
+        stats.save()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('movies', '0009_movie_search_vector'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ratingstats',
+            name='critic_histogram',
+            field=models.JSONField(default=movies.models.empty_histogram),
+        ),
+        migrations.AddField(
+            model_name='ratingstats',
+            name='critic_score_square_sum',
+            field=models.BigIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='ratingstats',
+            name='critic_stddev',
+            field=models.FloatField(default=0.0),
+        ),
+        migrations.AddField(
+            model_name='ratingstats',
+            name='divergence',
+            field=models.FloatField(default=0.0, help_text='Absolute gap between critic and user averages'),
+        ),
+        migrations.AddField(
+            model_name='ratingstats',
+            name='histogram',
+            field=models.JSONField(default=movies.models.empty_histogram),
+        ),
+        migrations.AddField(
+            model_name='ratingstats',
+            name='score_square_sum',
+            field=models.BigIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='ratingstats',
+            name='score_stddev',
+            field=models.FloatField(default=0.0),
+        ),
+        migrations.AddField(
+            model_name='ratingstats',
+            name='user_histogram',
+            field=models.JSONField(default=movies.models.empty_histogram),
+        ),
+        migrations.AddField(
+            model_name='ratingstats',
+            name='user_score_square_sum',
+            field=models.BigIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='ratingstats',
+            name='user_stddev',
+            field=models.FloatField(default=0.0),
+        ),
+        migrations.RunPython(backfill_distribution, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='ratingstats',
+            index=models.Index(condition=models.Q(('total_ratings__gt', 1)), fields=['score_stddev', 'movie'], name='stats_stddev_rank_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='ratingstats',
+            index=models.Index(condition=models.Q(('critic_ratings_count__gt', 0), ('user_ratings_count__gt', 0)), fields=['divergence', 'movie'], name='stats_divergence_rank_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.6 on 2026-10-18 09:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('movies', '0011_movie_external_id'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ratingstats',
+            name='version',
+            field=models.BigIntegerField(default=0),
+        ),
+    ]
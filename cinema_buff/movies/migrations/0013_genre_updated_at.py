@@ -0,0 +1,28 @@
+# Generated by Django 5.2.6 on 2026-10-18 09:40
+
+from django.db import migrations, models
+from django.db.models import F
+import django.utils.timezone
+
+
+def backfill_updated_at(apps, schema_editor):
+    """Date existing genres as last modified when they were created"""
+    Genre = apps.get_model('movies', 'Genre')
+    Genre.objects.update(updated_at=F('created_at'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('movies', '0012_rating_stats_version'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='genre',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+        migrations.RunPython(backfill_updated_at, migrations.RunPython.noop),
+    ]
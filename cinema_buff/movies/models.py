@@ -1,11 +1,27 @@
-from django.db import models
+import math
+import time
+from collections import defaultdict
+from django.core.exceptions import ObjectDoesNotExist
+from django.contrib.postgres.search import SearchVectorField
+from django.db import models, transaction
+from django.db.models import Count, F, Q, Sum
+from django.db.models.lookups import Range
 from django.contrib.auth.models import User
+from accounts.models import UserProfile
 from django.core.validators import MinValueValidator, MaxValueValidator
 
+# Buckets in the RatingStats score histograms, one per point on the 1-10 scale
+HISTOGRAM_SIZE = 10
+
+
+def empty_histogram():
+    return [0] * HISTOGRAM_SIZE
+
 class Genre(models.Model):
     name = models.CharField(max_length=100, unique=True)
     description = models.TextField(blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         ordering = ['name']
@@ -14,6 +30,8 @@ class Genre(models.Model):
         return self.name
 
 class Movie(models.Model):
+    # Identifier in the upstream catalog the title was imported from (see import_catalog)
+    external_id = models.CharField(max_length=64, unique=True, null=True, blank=True)
     title = models.CharField(max_length=200)
     synopsis = models.TextField()
     release_date = models.DateField()
@@ -29,67 +47,69 @@ class Movie(models.Model):
     ]
     content_type = models.CharField(max_length=10, choices=CONTENT_TYPE_CHOICES, default='movie')
 
+    # Weighted title/synopsis tsvector maintained by movies.search on PostgreSQL (GIN indexed)
+    search_vector = SearchVectorField(null=True, editable=False)
+
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # Lets import_catalog dedupe titles that have no external id
+            models.Index(fields=['title', 'release_date'], name='movie_title_release_idx'),
+        ]
 
     def __str__(self):
         return self.title
 
+    @classmethod
+    def lock_for_feedback(cls, movie_ids):
+        """
+        Lock the movies' rows, in id order, for the rest of the transaction. Every rating and
+        review insert takes this lock first, so inserts of the same (user, movie) pair queue
+        up and a batch upsert sees the rows committed before it instead of overwriting them.
+        NO KEY so foreign key checks on the movies are not blocked.
+        """
+        return list(cls.objects.select_for_update(no_key=True).filter(pk__in=movie_ids).order_by('pk').values_list(
+            'pk', flat=True
+        ))
+
+    # The rating properties below read the precomputed RatingStats row; select_related
+    # ('rating_stats') when listing movies so they cost no extra queries
+    def _rating_stat(self, field):
+        try:
+            return getattr(self.rating_stats, field)
+        except ObjectDoesNotExist:
+            return 0
+
     @property
     def average_rating(self):
-        """Calculate weighted average rating using calculated overall scores"""
-        ratings = self.ratings.all()
-        if not ratings:
-            return 0
-        
-        total_weighted_score = sum(rating.weighted_score for rating in ratings)
-        total_weight = sum(2.0 if rating.is_critic_rating else 1.0 for rating in ratings)
-        
-        return round(total_weighted_score / total_weight, 1)
+        """Weighted average rating, critic ratings counting double"""
+        return self._rating_stat('weighted_average')
     
     @property
     def user_average_rating(self):
-        """Calculate average rating for regular users only using calculated scores"""
-        user_ratings = self.ratings.filter(user__profile__role='user')
-        if not user_ratings:
-            return 0
-        return round(sum(r.calculated_overall_score for r in user_ratings) / len(user_ratings), 1)
+        """Average rating for regular users only"""
+        return self._rating_stat('user_average')
     
     @property
     def critic_average_rating(self):
-        """Calculate average rating for critics only using calculated scores"""
-        critic_ratings = self.ratings.filter(user__profile__role='critic')
-        if not critic_ratings:
-            return 0
-        return round(sum(r.calculated_overall_score for r in critic_ratings) / len(critic_ratings), 1)
+        """Average rating for critics only"""
+        return self._rating_stat('critic_average')
     
     @property
     def average_story_rating(self):
-        """Calculate average story rating"""
-        ratings = self.ratings.all()
-        if not ratings:
-            return 0
-        return round(sum(rating.story_score for rating in ratings) / len(ratings), 1)
+        return self._rating_stat('story_average')
     
     @property
     def average_acting_rating(self):
-        """Calculate average acting rating"""
-        ratings = self.ratings.all()
-        if not ratings:
-            return 0
-        return round(sum(rating.acting_score for rating in ratings) / len(ratings), 1)
+        return self._rating_stat('acting_average')
     
     @property
     def average_cinematography_rating(self):
-        """Calculate average cinematography rating"""
-        ratings = self.ratings.all()
-        if not ratings:
-            return 0
-        return round(sum(rating.cinematography_score for rating in ratings) / len(ratings), 1)
+        return self._rating_stat('cinematography_average')
 
     @property
     def total_ratings(self):
-        return self.ratings.count()
+        return self._rating_stat('total_ratings')
 
 class Rating(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='ratings')
@@ -127,15 +147,98 @@ class Rating(models.Model):
         default=5
     )
     
+    # Rater's role at rating time, denormalized from UserProfile so aggregates avoid the auth join
+    rater_role = models.CharField(max_length=10, choices=UserProfile.ROLE_CHOICES, default='user')
+    
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    # Fields that feed RatingStats; snapshotted so saves and deletes can apply deltas
+    STATS_FIELDS = ('story_score', 'acting_score', 'cinematography_score', 'rater_role')
+
     class Meta:
         unique_together = ('user', 'movie')
 
     def __str__(self):
         score_display = self.overall_score or self.score
         return f"{self.user.username} - {self.movie.title} - {score_display}"
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance.snapshot_stats_fields()
+        return instance
+
+    def save(self, *args, **kwargs):
+        if self._state.adding:
+            try:
+                self.rater_role = self.user.profile.role
+            except ObjectDoesNotExist:
+                pass
+            with transaction.atomic():
+                Movie.lock_for_feedback([self.movie_id])
+                super().save(*args, **kwargs)
+            return
+        # The post_save stats delta runs inside this transaction, while the row is locked
+        with transaction.atomic():
+            self.lock_stats_fields()
+            super().save(*args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        with transaction.atomic():
+            if not self.lock_stats_fields():
+                # Already deleted, and its contribution already removed
+                return 0, {}
+            return super().delete(*args, **kwargs)
+
+    def lock_stats_fields(self):
+        """
+        Lock the row and snapshot the score values it holds now, not when this instance
+        was loaded, so concurrent edits of one rating each remove what the other wrote.
+        Returns False if the row no longer exists.
+        """
+        persisted = type(self).objects.select_for_update().filter(pk=self.pk).values(*self.STATS_FIELDS).first()
+        self._stats_snapshot = persisted
+        return persisted is not None
+
+    def snapshot_stats_fields(self):
+        """Remember the persisted score values so the next save can be applied as a delta"""
+        loaded = self.__dict__
+        if all(field in loaded for field in self.STATS_FIELDS):
+            self._stats_snapshot = {field: loaded[field] for field in self.STATS_FIELDS}
+        else:
+            self._stats_snapshot = None
+
+    def stats_contribution(self, snapshot=False):
+        """This rating's contribution to RatingStats, or None if the persisted values are unknown"""
+        if snapshot:
+            values = getattr(self, '_stats_snapshot', None)
+            if values is None:
+                return None
+        else:
+            values = {field: getattr(self, field) for field in self.STATS_FIELDS}
+        return RatingStats.contribution(
+            values['story_score'], values['acting_score'], values['cinematography_score'], values['rater_role']
+        )
+
+    @classmethod
+    def sync_rater_role(cls, user_ids, role):
+        """
+        Re-tag every rating by the given users with their new role and move the
+        affected contributions between the user/critic buckets of RatingStats.
+        """
+        with transaction.atomic():
+            ratings = cls.objects.filter(user_id__in=user_ids).exclude(rater_role=role)
+            changes = defaultdict(list)
+            for rating in ratings.values('movie_id', 'rater_role', *cls.STATS_FIELDS[:3]):
+                scores = (rating['story_score'], rating['acting_score'], rating['cinematography_score'])
+                changes[rating['movie_id']].append((
+                    RatingStats.contribution(*scores, rating['rater_role']),
+                    RatingStats.contribution(*scores, role),
+                ))
+            ratings.update(rater_role=role)
+            RatingStats.apply_changes_many(changes)
+        return sum(len(movie_changes) for movie_changes in changes.values())
     
     @property
     def effective_score(self):
@@ -158,7 +261,7 @@ class Rating(models.Model):
     @property
     def is_critic_rating(self):
         """Check if this is a critic rating"""
-        return self.user.profile.role == 'critic'
+        return self.rater_role == 'critic'
     
     @property
     def weighted_score(self):
@@ -180,6 +283,13 @@ class Review(models.Model):
     def __str__(self):
         return f"{self.user.username} - {self.movie.title} - {self.title}"
 
+    def save(self, *args, **kwargs):
+        if not self._state.adding:
+            return super().save(*args, **kwargs)
+        with transaction.atomic():
+            Movie.lock_for_feedback([self.movie_id])
+            super().save(*args, **kwargs)
+
 class Watchlist(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='watchlist')
     movie = models.ForeignKey(Movie, on_delete=models.CASCADE, related_name='in_watchlists')
@@ -200,6 +310,15 @@ class RatingStats(models.Model):
     user_ratings_count = models.IntegerField(default=0)
     critic_ratings_count = models.IntegerField(default=0)
     
+    # Running sums, maintained incrementally. Score sums hold story + acting + cinematography
+    # per rating so the averages below are exact (sum / 3n) and never drift.
+    score_sum = models.IntegerField(default=0)
+    user_score_sum = models.IntegerField(default=0)
+    critic_score_sum = models.IntegerField(default=0)
+    story_sum = models.IntegerField(default=0)
+    acting_sum = models.IntegerField(default=0)
+    cinematography_sum = models.IntegerField(default=0)
+    
     # Average ratings
     weighted_average = models.FloatField(default=0.0)
     user_average = models.FloatField(default=0.0)
@@ -210,37 +329,285 @@ class RatingStats(models.Model):
     acting_average = models.FloatField(default=0.0)
     cinematography_average = models.FloatField(default=0.0)
     
+    # Sums of squared per-rating scores (same 3-30 scale as the score sums), so the spread
+    # can be derived exactly however ratings are added, edited or removed
+    score_square_sum = models.BigIntegerField(default=0)
+    user_score_square_sum = models.BigIntegerField(default=0)
+    critic_score_square_sum = models.BigIntegerField(default=0)
+    
+    # Counts of overall scores rounded to 1-10, index 0 holding the 1s
+    histogram = models.JSONField(default=empty_histogram)
+    user_histogram = models.JSONField(default=empty_histogram)
+    critic_histogram = models.JSONField(default=empty_histogram)
+    
+    # Spread and disagreement, derived from the counters above
+    score_stddev = models.FloatField(default=0.0)
+    user_stddev = models.FloatField(default=0.0)
+    critic_stddev = models.FloatField(default=0.0)
+    divergence = models.FloatField(default=0.0, help_text="Absolute gap between critic and user averages")
+    
+    # Bumped on every change, so caches of anything rendered from the stats can key on it
+    version = models.BigIntegerField(default=0)
     updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        # Back the MovieListView rating sorts; scanned forwards or backwards, joined to movies by pk
+        indexes = [
+            models.Index(fields=['weighted_average', 'movie'], name='stats_weighted_rank_idx',
+                         condition=Q(total_ratings__gt=0)),
+            models.Index(fields=['critic_average', 'movie'], name='stats_critic_rank_idx',
+                         condition=Q(critic_ratings_count__gt=0)),
+            models.Index(fields=['user_average', 'movie'], name='stats_user_rank_idx',
+                         condition=Q(user_ratings_count__gt=0)),
+            models.Index(fields=['score_stddev', 'movie'], name='stats_stddev_rank_idx',
+                         condition=Q(total_ratings__gt=1)),
+            models.Index(fields=['divergence', 'movie'], name='stats_divergence_rank_idx',
+                         condition=Q(user_ratings_count__gt=0, critic_ratings_count__gt=0)),
+        ]
     
     def __str__(self):
         return f"{self.movie.title} - Stats"
     
+    # Counters that are summed from rating contributions; the averages are derived from these
+    COUNTER_FIELDS = (
+        'total_ratings', 'user_ratings_count', 'critic_ratings_count',
+        'score_sum', 'user_score_sum', 'critic_score_sum',
+        'story_sum', 'acting_sum', 'cinematography_sum',
+        'score_square_sum', 'user_score_square_sum', 'critic_score_square_sum',
+    )
+    HISTOGRAM_FIELDS = ('histogram', 'user_histogram', 'critic_histogram')
+
+    @staticmethod
+    def histogram_bucket(overall):
+        """Histogram index of a 3-30 score sum, i.e. its 1-10 average rounded half up, less one"""
+        return (overall + 1) // 3 - 1
+
+    @classmethod
+    def contribution(cls, story_score, acting_score, cinematography_score, role):
+        """Counter values a single rating adds to its movie's stats"""
+        overall = story_score + acting_score + cinematography_score
+        bucket = empty_histogram()
+        bucket[cls.histogram_bucket(overall)] = 1
+        return {
+            'total_ratings': 1,
+            'user_ratings_count': 1 if role == 'user' else 0,
+            'critic_ratings_count': 1 if role == 'critic' else 0,
+            'score_sum': overall,
+            'user_score_sum': overall if role == 'user' else 0,
+            'critic_score_sum': overall if role == 'critic' else 0,
+            'story_sum': story_score,
+            'acting_sum': acting_score,
+            'cinematography_sum': cinematography_score,
+            'score_square_sum': overall * overall,
+            'user_score_square_sum': overall * overall if role == 'user' else 0,
+            'critic_score_square_sum': overall * overall if role == 'critic' else 0,
+            'histogram': bucket,
+            'user_histogram': bucket if role == 'user' else empty_histogram(),
+            'critic_histogram': bucket if role == 'critic' else empty_histogram(),
+        }
+
+    @classmethod
+    def aggregate_expressions(cls, prefix=''):
+        """
+        Aggregates that recompute every counter from the Rating table in a single query.
+        Histograms come back as one ``<field>_<index>`` count per bucket; pass the result
+        through ``counters_from_aggregate`` to fold them into lists.
+        """
+        overall = F(f'{prefix}story_score') + F(f'{prefix}acting_score') + F(f'{prefix}cinematography_score')
+        is_user = Q(**{f'{prefix}rater_role': 'user'})
+        is_critic = Q(**{f'{prefix}rater_role': 'critic'})
+        expressions = {
+            'total_ratings': Count(f'{prefix}id'),
+            'user_ratings_count': Count(f'{prefix}id', filter=is_user),
+            'critic_ratings_count': Count(f'{prefix}id', filter=is_critic),
+            'score_sum': Sum(overall),
+            'user_score_sum': Sum(overall, filter=is_user),
+            'critic_score_sum': Sum(overall, filter=is_critic),
+            'story_sum': Sum(f'{prefix}story_score'),
+            'acting_sum': Sum(f'{prefix}acting_score'),
+            'cinematography_sum': Sum(f'{prefix}cinematography_score'),
+            'score_square_sum': Sum(overall * overall),
+            'user_score_square_sum': Sum(overall * overall, filter=is_user),
+            'critic_score_square_sum': Sum(overall * overall, filter=is_critic),
+        }
+        for field, is_role in (('histogram', Q()), ('user_histogram', is_user), ('critic_histogram', is_critic)):
+            for index in range(HISTOGRAM_SIZE):
+                # Bucket i holds score sums 3i+2 to 3i+4, i.e. averages rounding to i+1
+                in_bucket = Q(Range(overall, (3 * index + 2, 3 * index + 4)))
+                expressions[f'{field}_{index}'] = Count(f'{prefix}id', filter=is_role & in_bucket)
+        return expressions
+
+    @classmethod
+    def counters_from_aggregate(cls, row):
+        """Counters as ``counters()`` returns them, from a row of ``aggregate_expressions``"""
+        counters = {field: row[field] or 0 for field in cls.COUNTER_FIELDS}
+        for field in cls.HISTOGRAM_FIELDS:
+            counters[field] = [row[f'{field}_{index}'] or 0 for index in range(HISTOGRAM_SIZE)]
+        return counters
+
+    def refresh_averages(self):
+        """Derive the stored averages, spreads and divergence from the running counters"""
+        def mean(total, count):
+            return round(total / count, 1) if count else 0.0
+
+        def stddev(total, square_total, count):
+            # Population standard deviation of the 1-10 overall scores; the sums are of
+            # three-score totals, hence the division by 3
+            if count < 2:
+                return 0.0
+            variance = (square_total * count - total * total) / (count * count)
+            return round(math.sqrt(max(variance, 0)) / 3, 2)
+
+        # Critic ratings carry double weight, i.e. they are counted once more on top of the totals
+        self.weighted_average = mean(
+            self.score_sum + self.critic_score_sum, 3 * (self.total_ratings + self.critic_ratings_count)
+        )
+        self.user_average = mean(self.user_score_sum, 3 * self.user_ratings_count)
+        self.critic_average = mean(self.critic_score_sum, 3 * self.critic_ratings_count)
+        self.story_average = mean(self.story_sum, self.total_ratings)
+        self.acting_average = mean(self.acting_sum, self.total_ratings)
+        self.cinematography_average = mean(self.cinematography_sum, self.total_ratings)
+
+        self.score_stddev = stddev(self.score_sum, self.score_square_sum, self.total_ratings)
+        self.user_stddev = stddev(self.user_score_sum, self.user_score_square_sum, self.user_ratings_count)
+        self.critic_stddev = stddev(self.critic_score_sum, self.critic_score_square_sum, self.critic_ratings_count)
+        if self.user_ratings_count and self.critic_ratings_count:
+            gap = (self.critic_score_sum / self.critic_ratings_count -
+                   self.user_score_sum / self.user_ratings_count) / 3
+            self.divergence = round(abs(gap), 2)
+        else:
+            self.divergence = 0.0
+
+    def counters(self):
+        counters = {field: getattr(self, field) for field in self.COUNTER_FIELDS}
+        for field in self.HISTOGRAM_FIELDS:
+            counters[field] = list(getattr(self, field))
+        return counters
+
+    @property
+    def critic_audience_gap(self):
+        """Signed critic minus user average; positive when critics like the movie more"""
+        return round(self.critic_average - self.user_average, 1)
+
+    @classmethod
+    def apply_changes(cls, movie_id, changes):
+        """
+        Apply rating changes to a movie's stats in constant time.
+
+        ``changes`` is an iterable of ``(removed, added)`` contribution pairs, either of
+        which may be None (insert or delete). The stats row is locked for the duration so
+        simultaneous raters serialize on it instead of overwriting each other's deltas.
+        """
+        changes = list(changes)
+        with transaction.atomic():
+            stats = cls.objects.select_for_update().filter(movie_id=movie_id).first()
+            if stats is None:
+                if not any(added for removed, added in changes):
+                    return None
+                stats, created = cls.objects.select_for_update().get_or_create(movie_id=movie_id)
+
+            stats.add_changes(changes)
+            stats.save()
+        return stats
+
+    @classmethod
+    def apply_changes_many(cls, changes_by_movie, batch_size=1000):
+        """
+        apply_changes for many movies at once, given ``{movie_id: changes}``.
+
+        The stats rows are locked and read with one query and written back with one upsert
+        per ``batch_size`` movies, so a batch costs the same however many movies it touches.
+        """
+        changes_by_movie = {movie_id: list(changes) for movie_id, changes in changes_by_movie.items()}
+        update_fields = [field.name for field in cls._meta.concrete_fields if field.name not in ('id', 'movie')]
+        with transaction.atomic():
+            rows = {
+                stats.movie_id: stats
+                for stats in cls.objects.select_for_update().filter(movie_id__in=changes_by_movie).order_by('movie_id')
+            }
+            batch = []
+            for movie_id, changes in sorted(changes_by_movie.items()):
+                stats = rows.get(movie_id)
+                if stats is None:
+                    if not any(added for removed, added in changes):
+                        continue
+                    stats = cls(movie_id=movie_id)
+                stats.add_changes(changes)
+                batch.append(stats)
+            cls.objects.bulk_create(batch, update_conflicts=True, unique_fields=['movie'],
+                                    update_fields=update_fields, batch_size=batch_size)
+        return batch
+
+    def add_changes(self, changes):
+        """Fold ``(removed, added)`` contribution pairs into the counters and bump the version"""
+        for removed, added in changes:
+            for contribution, sign in ((removed, -1), (added, 1)):
+                if contribution:
+                    for field, value in contribution.items():
+                        current = getattr(self, field)
+                        if field in self.HISTOGRAM_FIELDS:
+                            setattr(self, field, [count + sign * delta for count, delta in zip(current, value)])
+                        else:
+                            setattr(self, field, current + sign * value)
+        self.refresh_averages()
+        self.version += 1
+
     @classmethod
     def update_stats(cls, movie):
-        """Update rating statistics for a movie using calculated scores"""
-        ratings = movie.ratings.all()
-        
-        if not ratings.exists():
-            # Delete stats if no ratings exist
-            cls.objects.filter(movie=movie).delete()
-            return
-        
-        stats, created = cls.objects.get_or_create(movie=movie)
-        
-        # Update counts
-        stats.total_ratings = ratings.count()
-        stats.user_ratings_count = ratings.filter(user__profile__role='user').count()
-        stats.critic_ratings_count = ratings.filter(user__profile__role='critic').count()
-        
-        # Update averages using calculated scores
-        stats.weighted_average = movie.average_rating
-        stats.user_average = movie.user_average_rating
-        stats.critic_average = movie.critic_average_rating
-        stats.story_average = movie.average_story_rating
-        stats.acting_average = movie.average_acting_rating
-        stats.cinematography_average = movie.average_cinematography_rating
-        
-        stats.save()
+        """Fully recompute rating statistics for a movie from its ratings"""
+        def recount():
+            return cls.counters_from_aggregate(
+                Rating.objects.filter(movie_id=movie.pk).aggregate(**cls.aggregate_expressions())
+            )
+
+        # Counted only once the row is locked, so no delta applied meanwhile is overwritten
+        with transaction.atomic():
+            stats = cls.objects.select_for_update().filter(movie_id=movie.pk).first()
+            counters = recount()
+            if stats is None:
+                if not counters['total_ratings']:
+                    return None
+                stats, created = cls.objects.select_for_update().get_or_create(movie_id=movie.pk)
+                if not created:
+                    # Made by a rating saved since the first read; count again under its lock
+                    counters = recount()
+            for field, value in counters.items():
+                setattr(stats, field, value)
+            stats.refresh_averages()
+            stats.version += 1
+            stats.save()
+        return stats
+
+    @classmethod
+    def rebuild(cls, ratings=None, batch_size=1000):
+        """
+        Recompute the stats of every movie in ``ratings`` (default: all of them) from a
+        single grouped pass over the Rating table, upserting the rows in batches. Meant for
+        bulk loads that bypass the rating signals; returns the number of movies rebuilt.
+        """
+        ratings = Rating.objects.all() if ratings is None else ratings
+        update_fields = [field.name for field in cls._meta.concrete_fields if field.name not in ('id', 'movie')]
+        rows = ratings.order_by().values('movie_id').annotate(**cls.aggregate_expressions())
+
+        # An upsert cannot increment, so rebuilt rows take the clock as their version,
+        # which is past any count a row reaches one change at a time
+        version = time.time_ns()
+        rebuilt = 0
+        batch = []
+        for row in rows.iterator(chunk_size=batch_size):
+            stats = cls(movie_id=row['movie_id'], version=version, **cls.counters_from_aggregate(row))
+            stats.refresh_averages()
+            batch.append(stats)
+            if len(batch) >= batch_size:
+                cls.objects.bulk_create(batch, update_conflicts=True, unique_fields=['movie'],
+                                        update_fields=update_fields)
+                rebuilt += len(batch)
+                batch = []
+        if batch:
+            cls.objects.bulk_create(batch, update_conflicts=True, unique_fields=['movie'],
+                                    update_fields=update_fields)
+            rebuilt += len(batch)
+        return rebuilt
 
 class Favorite(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='favorites')
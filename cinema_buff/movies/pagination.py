@@ -0,0 +1,163 @@
+import base64
+import binascii
+import json
+from datetime import date, datetime
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.db.models import Q
+from django.http import Http404
+
+
+class KeysetPage:
+    """A page of results with opaque cursors to its neighbours"""
+
+    def __init__(self, object_list, next_cursor=None, previous_cursor=None):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+
+class KeysetPaginator:
+    """
+    Paginate a queryset by seeking past the sort key of the last row seen instead of
+    using OFFSET, so every page costs the same as the first and no COUNT is needed.
+
+    ``ordering`` must end in a unique column (usually ``id``) so that the key is total.
+    It may also name annotations (e.g. a search rank), whose values are used as-is.
+    """
+
+    def __init__(self, queryset, ordering, per_page):
+        self.queryset = queryset
+        self.ordering = list(ordering)
+        self.per_page = per_page
+        self.fields = [
+            (name.lstrip('-'), name.startswith('-'), self._resolve_field(queryset.model, name.lstrip('-')))
+            for name in self.ordering
+        ]
+
+    @staticmethod
+    def _resolve_field(model, path):
+        field = None
+        try:
+            for part in path.split('__'):
+                field = model._meta.get_field(part)
+                model = field.related_model
+        except FieldDoesNotExist:
+            return None
+        return field
+
+    def page(self, cursor=None):
+        if cursor:
+            values, reverse = self.decode_cursor(cursor)
+        else:
+            values, reverse = None, False
+
+        queryset = self.queryset
+        if values is not None:
+            queryset = queryset.filter(self._seek_filter(values, reverse))
+        ordering = [self._flip(name) for name in self.ordering] if reverse else self.ordering
+
+        # Fetch one extra row to learn whether there is another page in this direction
+        rows = list(queryset.order_by(*ordering)[:self.per_page + 1])
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        if reverse:
+            rows.reverse()
+
+        next_cursor = previous_cursor = None
+        if rows:
+            if has_more or reverse:
+                next_cursor = self.encode_cursor(rows[-1], reverse=False)
+            if (has_more and reverse) or (values is not None and not reverse):
+                previous_cursor = self.encode_cursor(rows[0], reverse=True)
+        return KeysetPage(rows, next_cursor, previous_cursor)
+
+    @staticmethod
+    def _flip(name):
+        return name[1:] if name.startswith('-') else f'-{name}'
+
+    def _seek_filter(self, values, reverse):
+        """Lexicographic "row comes after values" condition over the ordering columns"""
+        condition = Q()
+        equal_prefix = Q()
+        for (name, descending, field), value in zip(self.fields, values):
+            lookup = 'lt' if descending != reverse else 'gt'
+            condition |= equal_prefix & Q(**{f'{name}__{lookup}': value})
+            equal_prefix &= Q(**{name: value})
+        return condition
+
+    def _row_values(self, obj):
+        values = []
+        for name, descending, field in self.fields:
+            value = obj
+            for part in name.split('__'):
+                value = getattr(value, part)
+            values.append(value)
+        return values
+
+    def encode_cursor(self, obj, reverse):
+        values = [
+            value.isoformat() if isinstance(value, (date, datetime)) else value
+            for value in self._row_values(obj)
+        ]
+        payload = json.dumps({'o': self.ordering, 'v': values, 'r': reverse}, separators=(',', ':'))
+        return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+    def decode_cursor(self, cursor):
+        try:
+            padded = cursor + '=' * (-len(cursor) % 4)
+            payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+            if payload['o'] != self.ordering or len(payload['v']) != len(self.fields):
+                raise ValueError('cursor does not match this ordering')
+            values = [
+                self._parse_value(field, value)
+                for (name, descending, field), value in zip(self.fields, payload['v'])
+            ]
+            return values, bool(payload['r'])
+        except (TypeError, ValueError, KeyError, binascii.Error, ValidationError):
+            raise Http404('Invalid cursor')
+
+    @staticmethod
+    def _parse_value(field, value):
+        if value is None:
+            raise ValueError('cursor values cannot be null')
+        if field is None:
+            # Annotation; only plain JSON numbers are meaningful here
+            if not isinstance(value, (int, float)):
+                raise ValueError('malformed annotation value in cursor')
+            return value
+        return field.to_python(value)
+
+
+class KeysetPaginationMixin:
+    """
+    ListView mixin that replaces offset pagination with keyset pagination.
+
+    Views declare ``keyset_ordering`` (or override ``get_keyset_ordering``); the template
+    receives ``page_obj`` with ``next_cursor``/``previous_cursor`` tokens to pass back
+    as ``?cursor=``.
+    """
+    keyset_ordering = ['-created_at', '-id']
+    cursor_kwarg = 'cursor'
+
+    def get_keyset_ordering(self):
+        return self.keyset_ordering
+
+    def paginate_queryset(self, queryset, page_size):
+        paginator = KeysetPaginator(queryset, self.get_keyset_ordering(), page_size)
+        page = paginator.page(self.request.GET.get(self.cursor_kwarg))
+        return paginator, page, page.object_list, page.has_other_pages()
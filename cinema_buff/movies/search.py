@@ -0,0 +1,199 @@
+"""
+Movie search backends.
+
+``get_search_backend()`` returns the configured backend (``MOVIE_SEARCH_BACKEND`` setting,
+a dotted path), defaulting to ranked full-text search on PostgreSQL and to an in-process
+inverted index on other databases such as the SQLite used for tests. Backends filter a
+Movie queryset down to matches and annotate it with ``search_rank`` so results can be
+ordered by relevance or combined with any other filter and sort.
+"""
+import math
+import re
+import threading
+from collections import defaultdict
+from django.conf import settings
+from django.db import connection
+from django.db.models import Case, F, FloatField, Value, When
+from django.db.models.functions import Cast
+from django.utils.module_loading import import_string
+
+TOKEN_RE = re.compile(r'\w+')
+
+
+def tokenize(text):
+    return TOKEN_RE.findall(text.lower())
+
+
+class BaseSearchBackend:
+    def search(self, queryset, query):
+        """Restrict ``queryset`` to movies matching ``query`` and annotate ``search_rank``"""
+        raise NotImplementedError
+
+    def index_movie(self, movie):
+        """Add or refresh a single movie in the index"""
+
+    def index_movies(self, movies):
+        """Add or refresh many movies, e.g. after a bulk import"""
+        for movie in movies:
+            self.index_movie(movie)
+
+    def remove_movie(self, movie_id):
+        """Drop a single movie from the index"""
+
+    def rebuild(self):
+        """Reindex every movie"""
+
+
+class PostgresSearchBackend(BaseSearchBackend):
+    """Ranked full-text search over the stored, GIN-indexed ``Movie.search_vector``"""
+    config = 'english'
+
+    def vector(self):
+        from django.contrib.postgres.search import SearchVector
+        return (
+            SearchVector('title', weight='A', config=self.config) +
+            SearchVector('synopsis', weight='B', config=self.config)
+        )
+
+    def search(self, queryset, query):
+        from django.contrib.postgres.search import SearchQuery, SearchRank
+        search_query = SearchQuery(query, search_type='websearch', config=self.config)
+        # ts_rank returns float4, but cursors hand the rank back as a Python float (float8);
+        # comparing float4 with float8 can match the boundary row again, so rank in float8
+        return queryset.filter(search_vector=search_query).annotate(
+            search_rank=Cast(SearchRank(F('search_vector'), search_query), output_field=FloatField())
+        )
+
+    def index_movie(self, movie):
+        from .models import Movie
+        Movie.objects.filter(pk=movie.pk).update(search_vector=self.vector())
+
+    def index_movies(self, movies):
+        from .models import Movie
+        Movie.objects.filter(pk__in=[movie.pk for movie in movies]).update(search_vector=self.vector())
+
+    def rebuild(self):
+        from .models import Movie
+        Movie.objects.update(search_vector=self.vector())
+
+
+class InMemorySearchBackend(BaseSearchBackend):
+    """
+    Process-local inverted index for SQLite and test environments.
+
+    Built lazily from the database on first use and kept current by the Movie signals.
+    Every query term must match (the last one as a prefix, for search-as-you-type) and
+    matches are scored by TF-IDF with title terms weighted above synopsis terms.
+    """
+    title_weight = 3.0
+    synopsis_weight = 1.0
+    max_results = 500
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._postings = None
+        self._documents = {}
+
+    def _ensure_built(self):
+        if self._postings is None:
+            self.rebuild()
+
+    def rebuild(self):
+        from .models import Movie
+        with self._lock:
+            self._postings = defaultdict(dict)
+            self._documents = {}
+            for movie in Movie.objects.only('pk', 'title', 'synopsis').iterator():
+                self._add(movie)
+
+    def _add(self, movie):
+        weights = defaultdict(float)
+        for token in tokenize(movie.title):
+            weights[token] += self.title_weight
+        for token in tokenize(movie.synopsis):
+            weights[token] += self.synopsis_weight
+        for token, weight in weights.items():
+            self._postings[token][movie.pk] = weight
+        self._documents[movie.pk] = set(weights)
+
+    def _discard(self, movie_id):
+        for token in self._documents.pop(movie_id, ()):
+            postings = self._postings.get(token)
+            if postings is not None:
+                postings.pop(movie_id, None)
+                if not postings:
+                    del self._postings[token]
+
+    def index_movie(self, movie):
+        if self._postings is None:
+            return
+        with self._lock:
+            self._discard(movie.pk)
+            self._add(movie)
+
+    def remove_movie(self, movie_id):
+        if self._postings is None:
+            return
+        with self._lock:
+            self._discard(movie_id)
+
+    def _postings_for(self, term, prefix):
+        if not prefix:
+            return self._postings.get(term, {})
+        merged = {}
+        for token, postings in self._postings.items():
+            if token.startswith(term):
+                for movie_id, weight in postings.items():
+                    merged[movie_id] = max(weight, merged.get(movie_id, 0.0))
+        return merged
+
+    def scores(self, query):
+        self._ensure_built()
+        terms = tokenize(query)
+        if not terms:
+            return {}
+
+        with self._lock:
+            total = len(self._documents) or 1
+            scores = None
+            for position, term in enumerate(terms):
+                postings = self._postings_for(term, prefix=position == len(terms) - 1)
+                if not postings:
+                    return {}
+                idf = math.log(1 + total / len(postings))
+                term_scores = {movie_id: weight * idf for movie_id, weight in postings.items()}
+                if scores is None:
+                    scores = term_scores
+                else:
+                    scores = {
+                        movie_id: score + term_scores[movie_id]
+                        for movie_id, score in scores.items() if movie_id in term_scores
+                    }
+        best = sorted(scores.items(), key=lambda item: item[1], reverse=True)[:self.max_results]
+        return dict(best)
+
+    def search(self, queryset, query):
+        scores = self.scores(query)
+        if not scores:
+            return queryset.none().annotate(search_rank=Value(0.0, output_field=FloatField()))
+        return queryset.filter(pk__in=list(scores)).annotate(search_rank=Case(
+            *[When(pk=movie_id, then=Value(score)) for movie_id, score in scores.items()],
+            default=Value(0.0),
+            output_field=FloatField(),
+        ))
+
+
+_backend = None
+
+
+def get_search_backend():
+    global _backend
+    if _backend is None:
+        path = getattr(settings, 'MOVIE_SEARCH_BACKEND', None)
+        if path:
+            _backend = import_string(path)()
+        elif connection.vendor == 'postgresql':
+            _backend = PostgresSearchBackend()
+        else:
+            _backend = InMemorySearchBackend()
+    return _backend
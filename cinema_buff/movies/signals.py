@@ -1,9 +1,120 @@
-from django.db.models.signals import post_save, post_delete
+from django.contrib.auth.models import User
+from django.db.models.signals import m2m_changed, post_init, post_save, post_delete
 from django.dispatch import receiver
-from .models import Rating, RatingStats
+from django.utils import timezone
+from accounts.context import invalidate_user_context
+from accounts.models import UserProfile
+from perf.pagecache import bump_page_versions
+from .models import Favorite, Genre, Movie, Rating, RatingStats, Review, Watchlist
+from .search import get_search_backend
+from .autocomplete import refresh_title, remove_title
+
+@receiver(post_save, sender=Movie)
+def create_rating_stats(sender, instance, created, raw=False, **kwargs):
+    """Give every movie a stats row so rating sorts can inner-join on RatingStats"""
+    if created and not raw:
+        RatingStats.objects.get_or_create(movie=instance)
+
+@receiver(post_save, sender=Movie)
+def index_movie_for_search(sender, instance, raw=False, **kwargs):
+    """Keep the search index current as movies are added and edited"""
+    if not raw:
+        get_search_backend().index_movie(instance)
+        refresh_title(instance.pk, instance.title)
+
+@receiver(post_delete, sender=Movie)
+def remove_movie_from_search(sender, instance, **kwargs):
+    get_search_backend().remove_movie(instance.pk)
+    remove_title(instance.pk)
 
 @receiver(post_save, sender=Rating)
+def update_rating_stats(sender, instance, created, raw=False, **kwargs):
+    """Apply a saved rating to its movie's statistics as a delta"""
+    if raw:
+        return
+
+    # Rating.save snapshots the values it overwrites while holding the row lock
+    removed = None if created else instance.stats_contribution(snapshot=True)
+    RatingStats.apply_changes(instance.movie_id, [(removed, instance.stats_contribution())])
+    instance.snapshot_stats_fields()
+
 @receiver(post_delete, sender=Rating)
-def update_rating_stats(sender, instance, **kwargs):
-    """Update rating statistics when a rating is saved or deleted"""
-    RatingStats.update_stats(instance.movie)
+def remove_rating_stats(sender, instance, **kwargs):
+    """Remove a deleted rating's contribution from its movie's statistics"""
+    removed = instance.stats_contribution(snapshot=True) or instance.stats_contribution()
+    RatingStats.apply_changes(instance.movie_id, [(removed, None)])
+
+@receiver(post_save, sender=UserProfile)
+def sync_rater_role(sender, instance, created, raw=False, **kwargs):
+    """Re-tag a user's ratings when their role changes"""
+    if raw:
+        return
+
+    loaded_role = getattr(instance, '_loaded_role', None)
+    if not created and loaded_role != instance.role:
+        Rating.sync_rater_role([instance.user_id], instance.role)
+        expire_author_pages([instance.user_id])
+    instance._loaded_role = instance.role
+
+def expire_author_pages(user_ids):
+    """Expire the pages of every movie the users rated or reviewed, which show their name and role"""
+    movie_ids = set(Rating.objects.filter(user_id__in=user_ids).values_list('movie_id', flat=True))
+    movie_ids.update(Review.objects.filter(user_id__in=user_ids).values_list('movie_id', flat=True))
+    bump_page_versions(*(f'movie:{movie_id}' for movie_id in sorted(movie_ids)))
+
+@receiver(post_init, sender=User)
+def remember_username(sender, instance, **kwargs):
+    # Read from __dict__ so that a deferred username is not loaded
+    instance._loaded_username = instance.__dict__.get('username')
+
+@receiver(post_save, sender=User)
+def expire_renamed_author_pages(sender, instance, created, raw=False, update_fields=None, **kwargs):
+    if raw or created or (update_fields is not None and 'username' not in update_fields):
+        return
+    if instance._loaded_username not in (None, instance.username):
+        expire_author_pages([instance.pk])
+    instance._loaded_username = instance.username
+
+@receiver(post_save, sender=Movie)
+@receiver(post_delete, sender=Movie)
+def expire_movie_pages(sender, instance, **kwargs):
+    bump_page_versions('movies', f'movie:{instance.pk}')
+
+@receiver(post_save, sender=Rating)
+@receiver(post_delete, sender=Rating)
+def expire_rated_movie_pages(sender, instance, **kwargs):
+    """A rating moves its movie's averages, and with them the rating sorts"""
+    bump_page_versions('movies', f'movie:{instance.movie_id}')
+
+@receiver(post_save, sender=Review)
+@receiver(post_delete, sender=Review)
+def expire_reviewed_movie_page(sender, instance, **kwargs):
+    bump_page_versions(f'movie:{instance.movie_id}')
+
+@receiver(post_save, sender=Genre)
+@receiver(post_delete, sender=Genre)
+def expire_genre_pages(sender, instance, **kwargs):
+    bump_page_versions('movies', 'genres')
+
+@receiver(m2m_changed, sender=Movie.genres.through)
+def expire_movie_genre_pages(sender, instance, action, reverse, pk_set, **kwargs):
+    """Genre badges are part of cached pages and movie cards, which key on updated_at"""
+    if action not in ('post_add', 'post_remove', 'pre_clear'):
+        return
+    if reverse:
+        movies = instance.movies.all() if action == 'pre_clear' else Movie.objects.filter(pk__in=pk_set)
+        movies.update(updated_at=timezone.now())
+        bump_page_versions('movies', 'genres')
+    else:
+        Movie.objects.filter(pk=instance.pk).update(updated_at=timezone.now())
+        bump_page_versions('movies', f'movie:{instance.pk}')
+
+@receiver(post_save, sender=Watchlist)
+@receiver(post_delete, sender=Watchlist)
+def expire_watchlist_ids(sender, instance, **kwargs):
+    invalidate_user_context(instance.user_id, 'watchlist_ids')
+
+@receiver(post_save, sender=Favorite)
+@receiver(post_delete, sender=Favorite)
+def expire_favorite_ids(sender, instance, **kwargs):
+    invalidate_user_context(instance.user_id, 'favorite_ids')
@@ -1,7 +1,9 @@
 from django import template
 from django.utils.html import format_html
 from django.utils.safestring import mark_safe
-from ..models import RatingStats
+from perf.fragments import render_fragments
+from perf.pagecache import page_versions
+from ..models import Rating, RatingStats
 
 register = template.Library()
 
@@ -39,9 +41,25 @@ def rating_breakdown(movie):
     """Get rating breakdown for a movie"""
     try:
         stats = movie.rating_stats
-        if not stats:
+        if not stats or not stats.total_ratings:
             return None
         
+        # Score distribution, with bar lengths on the same 0-10 scale as the averages
+        # so the tallest bucket fills its bar
+        tallest = max(stats.histogram) or 1
+        distribution = [
+            {
+                'score': index + 1,
+                'total': total,
+                'users': users,
+                'critics': critics,
+                'scaled': round(total / tallest * 10, 1),
+            }
+            for index, (total, users, critics) in enumerate(
+                zip(stats.histogram, stats.user_histogram, stats.critic_histogram)
+            )
+        ]
+        
         return {
             'overall': stats.weighted_average,
             'story': stats.story_average,
@@ -52,6 +70,12 @@ def rating_breakdown(movie):
             'total_ratings': stats.total_ratings,
             'user_count': stats.user_ratings_count,
             'critic_count': stats.critic_ratings_count,
+            'stddev': stats.score_stddev,
+            'user_stddev': stats.user_stddev,
+            'critic_stddev': stats.critic_stddev,
+            'divergence': stats.divergence,
+            'critic_audience_gap': stats.critic_audience_gap,
+            'distribution': distribution,
         }
     except RatingStats.DoesNotExist:
         return None
@@ -65,3 +89,32 @@ def role_badge(user_role):
         'user': '<span class="badge badge-user">User</span>',
     }
     return mark_safe(badges.get(user_role, badges['user']))
+
+@register.simple_tag
+def movie_cards(movies, user=None, template_name='movies/movie_card.html'):
+    """
+    ``(movie, card html, the user's overall score or None)`` for each movie.
+
+    The cards come from the fragment cache, keyed on the movie's updated_at, its
+    RatingStats version and the genres version (for renamed genres), so a page costs one
+    multi-get plus renders of the cards that changed. Only the user's own score is
+    looked up per request.
+    """
+    movies = list(movies)
+    genres_version = page_versions(['genres'])[0] if movies else None
+
+    def version(movie):
+        try:
+            stats_version = movie.rating_stats.version
+        except RatingStats.DoesNotExist:
+            stats_version = None
+        return movie.pk, movie.updated_at.timestamp(), stats_version, genres_version
+
+    cards = render_fragments(template_name, movies, version, context_name='movie')
+    scores = {}
+    if user is not None and user.is_authenticated and movies:
+        for movie_id, story, acting, cinematography in Rating.objects.filter(user=user, movie__in=movies).values_list(
+            'movie_id', 'story_score', 'acting_score', 'cinematography_score'
+        ):
+            scores[movie_id] = (story + acting + cinematography) / 3
+    return [(movie, mark_safe(card), scores.get(movie.pk)) for movie, card in zip(movies, cards)]
@@ -1,3 +1,312 @@
-from django.test import TestCase
+import html
+import json
+import os
+import re
+import tempfile
+import threading
+from datetime import date
+from io import StringIO
+from unittest import mock
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.db.models import Case, FloatField, Value, When
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from .autocomplete import TitleIndex, _IndexHolder
+from .bulk import insert_rows
+from .models import Genre, Movie, Rating, RatingStats
+from .pagination import KeysetPaginator
 
-# Create your tests here.
+NEXT_LINK = re.compile(r'href="(\?cursor=[^"]+)">Next</a>')
+LOCMEM_CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class MovieListPaginationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.movies = [
+            Movie.objects.create(title=f'Great Escape {i}', synopsis='A great escape.', release_date=date(2000, 1, 1))
+            for i in range(30)
+        ]
+
+    def setUp(self):
+        cache.clear()
+
+    def walk(self, url, sort):
+        """Follow the Next links from ``url``; returns the movie ids in the order shown"""
+        seen = []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200, url)
+            self.assertEqual(response.context['current_sort'], sort)
+            seen += [movie.pk for movie in response.context['movies']]
+            match = NEXT_LINK.search(response.content.decode())
+            url = reverse('movies:movie_list') + html.unescape(match.group(1)) if match else None
+        return seen
+
+    def test_search_pages_follow_relevance(self):
+        seen = self.walk(reverse('movies:movie_list') + '?search=great', 'relevance')
+        self.assertEqual(sorted(seen), sorted(movie.pk for movie in self.movies))
+
+    def test_newest_pages_cover_every_movie_once(self):
+        seen = self.walk(reverse('movies:movie_list'), 'newest')
+        self.assertEqual(seen, [movie.pk for movie in reversed(self.movies)])
+
+
+class KeysetPaginatorTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.movies = [
+            Movie.objects.create(title=f'Movie {i}', synopsis='x', release_date=date(2000, 1, 1)) for i in range(10)
+        ]
+
+    def ranked(self):
+        """Float ranks with ties, like a search where several titles score the same"""
+        return Movie.objects.annotate(search_rank=Case(
+            *(When(pk=movie.pk, then=Value(0.1 if i % 3 else 0.7)) for i, movie in enumerate(self.movies)),
+            output_field=FloatField(),
+        ))
+
+    def test_tied_ranks_are_broken_by_id_in_both_directions(self):
+        paginator = KeysetPaginator(self.ranked(), ['-search_rank', '-id'], 3)
+        expected = [movie.pk for movie in sorted(
+            self.movies, key=lambda movie: (self.movies.index(movie) % 3 == 0, movie.pk), reverse=True,
+        )]
+
+        pages = [paginator.page()]
+        while pages[-1].has_next():
+            pages.append(paginator.page(pages[-1].next_cursor))
+        self.assertEqual([movie.pk for page in pages for movie in page], expected)
+
+        backwards = [pages[-1]]
+        while backwards[-1].has_previous():
+            backwards.append(paginator.page(backwards[-1].previous_cursor))
+        self.assertEqual([movie.pk for page in reversed(backwards) for movie in page], expected)
+
+
+class TitleIndexRefreshTests(TestCase):
+    def test_stale_index_is_served_while_the_new_one_builds(self):
+        holder = _IndexHolder()
+        old = TitleIndex()
+        old.add(1, 'Heat')
+        holder.index, holder.built_at = old, 0.0
+
+        release = threading.Event()
+        new = TitleIndex()
+        new.add(2, 'Alien')
+
+        def build():
+            release.wait(5)
+            return new
+
+        with override_settings(AUTOCOMPLETE_MAX_AGE=0), mock.patch.object(holder, 'build', build):
+            self.assertIs(holder.get(), old)
+            # A second lookup neither waits nor starts another build
+            self.assertIs(holder.get(), old)
+            self.assertIsNone(holder.refresh_in_background())
+            thread, = [thread for thread in threading.enumerate() if thread.name == 'title-index-refresh']
+            holder.apply(3, 'Aliens')
+            holder.apply(1, None)
+            release.set()
+            thread.join(5)
+
+        self.assertIs(holder.index, new)
+        self.assertEqual([row['id'] for row in holder.index.suggest('alien')], [2, 3])
+        self.assertEqual(old.suggest('heat'), [])
+
+    def test_changes_made_while_the_new_index_is_swapped_in_are_kept(self):
+        holder = _IndexHolder()
+        holder.index, holder.built_at = TitleIndex(), 0.0
+        new = TitleIndex()
+        replay = new.add
+        changes = []
+
+        def add(movie_id, title):
+            # A title change arriving from another request while the replay runs
+            if not changes:
+                changes.append(threading.Thread(target=holder.apply, args=(4, 'Ran')))
+                changes[0].start()
+                changes[0].join(0.2)
+            replay(movie_id, title)
+
+        def build():
+            holder.apply(3, 'Aliens')
+            return new
+
+        with mock.patch.object(holder, 'build', build), mock.patch.object(new, 'add', add):
+            self.assertIs(holder.refresh(), new)
+        changes[0].join(5)
+        self.assertEqual([row['title'] for row in holder.index.suggest('ran')], ['Ran'])
+        self.assertEqual([row['title'] for row in holder.index.suggest('aliens')], ['Aliens'])
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class RatingStatsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.movie = Movie.objects.create(title='Heat', synopsis='x', release_date=date(1995, 12, 15))
+        cls.viewer = User.objects.create_user('viewer')
+        cls.critic = User.objects.create_user('critic')
+        profile = cls.critic.profile
+        profile.role = 'critic'
+        profile.save()
+
+    def assertStatsMatchRatings(self):
+        """The incrementally kept stats equal a full recount of the movie's ratings"""
+        stats = RatingStats.objects.get(movie=self.movie)
+        counters = RatingStats.counters_from_aggregate(
+            Rating.objects.filter(movie=self.movie).aggregate(**RatingStats.aggregate_expressions())
+        )
+        self.assertEqual(stats.counters(), counters)
+        recounted = RatingStats(**counters)
+        recounted.refresh_averages()
+        for field in ('weighted_average', 'user_average', 'critic_average', 'score_stddev', 'divergence'):
+            self.assertEqual(getattr(stats, field), getattr(recounted, field), field)
+        return stats
+
+    def rate(self, user, story, acting, cinematography):
+        return Rating.objects.create(user=user, movie=self.movie, story_score=story, acting_score=acting,
+                                     cinematography_score=cinematography)
+
+    def test_saves_and_deletes_apply_deltas(self):
+        rating = self.rate(self.viewer, 5, 6, 7)
+        self.rate(self.critic, 9, 9, 8)
+        stats = self.assertStatsMatchRatings()
+        self.assertEqual((stats.user_ratings_count, stats.critic_ratings_count), (1, 1))
+
+        rating = Rating.objects.get(pk=rating.pk)
+        rating.story_score = 2
+        rating.save()
+        self.assertStatsMatchRatings()
+
+        # Loaded without its scores; the save reads what it overwrites itself
+        partial = Rating.objects.only('pk', 'user', 'movie').get(pk=rating.pk)
+        partial.acting_score = 10
+        partial.save()
+        self.assertStatsMatchRatings()
+
+        Rating.objects.get(user=self.critic).delete()
+        stats = self.assertStatsMatchRatings()
+        self.assertEqual(stats.critic_ratings_count, 0)
+
+    def test_stale_copies_remove_what_the_row_holds(self):
+        rating = self.rate(self.viewer, 5, 5, 5)
+        first, second = Rating.objects.get(pk=rating.pk), Rating.objects.get(pk=rating.pk)
+        first.story_score = 9
+        first.save()
+        # Loaded before the first edit, like a second request racing it
+        second.story_score = 1
+        second.save()
+        self.assertStatsMatchRatings()
+
+        first.delete()
+        second.delete()
+        stats = self.assertStatsMatchRatings()
+        self.assertEqual(stats.total_ratings, 0)
+
+    def test_recount_runs_after_the_stats_row_is_locked(self):
+        self.rate(self.viewer, 5, 6, 7)
+        RatingStats.objects.filter(movie=self.movie).update(total_ratings=0, score_sum=0)
+        with CaptureQueriesContext(connection) as queries:
+            RatingStats.update_stats(self.movie)
+        self.assertStatsMatchRatings()
+        tables = [
+            'stats' if 'FROM "movies_ratingstats"' in query['sql'] else 'ratings'
+            for query in queries if query['sql'].startswith('SELECT')
+        ]
+        self.assertEqual(tables[:2], ['stats', 'ratings'])
+
+    def test_every_change_bumps_the_version(self):
+        versions = [RatingStats.objects.get(movie=self.movie).version]
+        rating = self.rate(self.viewer, 5, 5, 5)
+        versions.append(RatingStats.objects.get(movie=self.movie).version)
+        rating.delete()
+        versions.append(RatingStats.objects.get(movie=self.movie).version)
+        self.assertEqual(versions, sorted(set(versions)))
+
+    def test_role_change_moves_ratings_between_buckets(self):
+        self.rate(self.viewer, 8, 8, 8)
+        self.rate(self.critic, 4, 4, 4)
+
+        profile = self.viewer.profile
+        profile.role = 'critic'
+        profile.save()
+        stats = self.assertStatsMatchRatings()
+        self.assertEqual((stats.user_ratings_count, stats.critic_ratings_count), (0, 2))
+        self.assertEqual(set(Rating.objects.values_list('rater_role', flat=True)), {'critic'})
+
+    def test_role_change_updates_all_movies_stats_at_once(self):
+        movies = [self.movie] + [
+            Movie.objects.create(title=f'Movie {i}', synopsis='x', release_date=date(2000, 1, 1)) for i in range(4)
+        ]
+        for movie in movies:
+            Rating.objects.create(user=self.viewer, movie=movie, story_score=7)
+
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(Rating.sync_rater_role([self.viewer.pk], 'critic'), len(movies))
+        # The stats rows are locked with one query and written with one upsert
+        self.assertEqual(sum('movies_ratingstats' in query['sql'] for query in queries), 2)
+        for movie in movies:
+            self.assertEqual(RatingStats.objects.get(movie=movie).critic_ratings_count, 1)
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class ImportCatalogTests(TestCase):
+    def import_catalog(self, rows, *args):
+        """Run import_catalog over ``rows`` written as JSON Lines; returns its stderr"""
+        stderr = StringIO()
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'catalog.jsonl')
+            with open(path, 'w', encoding='utf-8') as f:
+                f.writelines(json.dumps(row) + '\n' for row in rows)
+            call_command('import_catalog', path, '--batch-size', '2', *args, stdout=StringIO(), stderr=stderr)
+        return stderr.getvalue()
+
+    def test_imports_valid_rows_once(self):
+        Genre.objects.create(name='Drama')
+        rows = [
+            {'external_id': 'tt1', 'title': 'Heat', 'release_date': '1995-12-15', 'genres': ['drama', 'Noir']},
+            {'external_id': 'tt2', 'title': 'Alien', 'release_date': '1979-05-25'},
+            {'title': 'Ran', 'release_date': '1985-06-01', 'content_type': 'series'},
+            {'title': '', 'release_date': '1985-06-01'},
+            {'title': 'Undated', 'release_date': 'soon'},
+            {'external_id': 'tt1', 'title': 'Heat again', 'release_date': '1995-12-15'},
+            {'external_id': 'x' * 65, 'title': 'Too long an id', 'release_date': '2001-01-01'},
+            {'title': 123, 'release_date': '2001-01-01'},
+            {'title': 'Numeric date', 'release_date': 19950101},
+            {'title': 'Numeric genres', 'release_date': '2001-01-01', 'genres': [1]},
+        ]
+        errors = self.import_catalog(rows)
+        self.assertIn('Row 4: missing title', errors)
+        self.assertIn('Row 5: bad release_date', errors)
+        self.assertIn('Row 7: external_id longer than 64 characters', errors)
+        self.assertIn('Row 8: title is not a string: 123', errors)
+        self.assertIn('Row 9: release_date is not a string: 19950101', errors)
+        self.assertIn('Row 10: genres is not a list of names: [1]', errors)
+
+        self.assertEqual(sorted(Movie.objects.values_list('title', flat=True)), ['Alien', 'Heat', 'Ran'])
+        heat = Movie.objects.get(external_id='tt1')
+        self.assertEqual([genre.name for genre in heat.genres.all()], ['Drama'])
+        self.assertEqual(RatingStats.objects.count(), 3)
+
+        # Replaying the file adds nothing
+        self.import_catalog(rows, '--restart')
+        self.assertEqual(Movie.objects.count(), 3)
+
+    def test_create_genres(self):
+        self.import_catalog([{'title': 'Heat', 'release_date': '1995-12-15', 'genres': ['Noir']}], '--create-genres')
+        self.assertEqual([genre.name for genre in Movie.objects.get().genres.all()], ['Noir'])
+
+
+class InsertRowsTests(TestCase):
+    def test_rows_are_written_in_batches(self):
+        now = timezone.now()
+        rows = [(f'Genre {i}', '', now, now) for i in range(5)]
+        written = insert_rows(Genre, ['name', 'description', 'created_at', 'updated_at'], rows, batch_size=2)
+        self.assertEqual(written, 5)
+        self.assertEqual(Genre.objects.filter(name__startswith='Genre ').count(), 5)
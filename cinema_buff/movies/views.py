@@ -3,46 +3,53 @@ from django.contrib.auth.mixins import LoginRequiredMixin
 from django.views.generic import ListView, DetailView, CreateView, UpdateView, DeleteView
 from django.contrib import messages
 from django.urls import reverse_lazy
-from django.db.models import Avg, Q
+from functools import partial
+from django.db.models import Count, Max, Q
 from .models import Movie, Genre, Rating, Review, Watchlist, Favorite, RatingStats
 from .forms import RatingForm, ReviewForm, MovieCreateForm
+from .pagination import KeysetPaginationMixin
+from .search import get_search_backend
+from recommendations.models import SimilarTitle
+from perf.conditional import conditional_get, latest, make_etag
+from perf.fragments import template_hash
+from perf.pagecache import AnonymousPageCacheMixin, page_versions
 
-class MovieListView(ListView):
+class MovieListView(AnonymousPageCacheMixin, KeysetPaginationMixin, ListView):
     model = Movie
     template_name = 'movies/movie_list.html'
     context_object_name = 'movies'
     paginate_by = 12
+    query_budget = 7
+    page_cache_params = ('search', 'genre', 'sort', 'cursor')
+    page_cache_versions = ('movies',)
+
+    # Rating sorts are served from the precomputed RatingStats columns. Each entry is the
+    # condition a movie must meet to be ranked, and the ordering; both are covered by a
+    # partial index on RatingStats (see RatingStats.Meta.indexes).
+    RATING_SORTS = {
+        'highest_rated': (Q(rating_stats__total_ratings__gt=0), ['-rating_stats__weighted_average', '-id']),
+        'lowest_rated': (Q(rating_stats__total_ratings__gt=0), ['rating_stats__weighted_average', 'id']),
+        'critic_ratings': (Q(rating_stats__critic_ratings_count__gt=0), ['-rating_stats__critic_average', '-id']),
+        'user_ratings': (Q(rating_stats__user_ratings_count__gt=0), ['-rating_stats__user_average', '-id']),
+        'most_divisive': (Q(rating_stats__total_ratings__gt=1), ['-rating_stats__score_stddev', '-id']),
+        'critics_vs_audience': (
+            Q(rating_stats__user_ratings_count__gt=0, rating_stats__critic_ratings_count__gt=0),
+            ['-rating_stats__divergence', '-id'],
+        ),
+    }
 
     def get_queryset(self):
-        queryset = Movie.objects.all().prefetch_related('genres', 'ratings')
+        # search_vector is only used in WHERE clauses, never read back
+        queryset = Movie.objects.defer('search_vector').select_related('rating_stats').prefetch_related('genres')
         
-        # Handle search
-        search_query = self.request.GET.get('search', '')
+        # Handle search; matches are annotated with search_rank for the relevance sort
+        search_query = self.request.GET.get('search', '').strip()
         if search_query:
-            queryset = queryset.filter(
-                Q(title__icontains=search_query) |
-                Q(synopsis__icontains=search_query)
-            ).distinct()
+            queryset = get_search_backend().search(queryset, search_query)
         
-        sort_by = self.request.GET.get('sort', 'newest')
-        if sort_by == 'highest_rated':
-            queryset = queryset.annotate(
-                weighted_avg=Avg('ratings__overall_score')
-            ).order_by('-weighted_avg')
-        elif sort_by == 'lowest_rated':
-            queryset = queryset.annotate(
-                weighted_avg=Avg('ratings__overall_score')
-            ).order_by('weighted_avg')
-        elif sort_by == 'critic_ratings':
-            # Sort by critic ratings (weighted more heavily)
-            queryset = queryset.annotate(
-                critic_avg=Avg('ratings__overall_score', filter=Q(ratings__user__profile__role='critic'))
-            ).order_by('-critic_avg')
-        elif sort_by == 'user_ratings':
-            # Sort by regular user ratings only
-            queryset = queryset.annotate(
-                user_avg=Avg('ratings__overall_score', filter=Q(ratings__user__profile__role='user'))
-            ).order_by('-user_avg')
+        sort_by = self.get_sort()
+        if sort_by in self.RATING_SORTS:
+            queryset = queryset.filter(self.RATING_SORTS[sort_by][0])
         elif sort_by == 'my_ratings':
             if self.request.user.is_authenticated:
                 user_rated_movies = Rating.objects.filter(user=self.request.user).values_list('movie_id', flat=True)
@@ -50,41 +57,84 @@ class MovieListView(ListView):
             else:
                 queryset = queryset.none()
         
+        # Genre names are unique, so filtering through the M2M cannot duplicate rows
         genre_filter = self.request.GET.get('genre')
         if genre_filter:
             queryset = queryset.filter(genres__name=genre_filter)
             
-        return queryset.distinct()
+        return queryset
+
+    def get_sort(self):
+        # Searches rank by relevance unless another sort is chosen; without a search
+        # "relevance" falls back to newest first
+        sort_by = self.request.GET.get('sort') or 'relevance'
+        if sort_by == 'relevance' and not self.request.GET.get('search', '').strip():
+            return 'newest'
+        return sort_by
+
+    def get_keyset_ordering(self):
+        sort_by = self.get_sort()
+        if sort_by in self.RATING_SORTS:
+            return self.RATING_SORTS[sort_by][1]
+        if sort_by == 'relevance':
+            return ['-search_rank', '-id']
+        return ['-created_at', '-id']
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         context['genres'] = Genre.objects.all()
-        context['current_sort'] = self.request.GET.get('sort', 'newest')
+        # The sort actually applied, so the dropdown and the cursor links match the ordering
+        context['current_sort'] = self.get_sort()
         context['current_genre'] = self.request.GET.get('genre', '')
         context['current_search'] = self.request.GET.get('search', '')
         
         # Check if user can add movies (critic or admin)
-        if self.request.user.is_authenticated:
-            user_role = getattr(self.request.user.profile, 'role', 'user')
-            context['can_add_movie'] = user_role in ['critic', 'admin']
-        else:
-            context['can_add_movie'] = False
+        context['can_add_movie'] = self.request.user_context.can_add_movies
             
         return context
 
-class MovieDetailView(DetailView):
+class MovieDetailView(AnonymousPageCacheMixin, DetailView):
     model = Movie
     template_name = 'movies/movie_detail.html'
     context_object_name = 'movie'
+    query_budget = 12
+
+    def get_page_cache_versions(self):
+        return ['genres', 'similar_titles', f"movie:{self.kwargs['pk']}"]
+
+    def dispatch(self, request, *args, **kwargs):
+        return conditional_get(request, self.get_validators(), partial(super().dispatch, request, *args, **kwargs))
+
+    def get_validators(self):
+        """ETag and Last-Modified from one query over the movie, its stats and its reviews"""
+        # Signed-in visitors see their own rating, lists and messages on the page
+        if self.request.user.is_authenticated:
+            return None
+        row = Movie.objects.filter(pk=self.kwargs['pk']).annotate(
+            review_count=Count('reviews'), latest_review=Max('reviews__updated_at'),
+        ).values_list(
+            'updated_at', 'rating_stats__updated_at', 'rating_stats__version', 'review_count', 'latest_review',
+        ).first()
+        if row is None:
+            return None
+        updated_at, stats_updated_at, stats_version, review_count, latest_review = row
+        etag = make_etag(
+            self.kwargs['pk'], updated_at, stats_version, review_count, latest_review,
+            *page_versions(['genres', 'similar_titles']), template_hash(self.template_name),
+        )
+        return etag, latest(updated_at, stats_updated_at, latest_review)
+
+    def get_queryset(self):
+        return Movie.objects.defer('search_vector').select_related('rating_stats').prefetch_related('genres')
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        movie = self.get_object()
+        movie = self.object
         
         # Get rating statistics
         try:
             rating_stats = movie.rating_stats
-            context['rating_stats'] = rating_stats
+            context['rating_stats'] = rating_stats if rating_stats.total_ratings else None
         except RatingStats.DoesNotExist:
             # Initialize with zeros if no stats exist
             context['rating_stats'] = None
@@ -92,16 +142,18 @@ class MovieDetailView(DetailView):
         if self.request.user.is_authenticated:
             context['user_rating'] = Rating.objects.filter(user=self.request.user, movie=movie).first()
             context['user_review'] = Review.objects.filter(user=self.request.user, movie=movie).first()
-            context['in_watchlist'] = Watchlist.objects.filter(user=self.request.user, movie=movie).exists()
-            context['is_favorite'] = Favorite.objects.filter(user=self.request.user, movie=movie).exists()
+            context['in_watchlist'] = movie.pk in self.request.user_context.watchlist_ids
+            context['is_favorite'] = movie.pk in self.request.user_context.favorite_ids
         
-        context['reviews'] = movie.reviews.all().order_by('-created_at')
+        context['reviews'] = movie.reviews.select_related('user').order_by('-created_at')
+        context['similar_titles'] = SimilarTitle.for_movie(movie)
         return context
 
 class RateMovieView(LoginRequiredMixin, CreateView):
     model = Rating
     form_class = RatingForm
     template_name = 'movies/rate_movie.html'
+    query_budget = 6
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
@@ -125,9 +177,7 @@ class RateMovieView(LoginRequiredMixin, CreateView):
             }
         )
         
-        # Update rating statistics
-        RatingStats.update_stats(movie)
-        
+        # Rating statistics are updated incrementally by the post_save signal
         calculated_score = rating.calculated_overall_score
         action = "updated" if not created else "rated"
         messages.success(self.request, f'You {action} "{movie.title}" with a calculated score of {calculated_score}/10!')
@@ -137,6 +187,7 @@ class ReviewMovieView(LoginRequiredMixin, CreateView):
     model = Review
     form_class = ReviewForm
     template_name = 'movies/review_movie.html'
+    query_budget = 6
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
@@ -161,36 +212,43 @@ class ReviewMovieView(LoginRequiredMixin, CreateView):
         messages.success(self.request, f'Your review for "{movie.title}" has been saved!')
         return redirect('movies:movie_detail', pk=movie.pk)
 
-class MyRatingsView(LoginRequiredMixin, ListView):
+class MyRatingsView(LoginRequiredMixin, KeysetPaginationMixin, ListView):
     model = Rating
     template_name = 'movies/my_ratings.html'
     context_object_name = 'ratings'
     paginate_by = 12
+    query_budget = 5
+    keyset_ordering = ['-updated_at', '-id']
 
     def get_queryset(self):
-        return Rating.objects.filter(user=self.request.user).select_related('movie').order_by('-updated_at')
+        return Rating.objects.filter(user=self.request.user).select_related('movie').prefetch_related('movie__genres')
 
-class WatchlistView(LoginRequiredMixin, ListView):
+class WatchlistView(LoginRequiredMixin, KeysetPaginationMixin, ListView):
     model = Watchlist
     template_name = 'movies/watchlist.html'
     context_object_name = 'watchlist_items'
     paginate_by = 12
+    query_budget = 5
+    keyset_ordering = ['-added_at', '-id']
 
     def get_queryset(self):
-        return Watchlist.objects.filter(user=self.request.user).select_related('movie').order_by('-added_at')
+        return Watchlist.objects.filter(user=self.request.user).select_related('movie__rating_stats').prefetch_related('movie__genres')
 
-class FavoritesView(LoginRequiredMixin, ListView):
+class FavoritesView(LoginRequiredMixin, KeysetPaginationMixin, ListView):
     model = Favorite
     template_name = 'movies/favorites.html'
     context_object_name = 'favorite_items'
     paginate_by = 12
+    query_budget = 5
+    keyset_ordering = ['-added_at', '-id']
 
     def get_queryset(self):
-        return Favorite.objects.filter(user=self.request.user).select_related('movie').order_by('-added_at')
+        return Favorite.objects.filter(user=self.request.user).select_related('movie__rating_stats').prefetch_related('movie__genres')
 
 class AddToWatchlistView(LoginRequiredMixin, DetailView):
     model = Movie
     pk_url_kwarg = 'movie_id'
+    query_budget = 8
 
     def get(self, request, *args, **kwargs):
         movie = self.get_object()
@@ -201,6 +259,7 @@ class AddToWatchlistView(LoginRequiredMixin, DetailView):
 class RemoveFromWatchlistView(LoginRequiredMixin, DetailView):
     model = Movie
     pk_url_kwarg = 'movie_id'
+    query_budget = 8
 
     def get(self, request, *args, **kwargs):
         movie = self.get_object()
@@ -211,6 +270,7 @@ class RemoveFromWatchlistView(LoginRequiredMixin, DetailView):
 class AddToFavoritesView(LoginRequiredMixin, DetailView):
     model = Movie
     pk_url_kwarg = 'movie_id'
+    query_budget = 8
 
     def get(self, request, *args, **kwargs):
         movie = self.get_object()
@@ -221,6 +281,7 @@ class AddToFavoritesView(LoginRequiredMixin, DetailView):
 class RemoveFromFavoritesView(LoginRequiredMixin, DetailView):
     model = Movie
     pk_url_kwarg = 'movie_id'
+    query_budget = 8
 
     def get(self, request, *args, **kwargs):
         movie = self.get_object()
@@ -233,14 +294,14 @@ class MovieCreateView(LoginRequiredMixin, CreateView):
     form_class = MovieCreateForm
     template_name = 'movies/movie_create.html'
     success_url = reverse_lazy('movies:movie_list')
+    query_budget = 6
 
     def dispatch(self, request, *args, **kwargs):
         # Check if user has permission to add movies
         if not request.user.is_authenticated:
             return redirect('accounts:login')
         
-        user_role = getattr(request.user.profile, 'role', 'user')
-        if user_role not in ['critic', 'admin']:
+        if not request.user_context.can_add_movies:
             messages.error(request, 'You do not have permission to add movies.')
             return redirect('movies:movie_list')
         
@@ -0,0 +1,24 @@
+from django.contrib import admin
+from .models import SlowQueryFingerprint
+
+@admin.register(SlowQueryFingerprint)
+class SlowQueryFingerprintAdmin(admin.ModelAdmin):
+    list_display = ['fingerprint_summary', 'count', 'total_ms', 'average_ms', 'max_ms', 'last_view', 'last_seen']
+    list_filter = ['last_seen']
+    search_fields = ['fingerprint', 'last_view']
+    ordering = ['-total_ms']
+    readonly_fields = [
+        'fingerprint', 'count', 'total_ms', 'average_ms', 'max_ms', 'first_seen', 'last_seen',
+        'last_view', 'sample_sql', 'sample_stack', 'explain',
+    ]
+    exclude = ['fingerprint_hash']
+
+    @admin.display(description='Fingerprint')
+    def fingerprint_summary(self, obj):
+        return obj.fingerprint[:120]
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
@@ -0,0 +1,287 @@
+"""
+Request benchmarks for the public views and API endpoints.
+
+Each scenario is one URL fetched through the Django test client, so the whole middleware,
+view, serializer and template stack is measured without a web server in the way. The
+objects a scenario looks at (the most rated movie, the busiest community, the most
+followed user and so on) are picked from whatever data is loaded, normally a dataset
+written by generate_dataset.
+
+Benchmarks run against a private in-process cache rather than the configured one, whose
+page versions are not specific to the benchmark database and which other processes
+share. Each scenario is measured cold, with the cache cleared before every request so
+the view itself runs, and warm, where anonymous pages come from the page cache.
+"""
+import time
+from contextlib import contextmanager
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.db.models import Count
+from django.test import Client, override_settings
+from django.urls import reverse
+from accounts.models import UserConnection, UserProfile
+from communities.models import Community, DiscussionPost
+from movies.batch import upsert_ratings
+from movies.models import Genre, Movie, Rating
+from movies.views import MovieListView
+from .budgets import QueryRecorder
+
+# generate_dataset options for each named dataset size
+DATASETS = {
+    'small': {'users': 1000, 'movies': 500, 'ratings_per_user': 20, 'follows': 10, 'posts': 500},
+    'medium': {'users': 10000, 'movies': 5000, 'ratings_per_user': 50, 'follows': 20, 'posts': 5000},
+    'large': {'users': 100000, 'movies': 50000, 'ratings_per_user': 100, 'follows': 50, 'posts': 50000},
+}
+
+PERCENTILES = (50, 90, 95, 99)
+
+CACHE_STATES = ('cold', 'warm')
+BENCHMARK_CACHES = {
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'benchmarks'},
+}
+
+# Session and user loading setups compared by compare_auth_setups
+AUTH_SETUPS = {
+    'database': {
+        'SESSION_ENGINE': 'django.contrib.sessions.backends.db',
+        'AUTHENTICATION_BACKENDS': ['django.contrib.auth.backends.ModelBackend'],
+    },
+    'cached': {
+        'SESSION_ENGINE': 'accounts.sessions',
+        'AUTHENTICATION_BACKENDS': ['accounts.backends.CachedModelBackend'],
+    },
+}
+
+
+class Scenario:
+    def __init__(self, name, url, login=False):
+        self.name = name
+        self.url = url
+        self.login = login
+
+
+def percentile(values, p):
+    """Nearest-rank percentile of an already sorted list"""
+    return values[min(len(values) - 1, int(len(values) * p / 100))]
+
+
+def summarize(values):
+    values = sorted(values)
+    summary = {'min': values[0], 'mean': sum(values) / len(values), 'max': values[-1]}
+    summary.update((f'p{p}', percentile(values, p)) for p in PERCENTILES)
+    return {key: round(value, 3) for key, value in summary.items()}
+
+
+def benchmark_user():
+    """The heaviest regular account: the one with the most ratings"""
+    row = Rating.objects.filter(rater_role='user').values('user').annotate(
+        total=Count('pk')
+    ).order_by('-total', 'user').first()
+    if row:
+        return row['user']
+    return UserProfile.objects.order_by('pk').values_list('user_id', flat=True).first()
+
+
+def build_scenarios():
+    """Every public page and API endpoint, pointed at representative objects"""
+    movie = Movie.objects.order_by('-rating_stats__total_ratings', 'pk').first()
+    genre = Genre.objects.annotate(total=Count('movies')).order_by('-total', 'pk').first()
+    community = Community.objects.annotate(total=Count('posts')).order_by('-total', 'pk').first()
+    post = DiscussionPost.objects.filter(community=community).annotate(
+        total=Count('comments')
+    ).order_by('-total', 'pk').first()
+    celebrity = UserProfile.objects.order_by('-follower_count', 'pk').values_list('user_id', flat=True).first()
+
+    movie_list = reverse('movies:movie_list')
+    scenarios = [Scenario('movie_list:newest', movie_list)]
+    scenarios += [Scenario(f'movie_list:{sort}', f'{movie_list}?sort={sort}') for sort in MovieListView.RATING_SORTS]
+    scenarios += [
+        Scenario('movie_list:my_ratings', f'{movie_list}?sort=my_ratings', login=True),
+        Scenario('community_list', reverse('communities:community_list')),
+        Scenario('api:genre-list', reverse('genre-list')),
+        Scenario('api:movie-list', reverse('movie-list')),
+        Scenario('api:review-list', reverse('review-list'), login=True),
+        Scenario('api:rating-list', reverse('rating-list'), login=True),
+        Scenario('api:movie-recommended', reverse('movie-recommended'), login=True),
+        Scenario('api:feed-list', reverse('feed-list'), login=True),
+        Scenario('my_ratings', reverse('movies:my_ratings'), login=True),
+        Scenario('watchlist', reverse('movies:watchlist'), login=True),
+        Scenario('favorites', reverse('movies:favorites'), login=True),
+        Scenario('profile', reverse('accounts:profile'), login=True),
+        Scenario('connections', reverse('accounts:connections'), login=True),
+        Scenario('recommended_for_you', reverse('recommendations:recommended_for_you'), login=True),
+        Scenario('activity_feed', reverse('activity:feed'), login=True),
+    ]
+    if movie:
+        word = max(movie.title.split(), key=len)
+        scenarios += [
+            Scenario('movie_list:search', f'{movie_list}?search={word}'),
+            Scenario('movie_detail', reverse('movies:movie_detail', args=[movie.pk])),
+            Scenario('api:movie-detail', reverse('movie-detail', args=[movie.pk])),
+            Scenario('api:movie-ratings', reverse('movie-ratings', args=[movie.pk])),
+            Scenario('api:movie-reviews', reverse('movie-reviews', args=[movie.pk])),
+            Scenario('api:movie-autocomplete', f"{reverse('movie-autocomplete')}?q={word[:3]}"),
+        ]
+    if genre:
+        scenarios.append(Scenario('movie_list:genre', f'{movie_list}?genre={genre.name}'))
+    if community:
+        scenarios.append(Scenario('community_detail', reverse('communities:community_detail', args=[community.pk])))
+    if post:
+        scenarios.append(Scenario('post_detail', reverse('communities:post_detail', args=[post.pk])))
+    if celebrity:
+        scenarios.append(Scenario('user_profile', reverse('accounts:user_profile', args=[celebrity])))
+    return scenarios
+
+
+@contextmanager
+def isolated_cache():
+    """Point every cache alias at an empty private cache, and let the test client in"""
+    with override_settings(CACHES=BENCHMARK_CACHES, PAGE_CACHE_ALIAS='default', FRAGMENT_CACHE_ALIAS='default',
+                           ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver']):
+        cache.clear()
+        yield
+
+
+def run_scenario(client, scenario, iterations, warmup=1, state='warm'):
+    """
+    Fetch a scenario's URL repeatedly, recording wall time, query count and SQL time.
+    ``state`` 'cold' clears the cache before every request; 'warm' only before the first.
+    """
+    wall_ms, queries, sql_ms = [], [], []
+    status = None
+    cache.clear()
+    for iteration in range(warmup + iterations):
+        if state == 'cold':
+            cache.clear()
+        recorder = QueryRecorder()
+        with connection.execute_wrapper(recorder):
+            started = time.perf_counter()
+            response = client.get(scenario.url)
+            if response.streaming:
+                b''.join(response.streaming_content)
+            elapsed = (time.perf_counter() - started) * 1000
+        status = response.status_code
+        if iteration < warmup:
+            continue
+        wall_ms.append(elapsed)
+        queries.append(recorder.count)
+        sql_ms.append(recorder.seconds * 1000)
+    return {
+        'scenario': scenario.name,
+        'url': scenario.url,
+        'login': scenario.login,
+        'cache': state,
+        'status': status,
+        'iterations': iterations,
+        'wall_ms': summarize(wall_ms),
+        'queries': summarize(queries),
+        'sql_ms': summarize(sql_ms),
+    }
+
+
+def run_benchmarks(iterations=20, warmup=1, only=None, progress=None, states=CACHE_STATES):
+    """
+    Run every scenario, or those whose name contains ``only``, against the current
+    database, once per cache state in ``states``
+    """
+    scenarios = [scenario for scenario in build_scenarios() if not only or only in scenario.name]
+    user_id = benchmark_user()
+
+    results = []
+    with isolated_cache():
+        # Server errors are recorded as the scenario's status rather than aborting the run
+        anonymous, member = Client(raise_request_exception=False), Client(raise_request_exception=False)
+        if user_id:
+            member.force_login(UserProfile.objects.get(user_id=user_id).user)
+        for scenario in scenarios:
+            if scenario.login and not user_id:
+                continue
+            for state in states:
+                result = run_scenario(member if scenario.login else anonymous, scenario, iterations, warmup, state)
+                results.append(result)
+                if progress:
+                    progress(result)
+    return results
+
+
+def compare_auth_setups(iterations=20, warmup=1, only=None):
+    """
+    Queries per request of every logged-in scenario under each of AUTH_SETUPS.
+
+    Returns one row per scenario with the median query count of each setup and how many
+    the cached setup saves.
+    """
+    user_id = benchmark_user()
+    if not user_id:
+        return []
+    user = UserProfile.objects.get(user_id=user_id).user
+    scenarios = [
+        scenario for scenario in build_scenarios()
+        if scenario.login and (not only or only in scenario.name)
+    ]
+    queries = {}
+    for setup, overrides in AUTH_SETUPS.items():
+        with isolated_cache(), override_settings(**overrides):
+            client = Client(raise_request_exception=False)
+            client.force_login(user)
+            for scenario in scenarios:
+                result = run_scenario(client, scenario, iterations, warmup)
+                queries.setdefault(scenario.name, {})[setup] = result['queries']['p50']
+    return [
+        {'scenario': name, **counts, 'saved': counts['database'] - counts['cached']}
+        for name, counts in queries.items()
+    ]
+
+
+def compare_rating_writes(count=200):
+    """
+    Save ``count`` ratings for the benchmark user one at a time, the way the rating form
+    does, and as one upsert_ratings batch; each is timed creating the ratings and then
+    updating them, and rolled back afterwards. Returns one row per path and pass.
+    """
+    user_id = benchmark_user()
+    if not user_id:
+        return []
+    user = UserProfile.objects.get(user_id=user_id).user
+    movie_ids = list(Movie.objects.exclude(ratings__user=user).order_by('pk').values_list('pk', flat=True)[:count])
+
+    def one_at_a_time(score):
+        for movie_id in movie_ids:
+            rating = Rating.objects.filter(user=user, movie_id=movie_id).first() or Rating(user=user, movie_id=movie_id)
+            rating.story_score = rating.acting_score = rating.cinematography_score = score
+            rating.save()
+
+    def batch(score):
+        upsert_ratings(user, [
+            {'movie': movie_id, 'story_score': score, 'acting_score': score, 'cinematography_score': score}
+            for movie_id in movie_ids
+        ])
+
+    rows = []
+    for path, write in (('one_at_a_time', one_at_a_time), ('batch', batch)):
+        # The page version bumps the writes make stay out of the shared cache
+        with isolated_cache(), transaction.atomic():
+            for stage, score in (('create', 6), ('update', 8)):
+                recorder = QueryRecorder()
+                with connection.execute_wrapper(recorder):
+                    started = time.perf_counter()
+                    write(score)
+                    elapsed = time.perf_counter() - started
+                rows.append({
+                    'path': path, 'stage': stage, 'ratings': len(movie_ids),
+                    'wall_ms': round(elapsed * 1000, 1), 'queries': recorder.count,
+                    'ratings_per_second': round(len(movie_ids) / elapsed, 1) if elapsed else None,
+                })
+            transaction.set_rollback(True)
+    return rows
+
+
+def dataset_counts():
+    return {
+        'movies': Movie.objects.count(),
+        'users': UserProfile.objects.count(),
+        'ratings': Rating.objects.count(),
+        'follows': UserConnection.objects.count(),
+        'posts': DiscussionPost.objects.count(),
+    }
@@ -0,0 +1,103 @@
+"""
+Query budgets.
+
+Views declare ``query_budget``, the most database queries one request may issue, which
+must not grow with the number of rows on the page. Class-based views and DRF viewsets
+set it as a class attribute; an extra viewset action can override it with
+``@action(..., query_budget=n)`` and function views use the ``query_budget`` decorator.
+Serializers declare the queries serializing a page takes, fetch and prefetches included,
+for a queryset prepared the way their views prepare it.
+
+QueryBudgetMiddleware checks each request against its view's budget; the
+QueryBudgetTestCase in perf.testing asserts budgets against a generated dataset.
+QueryRecorder is the lighter wrapper the metrics, profiling and benchmarks use to count
+and time a request's queries.
+"""
+import re
+import time
+from collections import Counter
+from contextlib import ExitStack, contextmanager
+from django.db import connections
+
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r'\b\d+(?:\.\d+)?\b')
+_IN_LIST = re.compile(r'\bIN \(\?(?:, *\?)*\)', re.IGNORECASE)
+_SPACE = re.compile(r'\s+')
+
+
+class QueryBudgetExceeded(Exception):
+    pass
+
+
+def query_budget(budget):
+    """Declare the query budget of a function view"""
+    def decorator(view_func):
+        view_func.query_budget = budget
+        return view_func
+    return decorator
+
+
+def fingerprint(sql):
+    """SQL with its literals, parameters and IN lists collapsed, so repeats compare equal"""
+    sql = _STRING.sub('?', sql.replace('%s', '?'))
+    sql = _NUMBER.sub('?', sql)
+    sql = _IN_LIST.sub('IN (...)', sql)
+    return _SPACE.sub(' ', sql).strip()
+
+
+def view_budget(view_func):
+    """Declared budget of a resolved view function, or None if it has none"""
+    # Keyword arguments given to as_view(), which is where @action(query_budget=...) ends up
+    for initkwargs in (getattr(view_func, 'initkwargs', None), getattr(view_func, 'view_initkwargs', None)):
+        if initkwargs and initkwargs.get('query_budget') is not None:
+            return initkwargs['query_budget']
+    for owner in (getattr(view_func, 'cls', None), getattr(view_func, 'view_class', None), view_func):
+        budget = getattr(owner, 'query_budget', None)
+        if budget is not None:
+            return budget
+    return None
+
+
+class QueryLog:
+    """Database execute wrapper counting queries by fingerprint"""
+
+    def __init__(self):
+        self.count = 0
+        self.fingerprints = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        self.fingerprints[fingerprint(sql)] += 1
+        return execute(sql, params, many, context)
+
+    @contextmanager
+    def capture(self):
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(self))
+            yield self
+
+    def repeated(self):
+        """``(fingerprint, count)`` of the queries run more than once, most frequent first"""
+        return [(sql, count) for sql, count in self.fingerprints.most_common() if count > 1]
+
+    def report(self, budget, limit=5):
+        lines = [f'{self.count} queries, budget {budget}']
+        lines += [f'  {count}x {sql}' for sql, count in self.repeated()[:limit]]
+        return '\n'.join(lines)
+
+
+class QueryRecorder:
+    """Database execute wrapper counting queries and the time spent in them"""
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.count += 1
+            self.seconds += time.perf_counter() - started
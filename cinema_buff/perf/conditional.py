@@ -0,0 +1,44 @@
+"""
+Conditional GET.
+
+Views compute an ETag and Last-Modified from a cheap query over the timestamps and
+versions of what they would show, without rendering anything, and answer with 304 Not
+Modified when the client's If-None-Match or If-Modified-Since still holds. Clients and
+the CDN can then revalidate instead of fetching the page again.
+"""
+import hashlib
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+
+
+def make_etag(*parts):
+    return hashlib.md5('|'.join(str(part) for part in parts).encode()).hexdigest()
+
+
+def conditional_get(request, validators, respond):
+    """
+    ``respond()``, or 304 Not Modified if ``validators`` still match the request.
+
+    ``validators`` is ``(etag, last_modified datetime)``, either of which may be None,
+    or None when the response cannot be validated, in which case it is always built.
+    """
+    if validators is None or request.method not in ('GET', 'HEAD'):
+        return respond()
+    etag, last_modified = validators
+    etag = quote_etag(etag) if etag else None
+    last_modified = int(last_modified.timestamp()) if last_modified else None
+
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is None:
+        response = respond()
+    if response.status_code in (200, 304):
+        if etag and not response.has_header('ETag'):
+            response.headers['ETag'] = etag
+        if last_modified and not response.has_header('Last-Modified'):
+            response.headers['Last-Modified'] = http_date(last_modified)
+    return response
+
+
+def latest(*timestamps):
+    timestamps = [timestamp for timestamp in timestamps if timestamp is not None]
+    return max(timestamps) if timestamps else None
@@ -0,0 +1,55 @@
+"""
+Cached template fragments.
+
+render_fragments renders one template per object, such as a movie card, and keeps the
+HTML in the cache under a key built from the object's version (whatever key function
+the caller passes, e.g. updated_at plus a stats counter) and a hash of the template
+source, so a deploy that changes the template does not serve old markup. All the
+fragments of a page are fetched with one get_many and only the misses are rendered,
+then stored with one set_many.
+
+Fragments must not depend on who is looking; per-user parts are rendered around them.
+"""
+import hashlib
+from django.conf import settings
+from django.core.cache import caches
+from django.template.loader import get_template, render_to_string
+from .metrics import count_cache_lookup
+
+_template_hashes = {}
+
+
+def fragment_cache():
+    return caches[getattr(settings, 'FRAGMENT_CACHE_ALIAS', 'default')]
+
+
+def template_hash(template_name):
+    if template_name not in _template_hashes:
+        source = get_template(template_name).template.source
+        _template_hashes[template_name] = hashlib.md5(source.encode()).hexdigest()[:12]
+    return _template_hashes[template_name]
+
+
+def render_fragments(template_name, objects, version, context_name='object'):
+    """
+    HTML of ``template_name`` rendered for each of ``objects``, in order.
+
+    ``version(obj)`` returns the parts that identify the object's current state;
+    the object is passed to the template as ``context_name``.
+    """
+    objects = list(objects)
+    if not objects:
+        return []
+    prefix = f'fragment:{template_name}:{template_hash(template_name)}:'
+    keys = [prefix + ':'.join(str(part) for part in version(obj)) for obj in objects]
+    cache = fragment_cache()
+    found = cache.get_many(keys)
+
+    rendered = {}
+    for key, obj in zip(keys, objects):
+        if key not in found and key not in rendered:
+            rendered[key] = render_to_string(template_name, {context_name: obj})
+    if rendered:
+        cache.set_many(rendered, timeout=getattr(settings, 'FRAGMENT_CACHE_TIMEOUT', 24 * 60 * 60))
+    count_cache_lookup('fragments', hits=len(objects) - len(rendered), misses=len(rendered))
+    return [found.get(key) or rendered[key] for key in keys]
@@ -0,0 +1,109 @@
+import json
+import os
+import subprocess
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.utils import timezone
+from accounts.models import UserProfile
+from perf.benchmarks import CACHE_STATES, DATASETS, dataset_counts, run_benchmarks
+
+class Command(BaseCommand):
+    help = 'Benchmark every public view and API endpoint and store the results as JSON'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dataset', action='append', dest='datasets',
+                            choices=[*DATASETS, 'current'],
+                            help='Generated dataset size to benchmark (may be repeated), or "current" '
+                                 'for the configured database as it is (default: small)')
+        parser.add_argument('--iterations', type=int, default=20,
+                            help='Timed requests per scenario (default: 20)')
+        parser.add_argument('--warmup', type=int, default=2,
+                            help='Untimed requests per scenario first (default: 2)')
+        parser.add_argument('--only', help='Only run scenarios whose name contains this text')
+        parser.add_argument('--cache', choices=[*CACHE_STATES, 'both'], default='both',
+                            help='Measure with the cache cleared before every request (cold), filled by the '
+                                 'warmup requests (warm) or both (default: both)')
+        parser.add_argument('--seed', type=int, default=42, help='Seed for generated datasets (default: 42)')
+        parser.add_argument('--keepdb', action='store_true',
+                            help='Keep generated dataset databases and reuse them on the next run')
+        parser.add_argument('--output', help='Results file (default: benchmark-<timestamp>.json)')
+
+    def handle(self, *args, **options):
+        if options['iterations'] < 1:
+            raise CommandError('--iterations must be at least 1')
+        started_at = timezone.now()
+        report = {
+            'created_at': started_at.isoformat(),
+            'revision': self.revision(),
+            'database': connection.vendor,
+            'iterations': options['iterations'],
+            'warmup': options['warmup'],
+            'cache': options['cache'],
+            'datasets': {},
+            'results': [],
+        }
+
+        for dataset in options['datasets'] or ['small']:
+            if dataset == 'current':
+                self.run_dataset(dataset, report, options)
+                continue
+            old_name = self.create_database(dataset, options)
+            try:
+                self.run_dataset(dataset, report, options)
+            finally:
+                connection.creation.destroy_test_db(old_name, verbosity=0, keepdb=options['keepdb'])
+
+        output = options['output'] or f'benchmark-{started_at:%Y%m%d-%H%M%S}.json'
+        with open(output, 'w') as f:
+            json.dump(report, f, indent=2)
+        self.stdout.write(self.style.SUCCESS(f'Wrote {len(report["results"])} results to {output}'))
+
+    def run_dataset(self, dataset, report, options):
+        report['datasets'][dataset] = counts = dataset_counts()
+        self.stdout.write(f'Dataset {dataset}: ' + ', '.join(f'{count} {name}' for name, count in counts.items()))
+
+        def progress(result):
+            result['dataset'] = dataset
+            self.stdout.write(
+                f"  {result['scenario']:<36} {result['cache']:<4}  p50 {result['wall_ms']['p50']:8.1f}ms  "
+                f"p95 {result['wall_ms']['p95']:8.1f}ms  {result['queries']['max']:4.0f} queries  "
+                f"sql {result['sql_ms']['p50']:7.1f}ms  [{result['status']}]"
+            )
+
+        states = CACHE_STATES if options['cache'] == 'both' else [options['cache']]
+        report['results'] += run_benchmarks(options['iterations'], options['warmup'], options['only'], progress, states)
+
+    def create_database(self, dataset, options):
+        """Switch to a separate database holding the generated dataset; returns the old name"""
+        name = connection.settings_dict['NAME']
+        if connection.vendor == 'sqlite':
+            root, extension = os.path.splitext(str(name))
+            test_name = f'{root}_bench_{dataset}{extension or ".sqlite3"}'
+        else:
+            test_name = f'{name}_bench_{dataset}'
+        connection.settings_dict['TEST']['NAME'] = test_name
+
+        self.stdout.write(f'Preparing {dataset} dataset in {test_name}')
+        connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False,
+                                           keepdb=options['keepdb'])
+        if UserProfile.objects.filter(user__username__startswith='bench_').exists():
+            self.stdout.write('Reusing the kept dataset')
+            return name
+
+        call_command('generate_dataset', prefix='bench', seed=options['seed'], stdout=self.stdout,
+                     **DATASETS[dataset])
+        try:
+            call_command('compute_recommendations', '--full', stdout=self.stdout)
+        except CommandError as exc:
+            self.stdout.write(self.style.WARNING(f'Skipping recommendations: {exc}'))
+        call_command('refresh_similar_titles', '--all', stdout=self.stdout)
+        return name
+
+    def revision(self):
+        try:
+            return subprocess.run(
+                ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True
+            ).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            return None
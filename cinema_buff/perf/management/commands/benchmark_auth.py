@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand, CommandError
+from perf.benchmarks import compare_auth_setups
+
+class Command(BaseCommand):
+    help = ('Compare queries per logged-in request with database sessions and user loading '
+            'against cached sessions and CachedModelBackend, on the current database')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=5,
+                            help='Timed requests per scenario and setup (default: 5)')
+        parser.add_argument('--warmup', type=int, default=2,
+                            help='Untimed requests per scenario and setup first (default: 2)')
+        parser.add_argument('--only', help='Only run scenarios whose name contains this text')
+
+    def handle(self, *args, **options):
+        if options['iterations'] < 1:
+            raise CommandError('--iterations must be at least 1')
+        rows = compare_auth_setups(options['iterations'], options['warmup'], options['only'])
+        if not rows:
+            raise CommandError('No user to log in as; load some data first')
+
+        self.stdout.write(f"{'scenario':<28} {'database':>8} {'cached':>8} {'saved':>6}")
+        for row in rows:
+            self.stdout.write(
+                f"{row['scenario']:<28} {row['database']:8.0f} {row['cached']:8.0f} {row['saved']:6.0f}"
+            )
+        total = sum(row['saved'] for row in rows)
+        self.stdout.write(self.style.SUCCESS(
+            f'Cached sessions and users save {total / len(rows):.1f} queries per logged-in request on average'
+        ))
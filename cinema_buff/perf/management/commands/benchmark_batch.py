@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand, CommandError
+from perf.benchmarks import compare_rating_writes
+
+class Command(BaseCommand):
+    help = ('Compare saving ratings one at a time with the batch upsert, on the current database; '
+            'every write is rolled back')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--count', type=int, default=200, help='Ratings per run (default: 200)')
+
+    def handle(self, *args, **options):
+        if options['count'] < 1:
+            raise CommandError('--count must be at least 1')
+        rows = compare_rating_writes(options['count'])
+        if not rows or not rows[0]['ratings']:
+            raise CommandError('No user with movies left to rate; load some data first')
+
+        self.stdout.write(f"{'path':<14} {'stage':<7} {'ratings':>7} {'wall ms':>9} {'queries':>8} {'ratings/s':>10}")
+        for row in rows:
+            self.stdout.write(
+                f"{row['path']:<14} {row['stage']:<7} {row['ratings']:7d} {row['wall_ms']:9.1f} "
+                f"{row['queries']:8d} {row['ratings_per_second']:10.1f}"
+            )
+        single = {row['stage']: row for row in rows if row['path'] == 'one_at_a_time'}
+        for row in rows:
+            if row['path'] == 'batch':
+                self.stdout.write(self.style.SUCCESS(
+                    f"{row['stage']}: batch is {single[row['stage']]['wall_ms'] / row['wall_ms']:.1f}x faster "
+                    f"with {single[row['stage']]['queries'] - row['queries']} fewer queries"
+                ))
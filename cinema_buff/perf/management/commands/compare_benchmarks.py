@@ -0,0 +1,62 @@
+import json
+from django.core.management.base import BaseCommand, CommandError
+
+class Command(BaseCommand):
+    help = 'Compare two benchmark result files and flag regressions'
+
+    def add_arguments(self, parser):
+        parser.add_argument('baseline', help='Results of the reference run')
+        parser.add_argument('candidate', help='Results of the run to check')
+        parser.add_argument('--percentile', default='p50', choices=['p50', 'p90', 'p95', 'p99', 'mean'],
+                            help='Timing statistic to compare (default: p50)')
+        parser.add_argument('--threshold', type=float, default=0.2,
+                            help='Relative slowdown counted as a regression (default: 0.2, i.e. 20%%)')
+        parser.add_argument('--min-ms', type=float, default=2.0,
+                            help='Ignore slowdowns smaller than this many milliseconds (default: 2)')
+
+    def handle(self, *args, **options):
+        baseline = self.load(options['baseline'])
+        candidate = self.load(options['candidate'])
+        stat = options['percentile']
+
+        regressions = []
+        for key in sorted(baseline.keys() & candidate.keys()):
+            before, after = baseline[key], candidate[key]
+            problems = []
+            for metric in ('wall_ms', 'sql_ms'):
+                old, new = before[metric][stat], after[metric][stat]
+                if new - old > options['min_ms'] and new > old * (1 + options['threshold']):
+                    problems.append(f'{metric} {stat} {old:.1f} -> {new:.1f} (+{(new / old - 1) * 100 if old else 100:.0f}%)')
+            # Query counts are deterministic, so any increase is a regression
+            if after['queries']['max'] > before['queries']['max']:
+                problems.append(f"queries {before['queries']['max']:.0f} -> {after['queries']['max']:.0f}")
+            if after['status'] != before['status']:
+                problems.append(f"status {before['status']} -> {after['status']}")
+
+            label = '/'.join(key)
+            if problems:
+                regressions.append(label)
+                self.stdout.write(self.style.ERROR(f'REGRESSION {label}: ' + '; '.join(problems)))
+            else:
+                self.stdout.write(
+                    f"ok         {label}: {before['wall_ms'][stat]:.1f} -> {after['wall_ms'][stat]:.1f}ms, "
+                    f"{after['queries']['max']:.0f} queries"
+                )
+
+        for key in sorted(baseline.keys() - candidate.keys()):
+            self.stdout.write(self.style.WARNING(f'missing    {"/".join(key)}: not in the candidate run'))
+        for key in sorted(candidate.keys() - baseline.keys()):
+            self.stdout.write(f'new        {"/".join(key)}')
+
+        if regressions:
+            raise CommandError(f'{len(regressions)} regressions')
+        self.stdout.write(self.style.SUCCESS('No regressions'))
+
+    def load(self, path):
+        """Results of a run keyed by (dataset, scenario)"""
+        try:
+            with open(path) as f:
+                report = json.load(f)
+        except (OSError, ValueError) as exc:
+            raise CommandError(f'Cannot read {path}: {exc}')
+        return {(result['dataset'], result['scenario']): result for result in report['results']}
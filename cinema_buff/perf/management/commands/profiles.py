@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand, CommandError
+from perf.profiling import ProfileStore
+
+class Command(BaseCommand):
+    help = 'List stored request profiles, or export one as collapsed stacks for a flame graph'
+
+    def add_arguments(self, parser):
+        parser.add_argument('report_id', nargs='?', help='Report to show; lists the stored reports if omitted')
+        parser.add_argument('--output', help='Write the collapsed stacks of the report to this file')
+
+    def handle(self, *args, **options):
+        store = ProfileStore()
+        if not options['report_id']:
+            for report_id in reversed(store.ids()):
+                report = store.load(report_id)
+                self.stdout.write(
+                    f"{report_id}  {report['wall_ms']:9.1f}ms  {report['queries']:4d} queries  "
+                    f"{report['method']} {report['path']} [{report['status']}]"
+                )
+            return
+
+        try:
+            report = store.load(options['report_id'])
+        except (OSError, ValueError) as exc:
+            raise CommandError(f"Cannot read profile {options['report_id']}: {exc}")
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                f.write(report['collapsed'] + '\n')
+            self.stdout.write(self.style.SUCCESS(f"Wrote collapsed stacks to {options['output']}"))
+            return
+
+        self.stdout.write(f"{report['method']} {report['path']} ({report['view']}) by {report['user']} "
+                          f"at {report['started_at']} [{report['status']}]")
+        self.stdout.write(f"  total     {report['wall_ms']:9.1f}ms  {report['samples']} samples "
+                          f"every {report['interval_ms']:g}ms")
+        for part in ('sql', 'template', 'python'):
+            self.stdout.write(f"  {part:<9} {report[f'{part}_ms']:9.1f}ms")
+        self.stdout.write(f"  queries   {report['queries']:9d}")
@@ -0,0 +1,72 @@
+"""
+Prometheus metrics.
+
+Every request is counted and timed per URL name by MetricsMiddleware, along with the
+queries it ran and the time spent rendering its template. Caches report lookups through
+count_cache_lookup, so the hit ratio of each one is
+
+    rate(cinema_buff_cache_lookups_total{result="hit"}[5m])
+      / rate(cinema_buff_cache_lookups_total[5m])
+
+Under gunicorn each worker is a separate process with its own counters. When the
+PROMETHEUS_MULTIPROC_DIR environment variable is set (gunicorn.conf.py does this)
+prometheus_client keeps the values in memory-mapped files in that directory and the
+/metrics view adds up the files of all workers, so any worker can answer a scrape.
+"""
+import os
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Histogram, generate_latest
+from prometheus_client import multiprocess
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.075, 0.1, 0.25, 0.5, 0.75, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 89, 144)
+
+REQUESTS = Counter(
+    'cinema_buff_requests_total', 'Requests by URL name, method and status code',
+    ['view', 'method', 'status'],
+)
+REQUEST_LATENCY = Histogram(
+    'cinema_buff_request_duration_seconds', 'Time to produce a response, by URL name',
+    ['view', 'method'], buckets=LATENCY_BUCKETS,
+)
+DB_QUERIES = Histogram(
+    'cinema_buff_db_queries_per_request', 'Database queries per request, by URL name',
+    ['view'], buckets=QUERY_BUCKETS,
+)
+DB_TIME = Histogram(
+    'cinema_buff_db_duration_seconds', 'Time per request spent in database queries, by URL name',
+    ['view'], buckets=LATENCY_BUCKETS,
+)
+TEMPLATE_TIME = Histogram(
+    'cinema_buff_template_render_seconds', 'Time per request spent rendering the template, by URL name',
+    ['view'], buckets=LATENCY_BUCKETS,
+)
+CACHE_LOOKUPS = Counter(
+    'cinema_buff_cache_lookups_total', 'Cache lookups by cache and result (hit or miss)',
+    ['cache', 'result'],
+)
+
+
+def count_cache_lookup(cache, hits=0, misses=0):
+    """Record ``hits`` and ``misses`` for the cache named ``cache``"""
+    if hits:
+        CACHE_LOOKUPS.labels(cache, 'hit').inc(hits)
+    if misses:
+        CACHE_LOOKUPS.labels(cache, 'miss').inc(misses)
+
+
+def view_label(request):
+    """URL name of the resolved view, so label values stay bounded whatever the path"""
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return '<unresolved>'
+    return match.view_name or match._func_path
+
+
+def exposition():
+    """Metrics in the Prometheus text format, as (body, content type)"""
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry), CONTENT_TYPE_LATEST
@@ -0,0 +1,140 @@
+import logging
+import time
+from contextlib import ExitStack
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.http import HttpResponse
+from .budgets import QueryBudgetExceeded, QueryLog, QueryRecorder, view_budget
+from .metrics import DB_QUERIES, DB_TIME, REQUEST_LATENCY, REQUESTS, TEMPLATE_TIME, view_label
+from .profiling import ProfileStore, profile_mode, profile_request
+from .slowlog import capture_slow_queries, threshold_ms
+
+logger = logging.getLogger('perf.budgets')
+
+class QueryBudgetMiddleware:
+    """
+    Report requests that run more queries than their view's ``query_budget``.
+
+    QUERY_BUDGET_MODE is 'log' (warn with the repeated query fingerprints), 'raise'
+    (turn the response into an error, for development) or 'off', in which case the
+    middleware removes itself at startup. It defaults to 'log' with DEBUG on and 'off'
+    otherwise. Views without a budget fall back to QUERY_BUDGET_DEFAULT, if set.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.mode = getattr(settings, 'QUERY_BUDGET_MODE', 'log' if settings.DEBUG else 'off')
+        if self.mode == 'off':
+            raise MiddlewareNotUsed
+        self.default = getattr(settings, 'QUERY_BUDGET_DEFAULT', None)
+
+    def __call__(self, request):
+        log = QueryLog()
+        with log.capture():
+            response = self.get_response(request)
+
+        match = request.resolver_match
+        budget = view_budget(match.func) if match else None
+        if budget is None:
+            budget = self.default
+        if budget is not None and log.count > budget:
+            message = f'{request.method} {request.path} ({match.view_name}) is over its query budget: {log.report(budget)}'
+            if self.mode == 'raise':
+                raise QueryBudgetExceeded(message)
+            logger.warning(message)
+        return response
+
+
+class ProfileMiddleware:
+    """
+    Profile a request when a staff user asks for it with ``?_profile=`` or X-Profile.
+
+    Off unless PROFILING_ENABLED is set, in which case the middleware removes itself at
+    startup; when on, requests that do not ask for a profile only pay for the parameter
+    check. Must come after AuthenticationMiddleware.
+    """
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'PROFILING_ENABLED', False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.store = ProfileStore()
+
+    def __call__(self, request):
+        mode = profile_mode(request)
+        if mode is None or not request.user.is_staff:
+            return self.get_response(request)
+
+        response, report = profile_request(request, self.get_response)
+        self.store.save(report)
+        if mode == 'flame':
+            response = HttpResponse(report['collapsed'], content_type='text/plain; charset=utf-8')
+        response['X-Profile-Id'] = report['id']
+        response['Server-Timing'] = ', '.join(
+            f'{part};dur={report[f"{part}_ms"]}' for part in ('sql', 'template', 'python')
+        )
+        return response
+
+
+class MetricsMiddleware:
+    """
+    Record request count, latency, queries and template render time for /metrics.
+
+    Goes first in MIDDLEWARE so the latency covers the other middleware, and so its
+    process_template_response runs after theirs; it renders the response itself to time
+    the template. Set METRICS_ENABLED = False to remove it.
+    """
+    METHODS = {'GET', 'HEAD', 'POST', 'PUT', 'PATCH', 'DELETE', 'OPTIONS'}
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'METRICS_ENABLED', True):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        recorder = QueryRecorder()
+        started = time.perf_counter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(recorder))
+            response = self.get_response(request)
+        elapsed = time.perf_counter() - started
+
+        view = view_label(request)
+        # Arbitrary method names would each become a new time series
+        method = request.method if request.method in self.METHODS else 'other'
+        REQUESTS.labels(view, method, str(response.status_code)).inc()
+        REQUEST_LATENCY.labels(view, method).observe(elapsed)
+        DB_QUERIES.labels(view).observe(recorder.count)
+        DB_TIME.labels(view).observe(recorder.seconds)
+        if hasattr(request, 'template_render_seconds'):
+            TEMPLATE_TIME.labels(view).observe(request.template_render_seconds)
+        return response
+
+    def process_template_response(self, request, response):
+        started = time.perf_counter()
+        response.render()
+        request.template_render_seconds = time.perf_counter() - started
+        return response
+
+
+class SlowQueryMiddleware:
+    """
+    Capture queries slower than SLOW_QUERY_THRESHOLD_MS, with their EXPLAIN plans.
+
+    They are saved after the response is ready, outside the view's transaction. Comes
+    before QueryBudgetMiddleware so that saving them does not count against the view's
+    budget. Set SLOW_QUERY_THRESHOLD_MS = None to remove it.
+    """
+
+    def __init__(self, get_response):
+        if threshold_ms() is None:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with capture_slow_queries() as recorder:
+            response = self.get_response(request)
+            recorder.view = view_label(request)
+        return response
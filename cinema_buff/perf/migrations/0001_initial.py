@@ -0,0 +1,35 @@
+# Generated by Django 5.2.6 on 2026-10-18 09:03
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SlowQueryFingerprint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fingerprint_hash', models.CharField(max_length=40, unique=True)),
+                ('fingerprint', models.TextField()),
+                ('count', models.IntegerField(default=0)),
+                ('total_ms', models.FloatField(default=0)),
+                ('max_ms', models.FloatField(default=0)),
+                ('first_seen', models.DateTimeField(default=django.utils.timezone.now)),
+                ('last_seen', models.DateTimeField(default=django.utils.timezone.now)),
+                ('last_view', models.CharField(blank=True, max_length=200)),
+                ('sample_sql', models.TextField(blank=True)),
+                ('sample_stack', models.TextField(blank=True)),
+                ('explain', models.TextField(blank=True, help_text='Plan of the latest sample')),
+            ],
+            options={
+                'ordering': ['-total_ms'],
+            },
+        ),
+    ]
@@ -0,0 +1,58 @@
+import hashlib
+from django.db import IntegrityError, models, transaction
+from django.db.models import F
+from django.db.models.functions import Greatest
+from django.utils import timezone
+
+class SlowQueryFingerprint(models.Model):
+    """Slow statements that share a fingerprint, with running totals and the latest sample"""
+    fingerprint_hash = models.CharField(max_length=40, unique=True)
+    fingerprint = models.TextField()
+    count = models.IntegerField(default=0)
+    total_ms = models.FloatField(default=0)
+    max_ms = models.FloatField(default=0)
+    first_seen = models.DateTimeField(default=timezone.now)
+    last_seen = models.DateTimeField(default=timezone.now)
+    last_view = models.CharField(max_length=200, blank=True)
+    sample_sql = models.TextField(blank=True)
+    sample_stack = models.TextField(blank=True)
+    explain = models.TextField(blank=True, help_text="Plan of the latest sample")
+
+    class Meta:
+        ordering = ['-total_ms']
+
+    def __str__(self):
+        return self.fingerprint[:80]
+
+    @property
+    def average_ms(self):
+        return self.total_ms / self.count if self.count else 0
+
+    @classmethod
+    def record(cls, entry):
+        """Add one slow query (a perf.slowlog entry) to its fingerprint's totals"""
+        fingerprint_hash = hashlib.sha1(entry['fingerprint'].encode()).hexdigest()
+        latest = {
+            'last_seen': timezone.now(),
+            'last_view': entry['view'] or '',
+            'sample_sql': entry['sql'],
+            'sample_stack': '\n'.join(entry['stack']),
+            'explain': entry['explain'] or '',
+        }
+        updated = cls.objects.filter(fingerprint_hash=fingerprint_hash).update(
+            count=F('count') + 1,
+            total_ms=F('total_ms') + entry['duration_ms'],
+            max_ms=Greatest('max_ms', entry['duration_ms']),
+            **latest,
+        )
+        if updated:
+            return
+        try:
+            with transaction.atomic():
+                cls.objects.create(
+                    fingerprint_hash=fingerprint_hash, fingerprint=entry['fingerprint'], count=1,
+                    total_ms=entry['duration_ms'], max_ms=entry['duration_ms'], **latest,
+                )
+        except IntegrityError:
+            # Another process created it first
+            cls.record(entry)
@@ -0,0 +1,111 @@
+"""
+Versioned full-page cache for anonymous visitors.
+
+Anonymous visitors all see the same page for a URL, so views using
+AnonymousPageCacheMixin keep the rendered HTML in the PAGE_CACHE_ALIAS cache (the
+default cache unless set). The key includes the path, the query parameters the view
+declares in ``page_cache_params`` and the current value of each version key the page
+depends on. Signal handlers bump those versions when the underlying rows change, which
+makes every page built from the old data unreachable at once; PAGE_CACHE_TIMEOUT is
+only a backstop for what no signal covers.
+
+Version values start from the clock rather than from 1, so a version evicted from the
+cache never comes back with a value that old pages were stored under.
+"""
+import hashlib
+import time
+from urllib.parse import urlencode
+from django.conf import settings
+from django.core.cache import caches
+from django.http import HttpResponse
+from .metrics import count_cache_lookup
+
+VERSION_PREFIX = 'page-version:'
+
+
+def page_cache():
+    return caches[getattr(settings, 'PAGE_CACHE_ALIAS', 'default')]
+
+
+def page_versions(names):
+    """Current value of each version in ``names``, creating the missing ones"""
+    cache = page_cache()
+    keys = [VERSION_PREFIX + name for name in names]
+    values = cache.get_many(keys)
+    for key in keys:
+        if key not in values:
+            cache.add(key, time.time_ns(), timeout=None)
+            values[key] = cache.get(key)
+    return [values[key] for key in keys]
+
+
+def bump_page_versions(*names):
+    """Expire every cached page that depends on any of ``names``"""
+    cache = page_cache()
+    for name in names:
+        key = VERSION_PREFIX + name
+        try:
+            cache.incr(key)
+        except ValueError:
+            # Not set yet, so no page was cached against it
+            cache.add(key, time.time_ns(), timeout=None)
+
+
+class AnonymousPageCacheMixin:
+    """
+    Serve GET requests from anonymous visitors from the page cache.
+
+    ``page_cache_params`` lists the query parameters that select what the page shows;
+    a request with any other parameter is not cached. ``page_cache_versions`` (or
+    get_page_cache_versions, for names that depend on the URL) lists the version keys
+    whose bumps expire the page.
+    """
+    page_cache_params = ()
+    page_cache_versions = ()
+
+    def get_page_cache_versions(self):
+        return list(self.page_cache_versions)
+
+    def page_cache_key(self):
+        params = sorted((name, self.request.GET[name]) for name in self.page_cache_params if name in self.request.GET)
+        versions = page_versions(self.get_page_cache_versions())
+        raw = f'{self.request.path}?{urlencode(params)}|{versions}'
+        return 'page:' + hashlib.md5(raw.encode()).hexdigest()
+
+    def can_use_page_cache(self, request):
+        return (
+            request.method in ('GET', 'HEAD') and
+            not request.user.is_authenticated and
+            # Pending flash messages are rendered into the page once
+            'messages' not in request.COOKIES and
+            set(request.GET) <= set(self.page_cache_params)
+        )
+
+    def dispatch(self, request, *args, **kwargs):
+        if not self.can_use_page_cache(request):
+            return super().dispatch(request, *args, **kwargs)
+
+        key = self.page_cache_key()
+        cached = page_cache().get(key)
+        if cached is not None:
+            count_cache_lookup('pages', hits=1)
+            content_type, content = cached
+            response = HttpResponse(content, content_type=content_type)
+            response['X-Page-Cache'] = 'hit'
+            return response
+
+        count_cache_lookup('pages', misses=1)
+        response = super().dispatch(request, *args, **kwargs)
+        if hasattr(response, 'add_post_render_callback'):
+            response.add_post_render_callback(lambda rendered: self.store_page(key, rendered))
+        return response
+
+    def store_page(self, key, response):
+        # Pages with a CSRF token or that set cookies are specific to the visitor
+        if response.status_code != 200 or response.cookies or self.request.META.get('CSRF_COOKIE_USED'):
+            return
+        response['X-Page-Cache'] = 'miss'
+        page_cache().set(
+            key, (response['Content-Type'], response.content),
+            timeout=getattr(settings, 'PAGE_CACHE_TIMEOUT', 600),
+        )
@@ -0,0 +1,215 @@
+"""
+On-demand request profiling.
+
+A staff user adds ``?_profile=1`` to a URL (or sends ``X-Profile: 1``; 0, false, off
+and no leave profiling off) and the request
+runs under a sampling profiler: a background thread records the request thread's stack
+every PROFILE_INTERVAL seconds while an execute wrapper times every query. Samples are
+split into SQL, template rendering and the remaining Python time, and the stacks are
+kept in collapsed form ("frame;frame;frame count" lines) that flamegraph.pl and
+speedscope read directly.
+
+Reports go to a ring of at most PROFILE_RING_SIZE files in PROFILE_DIR; the response
+carries the report id in X-Profile-Id and the breakdown in Server-Timing. With
+``?_profile=flame`` the collapsed stacks are returned instead of the page.
+"""
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from collections import Counter
+from contextlib import ExitStack, contextmanager
+from django.conf import settings
+from django.db import connections
+from django.utils import timezone
+from .budgets import QueryRecorder
+
+# Frames from these packages mark a sample as SQL or template time; SQL wins when a
+# template issues a query
+SQL_PATHS = (os.path.join('django', 'db', 'backends'),)
+TEMPLATE_PATHS = (os.path.join('django', 'template'),)
+STDLIB = os.path.dirname(os.__file__) + os.sep
+
+PROFILE_ON = ('1', 'true', 'yes', 'on')
+
+# Profiled requests currently running and the switch interval to restore after the last
+_switch_lock = threading.Lock()
+_switch_users = 0
+_switch_restore = None
+
+
+def profile_mode(request):
+    """'flame' or 'report' if the request asks to be profiled, otherwise None"""
+    value = request.GET.get('_profile')
+    if value is None:
+        value = request.headers.get('X-Profile', '')
+    value = value.strip().lower()
+    if value == 'flame':
+        return 'flame'
+    return 'report' if value in PROFILE_ON else None
+
+
+@contextmanager
+def short_switch_interval(seconds):
+    """
+    Lower the interpreter's switch interval to at most ``seconds`` while any profiled
+    request runs. The setting is process-wide, so overlapping requests share it and the
+    original value comes back only when the last of them finishes.
+    """
+    global _switch_users, _switch_restore
+    with _switch_lock:
+        if not _switch_users:
+            _switch_restore = sys.getswitchinterval()
+        _switch_users += 1
+        sys.setswitchinterval(min(sys.getswitchinterval(), seconds))
+    try:
+        yield
+    finally:
+        with _switch_lock:
+            _switch_users -= 1
+            if not _switch_users:
+                sys.setswitchinterval(_switch_restore)
+
+
+def frame_label(code):
+    """Short 'function (file:line)' name of a code object for the collapsed stacks"""
+    filename = code.co_filename
+    for marker in ('site-packages' + os.sep, str(settings.BASE_DIR) + os.sep, STDLIB):
+        if marker in filename:
+            filename = filename.split(marker, 1)[1]
+            break
+    return f'{code.co_name} ({filename}:{code.co_firstlineno})'
+
+
+def categorize(stack):
+    filenames = [code.co_filename for code in stack]
+    if any(path in filename for filename in filenames for path in SQL_PATHS):
+        return 'sql'
+    if any(path in filename for filename in filenames for path in TEMPLATE_PATHS):
+        return 'template'
+    return 'python'
+
+
+class Sampler(threading.Thread):
+    """Samples the stack of one thread at a fixed interval until stopped"""
+
+    def __init__(self, thread_id, interval):
+        super().__init__(name='request-profiler', daemon=True)
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self.stopped = threading.Event()
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if self.stopped.is_set():
+                break
+            stack = []
+            while frame is not None:
+                stack.append(frame.f_code)
+                frame = frame.f_back
+            if stack:
+                self.stacks[tuple(reversed(stack))] += 1
+
+    def stop(self):
+        self.stopped.set()
+        self.join()
+
+    def collapsed(self):
+        lines = Counter()
+        for stack, count in self.stacks.items():
+            lines[';'.join(frame_label(code) for code in stack)] += count
+        return '\n'.join(f'{stack} {count}' for stack, count in lines.most_common())
+
+    def categories(self):
+        totals = Counter({'sql': 0, 'template': 0, 'python': 0})
+        for stack, count in self.stacks.items():
+            totals[categorize(stack)] += count
+        return totals
+
+
+class ProfileStore:
+    """Reports as JSON files in a directory, keeping only the newest ``size``"""
+
+    def __init__(self, directory=None, size=None):
+        self.directory = directory or getattr(
+            settings, 'PROFILE_DIR', os.path.join(tempfile.gettempdir(), 'cinema_buff_profiles')
+        )
+        self.size = size or getattr(settings, 'PROFILE_RING_SIZE', 100)
+
+    def path(self, report_id):
+        return os.path.join(self.directory, f'{report_id}.json')
+
+    def ids(self):
+        """Stored report ids, oldest first"""
+        if not os.path.isdir(self.directory):
+            return []
+        return sorted(name[:-5] for name in os.listdir(self.directory) if name.endswith('.json'))
+
+    def save(self, report):
+        os.makedirs(self.directory, exist_ok=True)
+        # Written to a temporary file and renamed so readers never see half a report
+        fd, tmp = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        with os.fdopen(fd, 'w') as f:
+            json.dump(report, f)
+        os.replace(tmp, self.path(report['id']))
+        for report_id in self.ids()[:-self.size]:
+            try:
+                os.remove(self.path(report_id))
+            except FileNotFoundError:
+                pass
+
+    def load(self, report_id):
+        with open(self.path(report_id)) as f:
+            return json.load(f)
+
+
+def profile_request(request, get_response):
+    """Run ``get_response`` under the sampler and query timer; return (response, report)"""
+    interval = getattr(settings, 'PROFILE_INTERVAL', 0.001)
+    recorder = QueryRecorder()
+    sampler = Sampler(threading.get_ident(), interval)
+    started_at = timezone.now()
+    # The sampler only runs when the request thread hands over the GIL, which it does
+    # every switch interval (5ms by default) or on I/O; without shortening it the
+    # samples would pile up on queries
+    with ExitStack() as stack:
+        stack.enter_context(short_switch_interval(interval / 2))
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(recorder))
+        sampler.start()
+        started = time.perf_counter()
+        try:
+            response = get_response(request)
+        finally:
+            wall = time.perf_counter() - started
+            sampler.stop()
+
+    # Sample shares give the template and Python split; SQL time is measured exactly
+    wall_ms, sql_ms = wall * 1000, recorder.seconds * 1000
+    categories = sampler.categories()
+    samples = sum(categories.values())
+    template_ms = wall_ms * categories['template'] / samples if samples else 0.0
+    match = request.resolver_match
+    report = {
+        'id': f'{time.time_ns()}-{uuid.uuid4().hex[:8]}',
+        'started_at': started_at.isoformat(),
+        'method': request.method,
+        'path': request.get_full_path(),
+        'view': match.view_name if match else None,
+        'user': request.user.get_username(),
+        'status': response.status_code,
+        'wall_ms': round(wall_ms, 3),
+        'sql_ms': round(sql_ms, 3),
+        'template_ms': round(template_ms, 3),
+        'python_ms': round(max(wall_ms - sql_ms - template_ms, 0.0), 3),
+        'queries': recorder.count,
+        'samples': samples,
+        'interval_ms': interval * 1000,
+        'collapsed': sampler.collapsed(),
+    }
+    return response, report
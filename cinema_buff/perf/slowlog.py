@@ -0,0 +1,110 @@
+"""
+Slow query capture.
+
+SlowQueryRecorder is a database execute wrapper that times every statement and keeps
+the ones slower than SLOW_QUERY_THRESHOLD_MS (default 100) along with their
+fingerprint, a summary of the project code that issued them and, for SELECTs, the
+plan from EXPLAIN run right after with the same parameters. SlowQueryMiddleware
+wraps each request and saves what it caught once the response is ready, so the
+bookkeeping never runs inside the request's own transaction; management commands can
+use capture_slow_queries the same way.
+
+Each slow query is written as a JSON line to the 'perf.slow_queries' logger (a file
+shared by the workers and rotated by logrotate, see settings.LOGGING) and added to its
+SlowQueryFingerprint row, which the admin lists by total time.
+"""
+import json
+import logging
+import os
+import time
+import traceback
+from contextlib import ExitStack, contextmanager
+from django.conf import settings
+from django.db import DatabaseError, connections, transaction
+from .budgets import fingerprint
+
+logger = logging.getLogger('perf.slow_queries')
+
+# Queries kept per request, so a pathological page cannot flood the log
+MAX_PER_REQUEST = 20
+STACK_DEPTH = 6
+
+
+def threshold_ms():
+    return getattr(settings, 'SLOW_QUERY_THRESHOLD_MS', 100)
+
+
+def stack_summary():
+    """The innermost project frames of the current stack, as 'file:line in function'"""
+    base = str(settings.BASE_DIR) + os.sep
+    perf = os.path.dirname(__file__) + os.sep
+    frames = [
+        f'{frame.filename[len(base):]}:{frame.lineno} in {frame.name}'
+        for frame in traceback.extract_stack()
+        if frame.filename.startswith(base) and not frame.filename.startswith(perf)
+    ]
+    return frames[-STACK_DEPTH:]
+
+
+class SlowQueryRecorder:
+    def __init__(self, threshold=None):
+        self.threshold = threshold_ms() if threshold is None else threshold
+        self.entries = []
+        self.view = None
+        self.explaining = False
+
+    def __call__(self, execute, sql, params, many, context):
+        if self.explaining:
+            return execute(sql, params, many, context)
+        started = time.perf_counter()
+        result = execute(sql, params, many, context)
+        duration_ms = (time.perf_counter() - started) * 1000
+        if duration_ms >= self.threshold and len(self.entries) < MAX_PER_REQUEST:
+            connection = context['connection']
+            self.entries.append({
+                'fingerprint': fingerprint(sql),
+                'sql': sql,
+                'params': None if many else repr(params)[:1000],
+                'duration_ms': round(duration_ms, 3),
+                'database': connection.alias,
+                'view': None,
+                'stack': stack_summary(),
+                'explain': None if many else self.explain(connection, sql, params),
+            })
+        return result
+
+    def explain(self, connection, sql, params):
+        """Plan of a SELECT, or None; a failing EXPLAIN is rolled back to a savepoint"""
+        if not sql.lstrip().upper().startswith(('SELECT', 'WITH')):
+            return None
+        self.explaining = True
+        try:
+            with transaction.atomic(using=connection.alias):
+                with connection.cursor() as cursor:
+                    cursor.execute(f'{connection.ops.explain_query_prefix()} {sql}', params)
+                    rows = cursor.fetchall()
+        except DatabaseError:
+            return None
+        finally:
+            self.explaining = False
+        return '\n'.join(' '.join(str(column) for column in row) for row in rows)
+
+    def save(self):
+        from .models import SlowQueryFingerprint
+        for entry in self.entries:
+            entry['view'] = self.view
+            logger.warning(json.dumps(entry))
+            SlowQueryFingerprint.record(entry)
+        self.entries = []
+
+
+@contextmanager
+def capture_slow_queries(view=None, threshold=None):
+    """Record slow queries on every connection inside the block and save them after it"""
+    recorder = SlowQueryRecorder(threshold)
+    recorder.view = view
+    with ExitStack() as stack:
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(recorder))
+        yield recorder
+    recorder.save()
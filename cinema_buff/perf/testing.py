@@ -0,0 +1,44 @@
+from io import StringIO
+from urllib.parse import urlsplit
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import resolve
+from .benchmarks import DATASETS
+from .budgets import QueryLog, view_budget
+
+class QueryBudgetTestCase(TestCase):
+    """
+    Base class for tests that hold views and serializers to their declared query budgets.
+
+    The test database is filled once per class with a generated dataset (``dataset`` names
+    one of perf.benchmarks.DATASETS), so pages are full and per-row queries show up.
+    """
+    dataset = 'small'
+
+    @classmethod
+    def setUpTestData(cls):
+        call_command('generate_dataset', prefix='budget', stdout=StringIO(), **DATASETS[cls.dataset])
+
+    def assertWithinBudget(self, url, user=None, budget=None):
+        """Fetch ``url`` (as ``user``, if given) and check its queries against the view's budget"""
+        if budget is None:
+            budget = view_budget(resolve(urlsplit(url).path).func)
+        self.assertIsNotNone(budget, f'{url} has no query budget')
+        if user is not None:
+            self.client.force_login(user)
+        log = QueryLog()
+        with log.capture():
+            response = self.client.get(url)
+        self.assertLess(response.status_code, 400, f'{url} returned {response.status_code}')
+        self.assertLessEqual(log.count, budget, f'{url} is over its query budget: {log.report(budget)}')
+        return response
+
+    def assertSerializerWithinBudget(self, serializer_class, queryset, budget=None, **kwargs):
+        """Serialize ``queryset`` and check the queries against the serializer's budget"""
+        if budget is None:
+            budget = serializer_class.query_budget
+        log = QueryLog()
+        with log.capture():
+            serializer_class(queryset, many=True, **kwargs).data
+        self.assertLessEqual(log.count, budget, f'{serializer_class.__name__} is over its query budget: '
+                                                f'{log.report(budget)}')
@@ -0,0 +1,157 @@
+import html
+import re
+import subprocess
+import sys
+import tempfile
+from datetime import date
+from django.contrib.auth.models import User
+from django.conf import settings
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from api.serializers import MovieSerializer
+from movies.models import Movie, Rating
+from .benchmarks import benchmark_user, build_scenarios, run_benchmarks
+from .pagecache import VERSION_PREFIX
+from .profiling import short_switch_interval
+from .testing import QueryBudgetTestCase
+
+NEXT_LINK = re.compile(r'href="(\?cursor=[^"]+)">Next</a>')
+LOCMEM_CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class QueryBudgetTests(QueryBudgetTestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_pages_and_endpoints_stay_within_budget(self):
+        user = User.objects.get(pk=benchmark_user())
+        for scenario in build_scenarios():
+            with self.subTest(scenario.name):
+                # Cold caches, so the view itself runs rather than a cached copy
+                cache.clear()
+                self.client.logout()
+                self.assertWithinBudget(scenario.url, user if scenario.login else None)
+
+    def test_recommendation_fallback_stays_within_budget(self):
+        newcomer = User.objects.create_user('budget-newcomer')
+        self.assertWithinBudget(reverse('recommendations:recommended_for_you'), newcomer)
+
+    def test_later_pages_stay_within_budget(self):
+        response = self.assertWithinBudget(reverse('movies:movie_list'))
+        cursor = NEXT_LINK.search(response.content.decode()).group(1)
+        self.assertWithinBudget(reverse('movies:movie_list') + html.unescape(cursor))
+
+        response = self.assertWithinBudget(reverse('movie-list'))
+        self.assertWithinBudget(response.json()['next'])
+
+    def test_benchmarks_measure_cold_and_warm_runs_in_their_own_cache(self):
+        results = run_benchmarks(iterations=2, only='movie_list:newest')
+        cold, warm = results
+        self.assertEqual((cold['cache'], warm['cache']), ('cold', 'warm'))
+        self.assertGreater(cold['queries']['min'], 0)
+        self.assertEqual(warm['queries']['max'], 0)
+        self.assertIsNone(cache.get(VERSION_PREFIX + 'movies'))
+
+    def test_movie_serializer_stays_within_budget(self):
+        queryset = MovieSerializer.plan_queryset(Movie.objects.all())[:20]
+        self.assertSerializerWithinBudget(MovieSerializer, queryset)
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class PageCacheTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.movie = Movie.objects.create(title='Heat', synopsis='x', release_date=date(1995, 12, 15))
+        cls.user = User.objects.create_user('rater')
+
+    def setUp(self):
+        cache.clear()
+
+    def test_anonymous_pages_are_cached_until_their_data_changes(self):
+        url = reverse('movies:movie_list')
+        self.assertEqual(self.client.get(url)['X-Page-Cache'], 'miss')
+        self.assertEqual(self.client.get(url)['X-Page-Cache'], 'hit')
+        self.assertEqual(self.client.get(url + '?sort=newest')['X-Page-Cache'], 'miss')
+
+        Movie.objects.create(title='Alien', synopsis='x', release_date=date(1979, 5, 25))
+        response = self.client.get(url)
+        self.assertEqual(response['X-Page-Cache'], 'miss')
+        self.assertContains(response, 'Alien')
+
+    def test_signed_in_and_unknown_parameters_bypass_the_cache(self):
+        url = reverse('movies:movie_list')
+        self.client.get(url)
+        self.assertNotIn('X-Page-Cache', self.client.get(url + '?utm_source=x'))
+        self.client.force_login(self.user)
+        self.assertNotIn('X-Page-Cache', self.client.get(url))
+
+    def test_conditional_get_on_movie_detail(self):
+        url = reverse('movies:movie_detail', args=[self.movie.pk])
+        etag = self.client.get(url)['ETag']
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        Rating.objects.create(user=self.user, movie=self.movie)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_conditional_get_on_the_api(self):
+        url = reverse('movie-detail', args=[self.movie.pk])
+        etag = self.client.get(url)['ETag']
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        self.movie.title = 'Heat (1995)'
+        self.movie.save()
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+
+class MiddlewareImportTests(SimpleTestCase):
+    def test_request_path_does_not_load_test_code(self):
+        script = (
+            'import sys, django; django.setup(); import perf.middleware, perf.profiling; '
+            'print(" ".join(name for name in ("perf.benchmarks", "django.test", "movies.views") if name in sys.modules))'
+        )
+        # A fresh interpreter, since the test runner itself has loaded django.test; it
+        # inherits DJANGO_SETTINGS_MODULE from manage.py
+        output = subprocess.run([sys.executable, '-c', script], cwd=settings.BASE_DIR,
+                                capture_output=True, text=True, check=True).stdout
+        self.assertEqual(output.strip(), '')
+
+
+@override_settings(CACHES=LOCMEM_CACHES, PROFILING_ENABLED=True)
+class ProfilingTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.staff = User.objects.create_user('staff', is_staff=True)
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.enterContext(override_settings(PROFILE_DIR=directory.name))
+        self.client.force_login(self.staff)
+
+    def test_flag_is_read_as_a_boolean(self):
+        url = reverse('movies:movie_list')
+        for value in ('0', 'false', 'off', ''):
+            with self.subTest(value):
+                self.assertNotIn('X-Profile-Id', self.client.get(url, {'_profile': value}))
+        self.assertNotIn('X-Profile-Id', self.client.get(url, HTTP_X_PROFILE='no'))
+        self.assertIn('X-Profile-Id', self.client.get(url, {'_profile': '1'}))
+        self.assertIn('X-Profile-Id', self.client.get(url, HTTP_X_PROFILE='true'))
+        response = self.client.get(url, {'_profile': 'flame'})
+        self.assertEqual(response['Content-Type'], 'text/plain; charset=utf-8')
+
+    def test_only_staff_are_profiled(self):
+        self.client.logout()
+        self.assertNotIn('X-Profile-Id', self.client.get(reverse('movies:movie_list'), {'_profile': '1'}))
+
+    def test_overlapping_requests_restore_the_switch_interval_once_both_finish(self):
+        original = sys.getswitchinterval()
+        first, second = short_switch_interval(0.0005), short_switch_interval(0.0005)
+        first.__enter__()
+        second.__enter__()
+        first.__exit__(None, None, None)
+        self.assertEqual(sys.getswitchinterval(), 0.0005)
+        second.__exit__(None, None, None)
+        self.assertEqual(sys.getswitchinterval(), original)
@@ -0,0 +1,24 @@
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseForbidden
+from django.utils.crypto import constant_time_compare
+from .budgets import query_budget
+from .metrics import exposition
+
+@query_budget(2)
+def metrics(request):
+    """
+    Prometheus scrape endpoint.
+
+    Open with DEBUG on; otherwise the scraper sends ``Authorization: Bearer <METRICS_TOKEN>``
+    or the request comes from a logged-in staff user.
+    """
+    token = getattr(settings, 'METRICS_TOKEN', None)
+    authorized = (
+        settings.DEBUG or
+        (token and constant_time_compare(request.headers.get('Authorization', ''), f'Bearer {token}')) or
+        request.user.is_staff
+    )
+    if not authorized:
+        return HttpResponseForbidden()
+    body, content_type = exposition()
+    return HttpResponse(body, content_type=content_type)
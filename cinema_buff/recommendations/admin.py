@@ -0,0 +1,15 @@
+from django.contrib import admin
+from .models import ItemNeighbor, RecommendationRun
+
+@admin.register(ItemNeighbor)
+class ItemNeighborAdmin(admin.ModelAdmin):
+    list_display = ['movie', 'neighbor', 'score', 'common_raters']
+    search_fields = ['movie__title', 'neighbor__title']
+    raw_id_fields = ['movie', 'neighbor']
+    ordering = ['movie', '-score']
+
+@admin.register(RecommendationRun)
+class RecommendationRunAdmin(admin.ModelAdmin):
+    list_display = ['started_at', 'finished_at', 'full', 'ratings_loaded', 'movies_recomputed', 'neighbors_written']
+    list_filter = ['full']
+    readonly_fields = ['started_at', 'finished_at', 'full', 'ratings_loaded', 'movies_recomputed', 'neighbors_written']
@@ -0,0 +1,140 @@
+"""
+Item-item collaborative filtering over the Rating table.
+
+Ratings are loaded into a sparse users x movies matrix of overall scores centred on each
+user's mean (adjusted cosine), so a movie's column says who liked or disliked it relative
+to their own taste. Similarities for a block of movies are one sparse product of their
+columns with the whole matrix, shrunk towards zero when few users rated both titles.
+Blocks are independent and are farmed out to worker processes.
+
+Requires NumPy and SciPy; only the compute_recommendations command imports this module.
+"""
+import os
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+
+import numpy as np
+from scipy import sparse
+
+from movies.models import Rating
+
+LOAD_BATCH_SIZE = 100000
+
+
+class RatingMatrix:
+    """Mean-centred ratings as a CSC users x movies matrix plus a co-rating indicator matrix"""
+
+    def __init__(self, user_ids, movie_ids, scores):
+        self.movie_ids, movie_index = np.unique(movie_ids, return_inverse=True)
+        users, user_index = np.unique(user_ids, return_inverse=True)
+        shape = (len(users), len(self.movie_ids))
+
+        means = np.bincount(user_index, weights=scores, minlength=len(users)) / np.maximum(
+            np.bincount(user_index, minlength=len(users)), 1
+        )
+        centred = scores - means[user_index]
+
+        self.ratings = sparse.csc_matrix((centred, (user_index, movie_index)), shape=shape, dtype=np.float32)
+        self.ratings.eliminate_zeros()
+        self.raters = sparse.csc_matrix(
+            (np.ones(len(scores), dtype=np.float32), (user_index, movie_index)), shape=shape
+        )
+        self.norms = np.sqrt(np.asarray(self.ratings.multiply(self.ratings).sum(axis=0)).ravel())
+        self.positions = {int(movie_id): position for position, movie_id in enumerate(self.movie_ids)}
+
+    def __len__(self):
+        return len(self.movie_ids)
+
+    @classmethod
+    def load(cls):
+        """Stream every rating out of the database into flat arrays"""
+        rows = Rating.objects.values_list(
+            'user_id', 'movie_id', 'story_score', 'acting_score', 'cinematography_score'
+        ).order_by().iterator(chunk_size=LOAD_BATCH_SIZE)
+        batches = []
+        while True:
+            batch = np.array(list(islice(rows, LOAD_BATCH_SIZE)), dtype=np.int64).reshape(-1, 5)
+            if not len(batch):
+                break
+            batches.append(batch)
+        data = np.concatenate(batches) if batches else np.empty((0, 5), dtype=np.int64)
+        scores = data[:, 2:].sum(axis=1) / 3.0
+        return cls(data[:, 0], data[:, 1], scores)
+
+
+# Set in each worker process by _init_worker so the matrices are shipped once per worker
+_worker_state = {}
+
+
+def _init_worker(matrix, top_k, min_common, shrinkage):
+    _worker_state.update(matrix=matrix, top_k=top_k, min_common=min_common, shrinkage=shrinkage)
+
+
+def _neighbors_for_block(positions):
+    """Top-k neighbours of the movies at the given matrix positions"""
+    matrix = _worker_state['matrix']
+    top_k = _worker_state['top_k']
+    min_common = _worker_state['min_common']
+    shrinkage = _worker_state['shrinkage']
+
+    dots = (matrix.ratings[:, positions].T.tocsr() @ matrix.ratings).tocsr()
+    common = (matrix.raters[:, positions].T.tocsr() @ matrix.raters).tocsr()
+
+    results = []
+    for row, position in enumerate(positions):
+        start, end = common.indptr[row], common.indptr[row + 1]
+        candidates = common.indices[start:end]
+        counts = common.data[start:end]
+        keep = (counts >= min_common) & (candidates != position)
+        candidates, counts = candidates[keep], counts[keep]
+        if not len(candidates):
+            results.append((position, [], [], []))
+            continue
+
+        dot_row = dots.getrow(row).toarray().ravel()[candidates]
+        denominator = matrix.norms[position] * matrix.norms[candidates]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            scores = np.where(denominator > 0, dot_row / denominator, 0.0)
+        # Shrink similarities that rest on few co-raters towards zero
+        scores = scores * counts / (counts + shrinkage)
+
+        positive = scores > 0
+        candidates, counts, scores = candidates[positive], counts[positive], scores[positive]
+        if len(scores) > top_k:
+            best = np.argpartition(-scores, top_k)[:top_k]
+            candidates, counts, scores = candidates[best], counts[best], scores[best]
+        order = np.argsort(-scores, kind='stable')
+        results.append((position, candidates[order].tolist(), scores[order].tolist(), counts[order].tolist()))
+    return results
+
+
+def compute_neighbors(matrix, positions, top_k=30, min_common=2, shrinkage=10.0, workers=None, block_size=512):
+    """
+    Yield ``(movie_id, [(neighbor_id, score, common_raters), ...])`` for each matrix position.
+
+    Blocks of ``block_size`` movies are processed in parallel across ``workers`` processes
+    (all cores by default); with a single worker everything runs in this process.
+    """
+    workers = workers or os.cpu_count() or 1
+    positions = np.asarray(sorted(positions), dtype=np.int64)
+    blocks = [positions[start:start + block_size] for start in range(0, len(positions), block_size)]
+    params = (matrix, top_k, min_common, shrinkage)
+
+    if workers == 1 or len(blocks) == 1:
+        _init_worker(*params)
+        block_results = map(_neighbors_for_block, blocks)
+        executor = None
+    else:
+        executor = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=params)
+        block_results = executor.map(_neighbors_for_block, blocks)
+
+    try:
+        for results in block_results:
+            for position, candidates, scores, counts in results:
+                yield int(matrix.movie_ids[position]), [
+                    (int(matrix.movie_ids[candidate]), float(score), int(count))
+                    for candidate, score, count in zip(candidates, scores, counts)
+                ]
+    finally:
+        if executor is not None:
+            executor.shutdown()
@@ -0,0 +1,158 @@
+import time
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+from movies.models import RatingStats
+from recommendations.models import ItemNeighbor, RecommendationRun, SimilarityRefresh
+
+# NumPy and SciPy are only needed here, not by the web processes that serve the results
+try:
+    from recommendations.engine import RatingMatrix, compute_neighbors
+except ImportError as exc:
+    RatingMatrix = compute_neighbors = None
+    engine_import_error = exc
+
+class Command(BaseCommand):
+    help = 'Compute item-item neighbours from ratings for the recommendation views'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--full', action='store_true',
+                            help='Recompute every movie instead of only those rated since the last run')
+        parser.add_argument('--top-k', type=int, default=30,
+                            help='Neighbours kept per movie (default: 30)')
+        parser.add_argument('--min-common', type=int, default=2,
+                            help='Minimum users who rated both movies (default: 2)')
+        parser.add_argument('--shrinkage', type=float, default=10.0,
+                            help='Damping for similarities based on few co-raters (default: 10)')
+        parser.add_argument('--workers', type=int, default=None,
+                            help='Worker processes (default: one per CPU)')
+        parser.add_argument('--block-size', type=int, default=512,
+                            help='Movies per unit of work (default: 512)')
+        parser.add_argument('--batch-size', type=int, default=5000,
+                            help='Neighbour rows written per transaction (default: 5000)')
+        parser.add_argument('--loop', action='store_true',
+                            help='Keep running, one run every --interval seconds')
+        parser.add_argument('--interval', type=float, default=3600.0,
+                            help='Seconds between runs with --loop (default: 3600)')
+        parser.add_argument('--full-every', type=int, default=24,
+                            help='With --loop, make every Nth run a full one (default: 24; 0 never)')
+
+    def handle(self, *args, **options):
+        if RatingMatrix is None:
+            raise CommandError(f'compute_recommendations needs NumPy and SciPy ({engine_import_error}); '
+                               'install them with pip install -r requirements.txt')
+
+        runs = 0
+        while True:
+            # Incremental runs skip pairs that were not neighbours either way; full ones catch up
+            full_due = options['loop'] and options['full_every'] > 0 and runs and runs % options['full_every'] == 0
+            self.run(options, full=options['full'] or full_due)
+            runs += 1
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
+
+    def run(self, options, full=False):
+        """One run: incremental unless ``full`` or there has been no finished run yet"""
+        self.recomputed_ids = set()
+        previous = RecommendationRun.last_finished()
+        full = full or previous is None
+        run = RecommendationRun.objects.create(started_at=timezone.now(), full=full)
+
+        started = time.monotonic()
+        matrix = RatingMatrix.load()
+        run.ratings_loaded = matrix.raters.nnz
+        self.stdout.write(f'Loaded {run.ratings_loaded} ratings of {len(matrix)} movies '
+                          f'in {time.monotonic() - started:.1f}s')
+
+        params = {
+            'top_k': options['top_k'],
+            'min_common': options['min_common'],
+            'shrinkage': options['shrinkage'],
+            'workers': options['workers'],
+            'block_size': options['block_size'],
+        }
+        if full:
+            positions = range(len(matrix))
+            written, recomputed = self.write(compute_neighbors(matrix, positions, **params), options['batch_size'])
+            # Movies that lost all their ratings keep no neighbours
+            ItemNeighbor.objects.filter(movie__rating_stats__total_ratings=0).delete()
+        else:
+            written, recomputed = self.incremental(matrix, previous, params, options['batch_size'])
+
+        # Similar titles blend in the neighbour scores, so the recomputed movies need a refresh
+        SimilarityRefresh.enqueue(self.recomputed_ids)
+
+        run.movies_recomputed = recomputed
+        run.neighbors_written = written
+        run.finished_at = timezone.now()
+        run.save()
+        kind = 'full' if full else 'incremental'
+        self.stdout.write(self.style.SUCCESS(
+            f'{kind.capitalize()} run recomputed {recomputed} movies, wrote {written} neighbours '
+            f'in {time.monotonic() - started:.1f}s'
+        ))
+
+    def incremental(self, matrix, previous, params, batch_size):
+        """
+        Recompute the movies whose ratings changed since the previous run, then the movies
+        linked to them in either direction. RatingStats.updated_at moves on every rating
+        insert, edit and delete, so it doubles as the change log. Pairs that were not
+        neighbours either way before or after are not revisited; a periodic --full run
+        picks those up.
+        """
+        changed = set(RatingStats.objects.filter(
+            updated_at__gte=previous.started_at
+        ).values_list('movie_id', flat=True))
+        if not changed:
+            return 0, 0
+
+        # Changed movies that no longer have ratings simply lose their neighbours
+        ItemNeighbor.objects.filter(movie_id__in=changed - set(matrix.positions)).delete()
+        dirty = {matrix.positions[movie_id] for movie_id in changed if movie_id in matrix.positions}
+
+        new_neighbors = set()
+
+        def remember(results):
+            for movie_id, neighbors in results:
+                new_neighbors.update(neighbor_id for neighbor_id, score, common in neighbors)
+                yield movie_id, neighbors
+
+        written, recomputed = self.write(remember(compute_neighbors(matrix, dirty, **params)), batch_size)
+
+        linked = new_neighbors | set(
+            ItemNeighbor.objects.filter(neighbor_id__in=changed).values_list('movie_id', flat=True)
+        )
+        linked = {matrix.positions[movie_id] for movie_id in linked if movie_id in matrix.positions} - dirty
+        if linked:
+            more_written, more_recomputed = self.write(compute_neighbors(matrix, linked, **params), batch_size)
+            written += more_written
+            recomputed += more_recomputed
+        return written, recomputed
+
+    def write(self, results, batch_size):
+        """Replace the stored neighbours of each computed movie, a batch per transaction"""
+        written = recomputed = 0
+        movie_ids, rows = [], []
+
+        def flush():
+            with transaction.atomic():
+                ItemNeighbor.objects.filter(movie_id__in=movie_ids).delete()
+                ItemNeighbor.objects.bulk_create(rows, batch_size=batch_size)
+
+        for movie_id, neighbors in results:
+            movie_ids.append(movie_id)
+            self.recomputed_ids.add(movie_id)
+            rows.extend(
+                ItemNeighbor(movie_id=movie_id, neighbor_id=neighbor_id, score=score, common_raters=common)
+                for neighbor_id, score, common in neighbors
+            )
+            recomputed += 1
+            if len(rows) >= batch_size or len(movie_ids) >= batch_size:
+                flush()
+                written += len(rows)
+                movie_ids, rows = [], []
+        if movie_ids:
+            flush()
+            written += len(rows)
+        return written, recomputed
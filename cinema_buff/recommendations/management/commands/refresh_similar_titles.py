@@ -0,0 +1,54 @@
+import time
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from movies.models import Movie
+from recommendations.models import SimilarTitle, SimilarityRefresh
+from recommendations.similarity import SimilarityIndex
+
+class Command(BaseCommand):
+    help = 'Recompute similar titles for movies queued by genre, movie and rating changes'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true',
+                            help='Queue every movie before draining the queue')
+        parser.add_argument('--loop', action='store_true',
+                            help='Keep polling the queue instead of exiting once it is empty')
+        parser.add_argument('--interval', type=float, default=30.0,
+                            help='Seconds between polls with --loop (default: 30)')
+        parser.add_argument('--batch-size', type=int, default=500,
+                            help='Queued movies handled per batch (default: 500)')
+
+    def handle(self, *args, **options):
+        if options['all']:
+            SimilarityRefresh.enqueue(Movie.objects.values_list('pk', flat=True))
+
+        while True:
+            refreshed = self.drain(options['batch_size'])
+            if refreshed:
+                self.stdout.write(self.style.SUCCESS(f'Refreshed similar titles for {refreshed} movies'))
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
+
+    def drain(self, batch_size):
+        """Work through the queue in batches; returns the number of movies refreshed"""
+        if not SimilarityRefresh.objects.exists():
+            return 0
+
+        index = SimilarityIndex()
+        refreshed = 0
+        while True:
+            # Requests made after this point stay queued for the next batch
+            claimed_at = timezone.now()
+            batch = list(SimilarityRefresh.objects.order_by('requested_at').values_list(
+                'movie_id', flat=True
+            )[:batch_size])
+            if not batch:
+                return refreshed
+
+            # Movies currently listing a queued movie may rank it differently now too
+            listing = SimilarTitle.objects.filter(similar_id__in=batch).values_list('movie_id', flat=True)
+            movie_ids = set(batch) | set(listing)
+            index.refresh(movie_ids)
+            SimilarityRefresh.objects.filter(movie_id__in=batch, requested_at__lte=claimed_at).delete()
+            refreshed += len(movie_ids)
@@ -0,0 +1,52 @@
+# Generated by Django 5.2.6 on 2026-10-18 08:39
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def queue_existing_movies(apps, schema_editor):
+    """Queue every movie so the first refresh_similar_titles run fills the panel"""
+    Movie = apps.get_model('movies', 'Movie')
+    SimilarityRefresh = apps.get_model('recommendations', 'SimilarityRefresh')
+    now = timezone.now()
+    SimilarityRefresh.objects.bulk_create(
+        [SimilarityRefresh(movie_id=movie_id, requested_at=now)
+         for movie_id in Movie.objects.values_list('pk', flat=True).iterator()],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('movies', '0010_ratingstats_distribution'),
+        ('recommendations', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SimilarityRefresh',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('requested_at', models.DateTimeField()),
+                ('movie', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='similarity_refresh', to='movies.movie')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='SimilarTitle',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('score', models.FloatField()),
+                ('genre_score', models.FloatField(default=0.0, help_text="Jaccard overlap of the two movies' genres")),
+                ('rating_score', models.FloatField(default=0.0, help_text='Item-item similarity from ItemNeighbor')),
+                ('movie', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='similar_titles', to='movies.movie')),
+                ('similar', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='similar_to', to='movies.movie')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['movie', '-score'], name='similar_title_rank_idx')],
+                'unique_together': {('movie', 'similar')},
+            },
+        ),
+        migrations.RunPython(queue_existing_movies, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,114 @@
+from django.db import models
+from django.utils import timezone
+from django.db.models import Avg, ExpressionWrapper, F, FloatField, Subquery, Sum
+from movies.models import Movie, Rating
+
+class ItemNeighbor(models.Model):
+    """One of a movie's most similar movies by co-rating, written by compute_recommendations"""
+    movie = models.ForeignKey(Movie, on_delete=models.CASCADE, related_name='neighbors')
+    neighbor = models.ForeignKey(Movie, on_delete=models.CASCADE, related_name='neighbor_of')
+    score = models.FloatField(help_text="Shrunk adjusted-cosine similarity")
+    common_raters = models.IntegerField(default=0)
+
+    class Meta:
+        unique_together = ('movie', 'neighbor')
+
+    def __str__(self):
+        return f"{self.movie.title} ~ {self.neighbor.title} ({self.score:.3f})"
+
+    @classmethod
+    def recommend_for(cls, user, limit=24):
+        """
+        Movies the user has not rated, ranked by how their neighbours were rated.
+
+        Each rated movie votes for its stored neighbours with similarity times the
+        user's rating relative to their own average, so everything comes from one
+        query over the user's ratings joined to the neighbour table.
+        """
+        overall = ExpressionWrapper(
+            (F('story_score') + F('acting_score') + F('cinematography_score')) / 3.0,
+            output_field=FloatField(),
+        )
+        # Uncorrelated, so the database evaluates it once rather than per row
+        user_mean = Rating.objects.filter(user=user).values('user').annotate(mean=Avg(overall)).values('mean')
+        neighbor_overall = (
+            F('neighbor_of__movie__ratings__story_score') +
+            F('neighbor_of__movie__ratings__acting_score') +
+            F('neighbor_of__movie__ratings__cinematography_score')
+        ) / 3.0
+        return Movie.objects.filter(
+            neighbor_of__movie__ratings__user=user,
+        ).exclude(
+            ratings__user=user,
+        ).annotate(
+            recommendation_score=Sum(
+                F('neighbor_of__score') * (neighbor_overall - Subquery(user_mean)),
+                output_field=FloatField(),
+            ),
+        ).filter(
+            recommendation_score__gt=0,
+        ).defer('search_vector').select_related('rating_stats').prefetch_related('genres').order_by(
+            '-recommendation_score', '-id'
+        )[:limit]
+
+class RecommendationRun(models.Model):
+    """A compute_recommendations run; the last finished one is the watermark for incremental runs"""
+    started_at = models.DateTimeField()
+    finished_at = models.DateTimeField(null=True, blank=True)
+    full = models.BooleanField(default=False)
+    ratings_loaded = models.IntegerField(default=0)
+    movies_recomputed = models.IntegerField(default=0)
+    neighbors_written = models.IntegerField(default=0)
+
+    class Meta:
+        ordering = ['-started_at']
+
+    def __str__(self):
+        kind = 'Full' if self.full else 'Incremental'
+        return f"{kind} run at {self.started_at:%Y-%m-%d %H:%M}"
+
+    @classmethod
+    def last_finished(cls):
+        return cls.objects.filter(finished_at__isnull=False).order_by('-started_at').first()
+
+class SimilarTitle(models.Model):
+    """A precomputed "similar titles" entry, blending genre overlap with co-rating similarity"""
+    movie = models.ForeignKey(Movie, on_delete=models.CASCADE, related_name='similar_titles')
+    similar = models.ForeignKey(Movie, on_delete=models.CASCADE, related_name='similar_to')
+    score = models.FloatField()
+    genre_score = models.FloatField(default=0.0, help_text="Jaccard overlap of the two movies' genres")
+    rating_score = models.FloatField(default=0.0, help_text="Item-item similarity from ItemNeighbor")
+
+    class Meta:
+        unique_together = ('movie', 'similar')
+        indexes = [
+            models.Index(fields=['movie', '-score'], name='similar_title_rank_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.movie.title} ~ {self.similar.title} ({self.score:.3f})"
+
+    @classmethod
+    def for_movie(cls, movie, limit=10):
+        """The most similar movies, with their stats, in one query"""
+        return Movie.objects.filter(similar_to__movie=movie).defer('search_vector').select_related('rating_stats').order_by(
+            '-similar_to__score', 'similar_to__similar_id'
+        )[:limit]
+
+class SimilarityRefresh(models.Model):
+    """Queue of movies whose similar titles need recomputing, drained by refresh_similar_titles"""
+    movie = models.OneToOneField(Movie, on_delete=models.CASCADE, related_name='similarity_refresh')
+    requested_at = models.DateTimeField()
+
+    def __str__(self):
+        return f"{self.movie_id} requested at {self.requested_at}"
+
+    @classmethod
+    def enqueue(cls, movie_ids):
+        """Mark movies for a refresh; re-requesting a queued movie moves its timestamp forward"""
+        now = timezone.now()
+        cls.objects.bulk_create(
+            [cls(movie_id=movie_id, requested_at=now) for movie_id in set(movie_ids)],
+            update_conflicts=True, unique_fields=['movie'], update_fields=['requested_at'],
+            batch_size=1000,
+        )
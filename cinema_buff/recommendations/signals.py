@@ -0,0 +1,20 @@
+from django.db.models.signals import m2m_changed, pre_delete
+from django.dispatch import receiver
+from movies.models import Genre, Movie
+from .models import SimilarityRefresh
+
+@receiver(m2m_changed, sender=Movie.genres.through)
+def queue_genre_change(sender, instance, action, reverse, pk_set, **kwargs):
+    """Queue movies whose genres change for a similar titles refresh"""
+    if action in ('post_add', 'post_remove'):
+        movie_ids = pk_set if reverse else [instance.pk]
+    elif action == 'pre_clear':
+        movie_ids = instance.movies.values_list('pk', flat=True) if reverse else [instance.pk]
+    else:
+        return
+    SimilarityRefresh.enqueue(movie_ids)
+
+@receiver(pre_delete, sender=Genre)
+def queue_genre_delete(sender, instance, **kwargs):
+    """Deleting a genre drops it from its movies without an m2m_changed signal"""
+    SimilarityRefresh.enqueue(instance.movies.values_list('pk', flat=True))
@@ -0,0 +1,103 @@
+"""
+Similar titles: a blend of genre overlap and co-rating similarity.
+
+Genre similarity is the Jaccard index of two movies' genre sets. Co-rating similarity is
+the ItemNeighbor score written by compute_recommendations, so movies without enough
+ratings still get genre-based suggestions. Movies with the same genre set share their
+genre candidates, which are ranked once per set and per run.
+"""
+import heapq
+from collections import Counter, defaultdict
+from django.conf import settings
+from django.db import transaction
+from movies.models import Movie, RatingStats
+from perf.pagecache import bump_page_versions
+from .models import ItemNeighbor, SimilarTitle
+
+# Genre-only candidates considered per movie, on top of its co-rating neighbours
+GENRE_CANDIDATES = 50
+
+
+def jaccard(first, second):
+    union = len(first | second)
+    return len(first & second) / union if union else 0.0
+
+
+class SimilarityIndex:
+    """Genre sets and popularity of every movie, loaded once per refresh run"""
+
+    def __init__(self):
+        self.genre_weight = getattr(settings, 'SIMILAR_TITLES_GENRE_WEIGHT', 0.4)
+        self.limit = getattr(settings, 'SIMILAR_TITLES_LIMIT', 20)
+
+        self.genres = defaultdict(frozenset)
+        self.movies_by_genre = defaultdict(set)
+        pairs = defaultdict(set)
+        for movie_id, genre_id in Movie.genres.through.objects.values_list('movie_id', 'genre_id').iterator():
+            pairs[movie_id].add(genre_id)
+            self.movies_by_genre[genre_id].add(movie_id)
+        for movie_id, genre_ids in pairs.items():
+            self.genres[movie_id] = frozenset(genre_ids)
+
+        # Ties between equally similar movies go to the more rated one
+        self.popularity = dict(RatingStats.objects.values_list('movie_id', 'total_ratings').iterator())
+        self._genre_candidates = {}
+
+    def genre_candidates(self, genre_set):
+        """Best genre matches for a genre set, as movie ids"""
+        if genre_set not in self._genre_candidates:
+            shared = Counter()
+            for genre_id in genre_set:
+                shared.update(self.movies_by_genre[genre_id])
+            # One more than needed, since the movie itself is among them
+            self._genre_candidates[genre_set] = heapq.nlargest(
+                GENRE_CANDIDATES + 1, shared,
+                key=lambda movie_id: (
+                    shared[movie_id] / (len(genre_set) + len(self.genres[movie_id]) - shared[movie_id]),
+                    self.popularity.get(movie_id, 0),
+                ),
+            )
+        return self._genre_candidates[genre_set]
+
+    def similar_titles(self, movie_id, neighbors):
+        """Top blended matches for a movie given its ``{neighbor id: score}`` co-rating neighbours"""
+        genre_set = self.genres[movie_id]
+        candidates = set(neighbors)
+        if genre_set:
+            candidates.update(self.genre_candidates(genre_set))
+        candidates.discard(movie_id)
+
+        scored = []
+        for candidate in candidates:
+            genre_score = jaccard(genre_set, self.genres[candidate])
+            rating_score = neighbors.get(candidate, 0.0)
+            score = self.genre_weight * genre_score + (1 - self.genre_weight) * rating_score
+            if score > 0:
+                scored.append((score, self.popularity.get(candidate, 0), candidate, genre_score, rating_score))
+        return heapq.nlargest(self.limit, scored)
+
+    def refresh(self, movie_ids):
+        """Recompute and store the similar titles of the given movies; returns rows written"""
+        movie_ids = list(movie_ids)
+        neighbors = defaultdict(dict)
+        for movie_id, neighbor_id, score in ItemNeighbor.objects.filter(
+            movie_id__in=movie_ids
+        ).values_list('movie_id', 'neighbor_id', 'score').iterator():
+            neighbors[movie_id][neighbor_id] = score
+
+        existing = set(Movie.objects.filter(pk__in=movie_ids).values_list('pk', flat=True))
+        rows = [
+            SimilarTitle(
+                movie_id=movie_id, similar_id=candidate, score=score,
+                genre_score=genre_score, rating_score=rating_score,
+            )
+            for movie_id in existing
+            for score, popularity, candidate, genre_score, rating_score in self.similar_titles(
+                movie_id, neighbors[movie_id]
+            )
+        ]
+        with transaction.atomic():
+            SimilarTitle.objects.filter(movie_id__in=movie_ids).delete()
+            SimilarTitle.objects.bulk_create(rows, batch_size=1000)
+        bump_page_versions('similar_titles')
+        return len(rows)
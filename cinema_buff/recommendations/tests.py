@@ -0,0 +1,90 @@
+from datetime import date
+from io import StringIO
+from unittest import mock
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from movies.models import Genre, Movie, Rating
+from .management.commands import compute_recommendations
+from .models import ItemNeighbor, RecommendationRun, SimilarTitle, SimilarityRefresh
+
+LOCMEM_CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class RecommendForTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user, cls.other = User.objects.create_user('viewer'), User.objects.create_user('other')
+        cls.liked, cls.disliked, cls.close, cls.far, cls.seen = (
+            Movie.objects.create(title=title, synopsis='x', release_date=date(2000, 1, 1))
+            for title in ('Liked', 'Disliked', 'Close', 'Far', 'Seen')
+        )
+        for movie, score in ((cls.liked, 9), (cls.disliked, 2), (cls.seen, 5)):
+            Rating.objects.create(user=cls.user, movie=movie, story_score=score, acting_score=score,
+                                  cinematography_score=score)
+        ItemNeighbor.objects.bulk_create([
+            ItemNeighbor(movie=cls.liked, neighbor=cls.close, score=0.9),
+            ItemNeighbor(movie=cls.disliked, neighbor=cls.far, score=0.9),
+            ItemNeighbor(movie=cls.liked, neighbor=cls.seen, score=0.9),
+        ])
+
+    def test_neighbours_of_liked_movies_are_recommended(self):
+        self.assertEqual(list(ItemNeighbor.recommend_for(self.user)), [self.close])
+
+    def test_users_without_ratings_get_nothing(self):
+        self.assertEqual(list(ItemNeighbor.recommend_for(self.other)), [])
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class SimilarTitlesTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.drama, cls.crime = Genre.objects.create(name='Drama'), Genre.objects.create(name='Crime')
+        cls.heat, cls.ronin, cls.amelie = (
+            Movie.objects.create(title=title, synopsis='x', release_date=date(2000, 1, 1))
+            for title in ('Heat', 'Ronin', 'Amelie')
+        )
+
+    def test_genre_changes_queue_a_refresh_that_the_command_drains(self):
+        self.heat.genres.add(self.drama, self.crime)
+        self.ronin.genres.add(self.crime)
+        self.amelie.genres.add(self.drama)
+        self.assertEqual(set(SimilarityRefresh.objects.values_list('movie_id', flat=True)),
+                         {self.heat.pk, self.ronin.pk, self.amelie.pk})
+
+        call_command('refresh_similar_titles', stdout=StringIO())
+        self.assertFalse(SimilarityRefresh.objects.exists())
+        self.assertEqual(set(SimilarTitle.for_movie(self.ronin)), {self.heat})
+        self.assertEqual(set(SimilarTitle.for_movie(self.heat)), {self.ronin, self.amelie})
+
+
+class StopLoop(Exception):
+    pass
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class ComputeRecommendationsLoopTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        movies = [Movie.objects.create(title=f'Movie {i}', synopsis='x', release_date=date(2000, 1, 1)) for i in range(3)]
+        for name in ('a', 'b', 'c'):
+            user = User.objects.create_user(name)
+            for movie in movies:
+                Rating.objects.create(user=user, movie=movie, story_score=5 + movies.index(movie))
+
+    def test_loop_runs_incrementally_with_a_periodic_full_run(self):
+        sleeps = []
+
+        def sleep(seconds):
+            sleeps.append(seconds)
+            if len(sleeps) == 4:
+                raise StopLoop
+
+        with mock.patch.object(compute_recommendations.time, 'sleep', sleep), self.assertRaises(StopLoop):
+            call_command('compute_recommendations', '--loop', '--interval', '60', '--full-every', '2',
+                         '--workers', '1', stdout=StringIO())
+        self.assertEqual(sleeps, [60.0] * 4)
+        # The first run is full as there is none before it, then every second one
+        self.assertEqual(list(RecommendationRun.objects.order_by('pk').values_list('full', flat=True)),
+                         [True, False, True, False])
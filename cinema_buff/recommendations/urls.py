@@ -0,0 +1,8 @@
+from django.urls import path
+from . import views
+
+app_name = 'recommendations'
+
+urlpatterns = [
+    path('', views.RecommendedForYouView.as_view(), name='recommended_for_you'),
+]
@@ -0,0 +1,27 @@
+from django.contrib.auth.mixins import LoginRequiredMixin
+from django.views.generic import ListView
+from movies.models import Movie
+from .models import ItemNeighbor
+
+class RecommendedForYouView(LoginRequiredMixin, ListView):
+    template_name = 'recommendations/recommended_for_you.html'
+    context_object_name = 'movies'
+    limit = 24
+    query_budget = 6
+
+    def get_queryset(self):
+        return ItemNeighbor.recommend_for(self.request.user, limit=self.limit)
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        # Until the user has rated enough for neighbours to kick in, show the top rated titles
+        context['is_fallback'] = not context['movies']
+        if context['is_fallback']:
+            context['movies'] = Movie.objects.filter(
+                rating_stats__total_ratings__gt=0
+            ).exclude(
+                ratings__user=self.request.user
+            ).defer('search_vector').select_related('rating_stats').prefetch_related('genres').order_by(
+                '-rating_stats__weighted_average', '-id'
+            )[:self.limit]
+        return context
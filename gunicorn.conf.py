@@ -0,0 +1,34 @@
+"""
+Gunicorn settings for the production container.
+
+Workers share Prometheus metrics through files in PROMETHEUS_MULTIPROC_DIR; the
+directory is emptied when the server starts so counters from a previous run are not
+added in, and a worker's live gauges are dropped when it exits. Each worker starts
+building its autocomplete title index as soon as it has loaded the app, so the first
+typeahead request does not wait for it.
+"""
+import os
+import shutil
+
+bind = '0.0.0.0:8000'
+workers = int(os.environ.get('GUNICORN_WORKERS', 3))
+chdir = 'cinema_buff'
+wsgi_app = 'cinema_buff.wsgi:application'
+
+os.environ.setdefault('PROMETHEUS_MULTIPROC_DIR', '/tmp/prometheus_multiproc')
+
+
+def on_starting(server):
+    path = os.environ['PROMETHEUS_MULTIPROC_DIR']
+    shutil.rmtree(path, ignore_errors=True)
+    os.makedirs(path, exist_ok=True)
+
+
+def child_exit(server, worker):
+    from prometheus_client import multiprocess
+    multiprocess.mark_process_dead(worker.pid)
+
+
+def post_worker_init(worker):
+    from movies.autocomplete import warm_title_index
+    warm_title_index()